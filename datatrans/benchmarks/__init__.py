@@ -0,0 +1,19 @@
+"""Offline benchmarks of the hot paths of datatrans
+
+Run all benchmarks, or the ones named, and write the results as JSON::
+
+    python -m datatrans.benchmarks [--output results.json] [--compare baseline.json]
+                                   [--repeat 5] [--scale 1] [--no-memory] [name ...]
+
+The inputs are built from the payloads recorded in ``fixtures/``, so no
+network access or API key is needed. See ``suite`` for the benchmarks.
+
+For load tests at a larger scale, ``synthetic`` makes deterministic
+FoodData Central payloads and recipe corpora of any size, and ``stub``
+serves them, or the recorded payloads, as a local FoodData Central API.
+``crawl`` times the ingredient crawl split over several processes
+against it.
+"""
+from datatrans.benchmarks.suite import *
+from datatrans.benchmarks.synthetic import *
+from datatrans.benchmarks.stub import *
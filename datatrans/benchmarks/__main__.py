@@ -0,0 +1,27 @@
+import argparse
+import json
+
+from datatrans.benchmarks.suite import BENCHMARKS, print_results, run_benchmarks, write_results
+
+parser = argparse.ArgumentParser(prog='python -m datatrans.benchmarks',
+                                 description='Benchmarks the hot paths of datatrans.')
+parser.add_argument('names', nargs='*', metavar='name', help='benchmarks to run: ' + ', '.join(BENCHMARKS))
+parser.add_argument('-o', '--output', help='where to write the results as JSON')
+parser.add_argument('--compare', help='results of an earlier run to compare with')
+parser.add_argument('--repeat', type=int, default=5, help='number of timed runs of each benchmark')
+parser.add_argument('--scale', type=int, default=1, help='multiplies the amount of input')
+parser.add_argument('--no-memory', dest='memory', action='store_false', help='do not measure the peak memory')
+args = parser.parse_args()
+
+for name in args.names:
+    if name not in BENCHMARKS:
+        parser.error('unknown benchmark \'{}\''.format(name))
+baseline = None
+if args.compare:
+    with open(args.compare, encoding='utf-8') as file:
+        baseline = json.load(file)
+
+results = run_benchmarks(args.names, repeat=args.repeat, scale=args.scale, memory=args.memory)
+print_results(results, baseline)
+if args.output:
+    write_results(results, args.output)
@@ -0,0 +1,105 @@
+"""Speedup of the ingredient crawl split over several processes
+
+``run_crawl`` serves a synthetic catalog with ``stub.StubServer``, with
+a latency per request as the real API has, crawls it once with
+``get_ingredients.crawl_ingredients`` as the reference, then with
+``plan_crawl``, ``crawl_worker`` in each number of worker processes and
+``merge_crawl``. Each merged output must be the same as the reference::
+
+    python -m datatrans.benchmarks.crawl [--workers 1 2 4 8] [--foods 4000] [--latency 0.02]
+
+The workers only share the queue and the output directory, as they
+would on several machines sharing a filesystem.
+"""
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable, List
+
+from datatrans import get_ingredients
+from datatrans.benchmarks.stub import StubServer
+from datatrans.benchmarks.synthetic import FoodDataGenerator
+from datatrans.fooddata.api import FoodDataClient
+
+__all__ = ['run_crawl']
+
+# the stub accepts any key
+API_KEY = 'DEMO_KEY'
+
+
+def _work(queue_path: Path, output_dir: Path, api_url: str) -> None:
+    with FoodDataClient(API_KEY, api_url=api_url, backoff=0.05) as client:
+        get_ingredients.crawl_worker(queue_path, output_dir, client=client, poll_seconds=0.1)
+
+
+def run_crawl(workers: Iterable[int] = (1, 2, 4, 8), *, foods: int = 4000, latency: float = 0.02,
+              pages_per_task: int = 1, seed: int = 0) -> List[dict]:
+    """Crawls a stub of ``foods`` synthetic foods with each number of ``workers`` processes.
+
+    Args:
+        workers: Numbers of worker processes to try
+        foods: Size of the synthetic catalog
+        latency: Seconds the stub takes to respond to each request
+        pages_per_task: Number of search pages of each task
+        seed: Seed of the synthetic catalog
+
+    Returns:
+        For the reference crawl then each number of workers, the number
+        of ``workers`` (0 for the reference), the ``tasks``, the
+        ``records`` written, the ``elapsed`` seconds and the
+        ``speedup`` over the reference
+
+    Raises:
+        AssertionError: When a merged output differs from the reference
+    """
+    context = multiprocessing.get_context('spawn')
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            StubServer(FoodDataGenerator(seed, foods=foods), latency=latency) as server:
+        tmpdir = Path(tmpdir)
+        reference_path = tmpdir / 'reference.jsonl'
+        start = time.perf_counter()
+        with FoodDataClient(API_KEY, api_url=server.url) as client:
+            records = get_ingredients.crawl_ingredients(reference_path, client=client)
+        baseline = time.perf_counter() - start
+        results.append({'workers': 0, 'tasks': 0, 'records': records, 'elapsed': baseline, 'speedup': 1.0})
+        reference = reference_path.read_bytes()
+
+        for n in workers:
+            run_dir = tmpdir / 'workers-{}'.format(n)
+            queue_path = run_dir / 'queue.sqlite'
+            run_dir.mkdir()
+            start = time.perf_counter()
+            with FoodDataClient(API_KEY, api_url=server.url) as client:
+                tasks = get_ingredients.plan_crawl(queue_path, pages_per_task=pages_per_task, client=client)
+            processes = [context.Process(target=_work, args=(queue_path, run_dir / 'parts', server.url))
+                         for _ in range(n)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            records = get_ingredients.merge_crawl(queue_path, run_dir / 'parts', run_dir / 'ingredients.jsonl')
+            elapsed = time.perf_counter() - start
+            if (run_dir / 'ingredients.jsonl').read_bytes() != reference:
+                raise AssertionError('the crawl with {} workers differs from the reference'.format(n))
+            results.append({'workers': n, 'tasks': tasks, 'records': records, 'elapsed': elapsed,
+                            'speedup': baseline / elapsed})
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Times the ingredient crawl split over several processes.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--foods', type=int, default=4000)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--pages-per-task', type=int, default=1)
+    args = parser.parse_args()
+
+    for result in run_crawl(args.workers, foods=args.foods, latency=args.latency,
+                            pages_per_task=args.pages_per_task):
+        print('{:>9} {:>4} tasks {:>6} ingredients in {:6.2f}s ({:.1f}x)'.format(
+            '{} workers'.format(result['workers']) if result['workers'] else 'reference', result['tasks'],
+            result['records'], result['elapsed'], result['speedup']))
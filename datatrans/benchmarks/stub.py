@@ -0,0 +1,443 @@
+"""Local stub of the FoodData Central API
+
+``StubServer`` serves the ``/search``, ``/{fdcId}`` and ``/foods``
+endpoints of the FoodData Central API on the local machine, from the
+recorded payloads in ``fixtures/`` (``FixtureCatalog``) or from a
+synthetic catalog of any size (``synthetic.FoodDataGenerator``), so
+that the client in ``fooddata.api`` can be tested and benchmarked
+without network access or an API key. The details are served in the
+``format`` and with the ``nutrients`` requested, see ``project_detail``::
+
+    with StubServer(FoodDataGenerator(foods=100000), latency=0.05) as server:
+        response = api.send_food_detail_api_request(100001, api_key='DEMO_KEY', api_url=server.url)
+
+The server can inject latency, server errors and ``429 Too Many
+Requests`` responses, and limit the rate of requests, as data.gov does.
+Injected faults are drawn from the ``seed`` and the number of the
+request, so the same sequence of requests always gets the same
+responses.
+"""
+import datetime
+import email.utils
+import hashlib
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from datatrans import utils
+from datatrans.benchmarks.suite import load_fixture
+from datatrans.benchmarks.synthetic import FoodDataGenerator
+from datatrans.fooddata.detail.food import parse_fooddata_date
+
+__all__ = ['FixtureCatalog', 'StubServer', 'project_detail']
+
+# path of the API under the host, as in https://api.nal.usda.gov/fdc/v1
+BASE_PATH = '/fdc/v1'
+
+# identifiers of the foods kept in abridged payloads, when they have them
+_ABRIDGED_KEYS = ('ndbNumber', 'foodCode', 'brandOwner', 'gtinUpc')
+
+
+def _abridged_food_nutrient(food_nutrient: dict) -> dict:
+    nutrient = food_nutrient.get('nutrient') or {}
+    abridged = {'number': nutrient.get('number'), 'name': nutrient.get('name'),
+                'amount': food_nutrient.get('amount'), 'unitName': nutrient.get('unitName')}
+    derivation = food_nutrient.get('foodNutrientDerivation')
+    if derivation:
+        abridged['derivationCode'] = derivation.get('code')
+        abridged['derivationDescription'] = derivation.get('description')
+    return abridged
+
+
+def project_detail(detail: dict, format: str = 'full', nutrients: Iterable[int] = None) -> dict:
+    """Returns the detail payload ``detail`` as served with the ``format`` and ``nutrients`` parameters.
+
+    Args:
+        detail: Full detail payload of a food, left unchanged
+        format: ``'full'``, or ``'abridged'`` for the description,
+            identifiers and flattened nutrients only, with the
+            publication date in ISO format
+        nutrients: Optional. Numbers of the nutrients to keep, all by
+            default
+
+    Raises:
+        ValueError: When ``format`` is not recognized
+
+    Examples:
+        >>> detail = utils.loads(load_fixture('sr_legacy_food.json'))
+        >>> abridged = project_detail(detail, 'abridged', [203, 204])
+        >>> sorted(abridged)
+        ['dataType', 'description', 'fdcId', 'foodNutrients', 'ndbNumber', 'publicationDate']
+        >>> [food_nutrient['number'] for food_nutrient in abridged['foodNutrients']], abridged['publicationDate']
+        (['203', '204'], '2019-04-01')
+    """
+    if format not in ('full', 'abridged'):
+        raise ValueError('invalid format \'{}\''.format(format))
+    food_nutrients = detail.get('foodNutrients') or []
+    if nutrients is not None:
+        numbers = {str(number) for number in nutrients}
+        food_nutrients = [food_nutrient for food_nutrient in food_nutrients
+                          if (food_nutrient.get('nutrient') or {}).get('number') in numbers]
+    if format == 'full':
+        return dict(detail, foodNutrients=food_nutrients) if nutrients is not None else detail
+    abridged = {
+        'fdcId': detail['fdcId'],
+        'description': detail.get('description'),
+        'dataType': detail.get('dataType'),
+        'foodNutrients': [_abridged_food_nutrient(food_nutrient) for food_nutrient in food_nutrients],
+    }
+    if detail.get('publicationDate'):
+        abridged['publicationDate'] = utils.fooddata.parse_date(
+            detail['publicationDate'], sep='/', format='MDY').isoformat()
+    abridged.update((key, detail[key]) for key in _ABRIDGED_KEYS if key in detail)
+    return abridged
+
+
+class FixtureCatalog:
+    """Catalog of the foods recorded in ``fixtures/``.
+
+    Every search returns the recorded page, with the criteria and page
+    number of the search.
+    """
+
+    __slots__ = ('_details', '_search')
+
+    def __init__(self):
+        self._details = {}
+        for name in ('sr_legacy_food.json', 'branded_food.json'):
+            detail = utils.loads(load_fixture(name))
+            self._details[detail['fdcId']] = detail
+        self._search = utils.loads(load_fixture('search.json'))
+
+    def __contains__(self, fdc_id: int) -> bool:
+        return fdc_id in self._details
+
+    def detail(self, fdc_id: int) -> dict:
+        """Returns the detail payload of the food ``fdc_id``.
+
+        Raises:
+            KeyError: When the food ``fdc_id`` was not recorded
+        """
+        return self._details[fdc_id]
+
+    def search(self, criteria: dict = None, *, page_size: int = 50) -> dict:
+        """ Returns the recorded search payload. """
+        criteria = dict(criteria or {})
+        page = dict(self._search)
+        page['foodSearchCriteria'] = criteria
+        page['currentPage'] = criteria.setdefault('pageNumber', 1)
+        return page
+
+
+class _TokenBucket:
+    """ Allows ``rate`` requests per second on average, and up to ``burst`` at once. """
+
+    __slots__ = ('rate', 'burst', '_tokens', '_time', '_lock')
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        """ Takes a token, and returns 0, or the seconds until one is available if there is none. """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._time) * self.rate)
+            self._time = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive, so that clients can pool connections
+    protocol_version = 'HTTP/1.1'
+    # the headers and the body are written separately
+    disable_nagle_algorithm = True
+    server: '_HTTPServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.stub.handle(self, 'GET')
+
+    def do_POST(self):
+        self.server.stub.handle(self, 'POST')
+
+    def send(self, status: int, body, headers: Dict[str, str] = None) -> None:
+        # the body of a 304 is that of the cached response of the client
+        content = b'' if status == 304 else body if isinstance(body, bytes) else utils.dumpb(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if status != 304:
+            self.send_header('Content-Length', str(len(content)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(content)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    stub: 'StubServer'
+
+
+class StubServer:
+    """Serves a catalog of foods as the FoodData Central API does.
+
+    Endpoints, under ``url``:
+        ``GET /{fdcId}``: Detail payload of a food, 404 if unknown
+        ``GET|POST /foods``: Detail payloads of the ``fdcIds`` found,
+            given as a JSON body or a comma separated query parameter
+        ``GET|POST /search``: Search payload of the criteria, given as
+            a JSON body (as sent by ``fooddata.api``) or query parameters
+
+    The detail endpoints take the ``format`` and ``nutrients`` parameters
+    (in the JSON body of ``POST /foods``), see ``project_detail``.
+
+    Requests without an ``api_key`` query parameter get a 403, as from
+    data.gov. Each other request then goes through, in order: the rate
+    limit, the injected 429s and errors, the latency.
+
+    Args:
+        catalog: Optional. Foods to serve, with ``detail(fdc_id)`` and
+            ``search(criteria, page_size=)``, as ``FixtureCatalog`` and
+            ``synthetic.FoodDataGenerator``. Defaults to a
+            ``FoodDataGenerator`` of 10000 foods.
+        host: Address to listen on
+        port: Port to listen on, any free port by default
+        latency: Seconds added to each response
+        jitter: Up to this many seconds are added at random to
+            ``latency``
+        error_rate: Fraction of requests answered with a
+            ``500 Internal Server Error``
+        throttle_rate: Fraction of requests answered with a
+            ``429 Too Many Requests``
+        rate_limit: Optional. Requests per second above which requests
+            are answered with a 429 and a ``Retry-After`` header
+        burst: Requests allowed at once under ``rate_limit``, defaults
+            to ``rate_limit``
+        page_size: Number of foods per search page, unless the criteria
+            give a ``pageSize``
+        validators: Whether to send the ``ETag`` and ``Last-Modified``
+            (of the ``modifiedDate`` or ``publicationDate``) of the detail
+            of a food, and to answer with a ``304 Not Modified`` the
+            requests whose ``If-None-Match`` or ``If-Modified-Since``
+            match them
+        seed: Seed of the injected latency and faults
+
+    Attributes:
+        url (str): Base URL of the API, to pass as ``api_url`` of the
+            functions of ``fooddata.api``
+        stats (Dict[str, int]): Number of ``requests``, of requests per
+            endpoint and of responses per status code
+
+    Examples:
+        >>> import requests
+        >>> with StubServer(FixtureCatalog()) as server:
+        ...     requests.get(server.url + '/173410', params={'api_key': 'DEMO_KEY'}).json()['description']
+        ...     requests.get(server.url + '/1', params={'api_key': 'DEMO_KEY'}).status_code
+        ...     server.stats['requests'], server.stats['404']
+        'Butter, salted'
+        404
+        (2, 1)
+    """
+
+    def __init__(self, catalog=None, *, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 rate_limit: float = None, burst: int = None, page_size: int = 50, validators: bool = False,
+                 seed: int = 0):
+        if not 0 <= error_rate + throttle_rate <= 1:
+            raise ValueError('error_rate and throttle_rate should add up to between 0 and 1')
+        self.catalog = catalog if catalog is not None else FoodDataGenerator()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.page_size = page_size
+        self.validators = validators
+        self.seed = seed
+        self._bucket = _TokenBucket(rate_limit, burst or max(1, math.ceil(rate_limit))) if rate_limit else None
+        self._httpd = _HTTPServer((host, port), _Handler, bind_and_activate=False)
+        self._httpd.stub = self
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {'requests': 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return 'http://{}:{}{}'.format(host, port, BASE_PATH)
+
+    def start(self) -> 'StubServer':
+        """ Starts serving in a background thread. """
+        self._httpd.server_bind()
+        self._httpd.server_activate()
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fdc-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """ Stops serving and closes the socket. """
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'StubServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def serve_forever(self) -> None:
+        """ Serves in the current thread until interrupted. """
+        self._httpd.server_bind()
+        self._httpd.server_activate()
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def _count(self, *keys: str) -> int:
+        with self._lock:
+            for key in keys:
+                self.stats[key] = self.stats.get(key, 0) + 1
+            return self.stats['requests']
+
+    def handle(self, handler: _Handler, method: str) -> None:
+        split = urlsplit(handler.path)
+        query = parse_qs(split.query)
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        path = split.path[len(BASE_PATH):] if split.path.startswith(BASE_PATH) else split.path
+        endpoint = path.strip('/')
+        endpoint = endpoint if endpoint in ('search', 'foods') else 'food'
+        number = self._count('requests', endpoint)
+
+        status, response, headers = self._respond(handler, method, endpoint, path, query, body, number)
+        self._count(str(status))
+        handler.send(status, response, headers)
+
+    @staticmethod
+    def _revalidate(handler: _Handler, detail: dict) -> Tuple[int, object, Optional[Dict[str, str]]]:
+        """ Answers the request for ``detail`` with a 304 if its validators match, else with ``detail``. """
+        content = utils.dumpb(detail)
+        headers = {'ETag': '"{}"'.format(hashlib.sha1(content).hexdigest()[:16])}
+        date = detail.get('modifiedDate') or detail.get('publicationDate')
+        if date:
+            modified = parse_fooddata_date(date)
+            headers['Last-Modified'] = email.utils.format_datetime(
+                datetime.datetime(modified.year, modified.month, modified.day, tzinfo=datetime.timezone.utc),
+                usegmt=True)
+        if_none_match = handler.headers.get('If-None-Match')
+        if if_none_match is not None:
+            if headers['ETag'] in (tag.strip() for tag in if_none_match.split(',')):
+                return 304, None, headers
+        elif handler.headers.get('If-Modified-Since') and 'Last-Modified' in headers:
+            try:
+                since = email.utils.parsedate_to_datetime(handler.headers['If-Modified-Since'])
+            except (TypeError, ValueError):
+                since = None
+            if since is not None and email.utils.parsedate_to_datetime(headers['Last-Modified']) <= since:
+                return 304, None, headers
+        return 200, content, headers
+
+    def _respond(self, handler: _Handler, method: str, endpoint: str, path: str, query: Dict[str, List[str]],
+                 body: bytes, number: int) -> Tuple[int, object, Optional[Dict[str, str]]]:
+        if not query.get('api_key'):
+            return 403, {'error': {'code': 'API_KEY_MISSING',
+                                   'message': 'No api_key was supplied. Get one at https://api.data.gov'}}, None
+        if self._bucket is not None:
+            wait = self._bucket.take()
+            if wait:
+                return 429, {'error': {'code': 'OVER_RATE_LIMIT', 'message': 'API rate limit exceeded'}}, \
+                    {'Retry-After': str(math.ceil(wait))}
+        rng = random.Random(self.seed * 1000003 + number)
+        fault = rng.random()
+        if fault < self.throttle_rate:
+            return 429, {'error': {'code': 'OVER_RATE_LIMIT', 'message': 'API rate limit exceeded'}}, \
+                {'Retry-After': '1'}
+        if fault < self.throttle_rate + self.error_rate:
+            return 500, {'error': 'Internal Server Error'}, None
+        if self.latency or self.jitter:
+            time.sleep(self.latency + rng.uniform(0, self.jitter))
+
+        try:
+            data = utils.loads(body) if body else {}
+            if endpoint != 'search':
+                if method == 'POST':
+                    format, nutrients = data.get('format') or 'full', data.get('nutrients')
+                else:
+                    format = query.get('format', ['full'])[0]
+                    nutrients = [int(number) for values in query.get('nutrients', ())
+                                 for number in values.split(',')] or None
+                if format not in ('full', 'abridged'):
+                    raise ValueError(format)
+            if endpoint == 'search':
+                criteria = dict(data) if method == 'POST' else {key: values[0] for key, values in query.items()
+                                                                if key != 'api_key'}
+                for key in ('pageNumber', 'pageSize'):
+                    if key in criteria:
+                        criteria[key] = int(criteria[key])
+                page_size = criteria.pop('pageSize', self.page_size)
+                return 200, self.catalog.search(criteria, page_size=page_size), None
+            if endpoint == 'foods':
+                fdc_ids = data.get('fdcIds') if method == 'POST' else \
+                    [fdc_id for values in query.get('fdcIds', ()) for fdc_id in values.split(',')]
+                foods = []
+                for fdc_id in fdc_ids or ():
+                    try:
+                        foods.append(project_detail(self.catalog.detail(int(fdc_id)), format, nutrients))
+                    except KeyError:
+                        pass
+                return 200, foods, None
+            fdc_id = int(path.strip('/'))
+        except (ValueError, TypeError, AttributeError):
+            return 400, {'error': 'Bad Request'}, None
+        try:
+            detail = project_detail(self.catalog.detail(fdc_id), format, nutrients)
+        except KeyError:
+            return 404, {'error': 'Not Found'}, None
+        if self.validators:
+            return self._revalidate(handler, detail)
+        return 200, detail, None
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serves a stub of the FoodData Central API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--fixtures', action='store_true', help='serve the recorded foods only')
+    parser.add_argument('--foods', type=int, default=10000, help='number of synthetic foods')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float)
+    parser.add_argument('--validators', action='store_true', help='send ETag and Last-Modified, answer 304s')
+    args = parser.parse_args()
+
+    stub = StubServer(FixtureCatalog() if args.fixtures else FoodDataGenerator(args.seed, foods=args.foods),
+                      host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+                      error_rate=args.error_rate, throttle_rate=args.throttle_rate, rate_limit=args.rate_limit,
+                      validators=args.validators, seed=args.seed)
+    print('Serving at {} (set FDC_API_URL to use it)'.format(stub.url))
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
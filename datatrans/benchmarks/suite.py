@@ -0,0 +1,549 @@
+"""Benchmarks of the hot paths of datatrans
+
+Each benchmark is a context manager registered with ``benchmark``. It
+prepares its input from the recorded payloads in ``fixtures/`` and
+yields a ``(run, operations)`` pair, where ``run()`` performs
+``operations`` operations of the code path being measured. Only
+``run()`` is timed; the preparation is not.
+
+``measure`` times ``run()`` a number of times and, in a separate run,
+records the peak memory allocated with ``tracemalloc``, and
+``run_benchmarks`` collects the results of several benchmarks with
+details of the environment, ready to be written as JSON and compared
+with those of another run with ``compare``.
+"""
+import contextlib
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+import requests
+
+import datatrans.structured_data as schema
+from datatrans import to_jsonld, utils
+from datatrans.dedup import Deduplicator
+from datatrans.fooddata.detail import BrandedFood, SrLegacyFood
+from datatrans.fooddata.detail.energy import compute_calories, to_nutrition_information
+from datatrans.fooddata.detail.food import FoodCategoryInstance
+from datatrans.fooddata.detail.similarity import NutrientIndex
+from datatrans.fooddata.search.response import FoodSearchResponse
+from datatrans.structured_data.carousel import serialize_pages
+
+__all__ = ['FIXTURES_DIR', 'IMPORTED_MODULES', 'PROJECTED_NUTRIENTS', 'PARALLEL_WORKERS', 'BENCHMARKS', 'load_fixture',
+           'benchmark', 'measure', 'run_benchmarks', 'write_results', 'compare', 'print_results']
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+# modules imported by the short-lived processes: CLIs and workers
+IMPORTED_MODULES = ('datatrans.utils', 'datatrans.fooddata.detail', 'datatrans.fooddata.search', 'datatrans.to_jsonld')
+
+Benchmark = Callable[[int], ContextManager[Tuple[Callable[[], object], int]]]
+
+# name -> (unit of the operations, benchmark)
+BENCHMARKS: Dict[str, Tuple[str, Benchmark]] = {}
+
+
+def load_fixture(name: str) -> bytes:
+    """ Returns the content of the fixture file ``name``. """
+    return (FIXTURES_DIR / name).read_bytes()
+
+
+def benchmark(name: str, unit: str) -> Callable[[Callable], Benchmark]:
+    """Decorator registering a generator as the benchmark ``name``.
+
+    The generator is given the ``scale`` of the run, and yields the
+    ``run`` function and the number of ``unit`` it processes, see the
+    module documentation.
+    """
+    def decorator(function: Callable[[int], Iterator[Tuple[Callable[[], object], int]]]) -> Benchmark:
+        BENCHMARKS[name] = (unit, contextlib.contextmanager(function))
+        return BENCHMARKS[name][1]
+    return decorator
+
+
+def _response(content: bytes) -> requests.Response:
+    """ Returns a ``requests.Response`` with ``content``, as returned by the API. """
+    response = requests.Response()
+    response.status_code = 200
+    response._content = content
+    return response
+
+
+@benchmark('sr_legacy_food', 'foods')
+def bench_sr_legacy_food(scale: int):
+    """ ``SrLegacyFood`` from a detail payload, decoded as ``FoodDetailResponse`` does. """
+    content = load_fixture('sr_legacy_food.json')
+    n = 200 * scale
+
+    def run():
+        for _ in range(n):
+            SrLegacyFood(_dict_=utils.loads(content))
+
+    yield run, n
+
+
+@benchmark('branded_food', 'foods')
+def bench_branded_food(scale: int):
+    """ ``BrandedFood`` from a detail payload, decoded as ``FoodDetailResponse`` does. """
+    content = load_fixture('branded_food.json')
+    n = 200 * scale
+
+    def run():
+        for _ in range(n):
+            BrandedFood(_dict_=utils.loads(content))
+
+    yield run, n
+
+
+# nutrients of the jobs needing a few only: protein, fat, carbohydrate, energy
+PROJECTED_NUTRIENTS = (203, 204, 205, 208)
+
+
+@benchmark('abridged_food', 'foods')
+def bench_abridged_food(scale: int):
+    """ ``SrLegacyFood`` from the payload of ``sr_legacy_food``, abridged to ``PROJECTED_NUTRIENTS``. """
+    # the stub imports this module
+    from datatrans.benchmarks.stub import project_detail
+
+    detail = utils.loads(load_fixture('sr_legacy_food.json'))
+    content = utils.dumpb(project_detail(detail, 'abridged', PROJECTED_NUTRIENTS))
+    n = 200 * scale
+
+    def run():
+        for _ in range(n):
+            SrLegacyFood(_dict_=utils.loads(content))
+
+    yield run, n
+
+
+@benchmark('snapshot', 'foods')
+def bench_snapshot(scale: int):
+    """ ``SrLegacyFood`` loaded from a ``utils.Snapshot`` of copies of that of ``sr_legacy_food``. """
+    content = load_fixture('sr_legacy_food.json')
+    n = 200 * scale
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / 'foods.snapshot'
+        utils.write_snapshot((SrLegacyFood(_dict_=utils.loads(content)) for _ in range(n)), path)
+
+        def run():
+            # a food is loaded with its nutrients
+            with utils.Snapshot(path) as snapshot:
+                list(snapshot)
+
+        yield run, n
+
+
+@benchmark('food_search_response', 'foods')
+def bench_food_search_response(scale: int):
+    """ ``FoodSearchResponse`` of a page of 10000 foods, made of copies of the recorded page. """
+    data = utils.loads(load_fixture('search.json'))
+    recorded = data['foods']
+    foods = []
+    for i in range(10000 * scale):
+        food = dict(recorded[i % len(recorded)])
+        food['fdcId'] += i // len(recorded) * 1000000
+        foods.append(food)
+    data['foods'] = foods
+    response = _response(utils.dumpb(data))
+
+    def run():
+        FoodSearchResponse(response)
+
+    yield run, len(foods)
+
+
+@benchmark('parse_date', 'dates')
+def bench_parse_date(scale: int):
+    """ ``utils.fooddata.parse_date`` of detail (M/D/YYYY) and search (YYYY-MM-DD) dates. """
+    days = [datetime.date(2018, 1, 1) + datetime.timedelta(days=i) for i in range(1000)]
+    mdy = ['{}/{}/{}'.format(day.month, day.day, day.year) for day in days]
+    ymd = [day.isoformat() for day in days]
+    parse_date = utils.fooddata.parse_date
+    repeat = 5 * scale
+
+    def run():
+        for _ in range(repeat):
+            for date_str in mdy:
+                parse_date(date_str, sep='/', format='MDY')
+            for date_str in ymd:
+                parse_date(date_str, sep='-', format='YMD')
+
+    yield run, repeat * (len(mdy) + len(ymd))
+
+
+@benchmark('snake_to_camel', 'names')
+def bench_snake_to_camel(scale: int):
+    """ ``utils.snake_to_camel`` of the attribute names of the detail classes, as ``DataClass`` does. """
+    names = list(SrLegacyFood.__slots__ + BrandedFood.__slots__)
+    repeat = 1000 * scale
+    snake_to_camel = utils.snake_to_camel
+
+    def run():
+        for _ in range(repeat):
+            for name in names:
+                snake_to_camel(name)
+
+    yield run, repeat * len(names)
+
+
+@benchmark('get_closest_match', 'ingredients')
+def bench_get_closest_match(scale: int):
+    """ ``utils.get_closest_match`` of the recipe ingredients against the names of the recorded foods. """
+    recipes = utils.loads(load_fixture('recipes.json'))
+    ingredients = [ingredient.lower() for records in recipes.values() for record in records
+                   for ingredient in record.get('ingredients', ())]
+    names = sorted({word for food in utils.loads(load_fixture('search.json'))['foods']
+                    for word in food['description'].lower().replace(',', '').split()} | {
+        'flour', 'sugar', 'salt', 'egg', 'milk', 'cream', 'olive oil', 'lemon', 'onion', 'garlic', 'tomatoes',
+        'chicken', 'beef', 'yogurt', 'vanilla extract', 'baking powder', 'baking soda', 'cinnamon', 'cumin'})
+    repeat = 20 * scale
+    get_closest_match = utils.get_closest_match
+
+    def run():
+        # ``get_closest_match`` prints the candidates when nothing matches
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(repeat):
+                for ingredient in ingredients:
+                    get_closest_match(ingredient, names)
+
+    yield run, repeat * len(ingredients)
+
+
+@benchmark('import', 'processes')
+def bench_import(scale: int):
+    """ Each of ``IMPORTED_MODULES`` imported by a new interpreter, its startup included. """
+    commands = [[sys.executable, '-c', 'import ' + module] for module in IMPORTED_MODULES] * scale
+    root = str(Path(__file__).parent.parent.parent)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (root, os.environ.get('PYTHONPATH')))))
+
+    def run():
+        for args in commands:
+            subprocess.run(args, env=env, cwd=root, check=True)
+
+    yield run, len(commands)
+
+
+def _recipes(scale: int) -> Iterator[Tuple[str, List[bytes]]]:
+    """ Yields each ``DataSet`` name and 1000 lines of its recipes, made of copies of the recorded ones. """
+    for name, records in utils.loads(load_fixture('recipes.json')).items():
+        lines = []
+        for i in range(1000 * scale):
+            record = dict(records[i % len(records)])
+            record['title' if 'title' in record else 'hed'] += ' {}'.format(i)
+            lines.append(utils.dumpb(record))
+        yield name, lines
+
+
+def _jsonld_recipes(scale: int) -> List[schema.Recipe]:
+    """ Returns the ``schema.Recipe`` of the recipes of ``_recipes``. """
+    recipes: List[schema.Recipe] = []
+    for name, lines in _recipes(scale):
+        to_recipe = to_jsonld.get_adapter(name).to_recipe
+        recipes.extend(to_recipe(utils.loads(line)) for line in lines)
+    return recipes
+
+
+@benchmark('recipe_jsonld', 'recipes')
+def bench_recipe_jsonld(scale: int):
+    """ ``to_jsonld.serialize`` of ``schema.Recipe`` of every data set. """
+    recipes = _jsonld_recipes(scale)
+    serialize = to_jsonld.serialize
+
+    def run():
+        for recipe in recipes:
+            serialize(recipe)
+
+    yield run, len(recipes)
+
+
+@benchmark('to_jsonld', 'recipes')
+def bench_to_jsonld(scale: int):
+    """ ``to_jsonld.convert`` of a JSON-lines file of every data set, from and to disk. """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        inputs = []
+        for name, lines in _recipes(scale):
+            path = Path(tmpdir) / '{}-recipes.json'.format(name.lower())
+            path.write_bytes(b'\n'.join(lines) + b'\n')
+            inputs.append((name, path, len(lines)))
+
+        def run():
+            for name_, path_, _ in inputs:
+                to_jsonld.convert(name_, path_.with_suffix('.json-ld'), input_path=path_)
+
+        yield run, sum(count for *_, count in inputs)
+
+
+# number of processes of ``convert_parallel``, fixed for results to compare
+PARALLEL_WORKERS = 4
+
+
+@benchmark('convert_parallel', 'recipes')
+def bench_convert_parallel(scale: int):
+    """ ``to_jsonld.convert_parallel`` of the files of ``to_jsonld`` with ``PARALLEL_WORKERS`` processes. """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        inputs = []
+        for name, lines in _recipes(scale):
+            path = Path(tmpdir) / '{}-recipes.json'.format(name.lower())
+            path.write_bytes(b'\n'.join(lines) + b'\n')
+            inputs.append((name, path, len(lines)))
+        # a few shards per worker, as the full data sets get with the default chunk size
+        chunk_size = max(path_.stat().st_size for _, path_, _ in inputs) // (4 * PARALLEL_WORKERS) + 1
+
+        def run():
+            for name_, path_, _ in inputs:
+                to_jsonld.convert_parallel(name_, path_.with_suffix('.json-ld'), input_path=path_,
+                                           workers=PARALLEL_WORKERS, chunk_size=chunk_size)
+
+        yield run, sum(count for *_, count in inputs)
+
+
+@benchmark('json_encoder', 'recipes')
+def bench_json_encoder(scale: int):
+    """ ``json.dumps`` with ``utils.json_encoder`` of the recipes of ``recipe_jsonld``, as before ``utils.dumps``. """
+    recipes = _jsonld_recipes(scale)
+    json_encoder = utils.json_encoder
+
+    def run():
+        for recipe in recipes:
+            json.dumps(recipe, default=json_encoder)
+
+    yield run, len(recipes)
+
+
+@benchmark('serialize_pages', 'items')
+def bench_serialize_pages(scale: int):
+    """ ``carousel.serialize_pages`` of summary page urls, in pages of 1000. """
+    urls = ['http://example.com/recipes/{}.html'.format(i) for i in range(100000 * scale)]
+
+    def run():
+        for _ in serialize_pages(urls, page_size=1000):
+            pass
+
+    yield run, len(urls)
+
+
+@benchmark('dedup', 'recipes')
+def bench_dedup(scale: int):
+    """ ``Deduplicator.add_all`` of recipes, half of them near duplicates of the other half. """
+    vocabulary = ['flour', 'sugar', 'butter', 'eggs', 'milk', 'salt', 'vanilla', 'cinnamon', 'apples', 'lemon',
+                  'garlic', 'onion', 'olive oil', 'chicken', 'rice', 'tomatoes', 'basil', 'pepper', 'cream', 'honey']
+    originals = []
+    for i in range(5000 * scale):
+        rng = random.Random(i)
+        originals.append(('Recipe {}'.format(' '.join(rng.sample(vocabulary, 3))),
+                          ['{} cups {} {}'.format(rng.randint(1, 4), *rng.sample(vocabulary, 2)) for _ in range(8)]))
+    recipes = [(i, name, ingredients) for i, (name, ingredients) in enumerate(
+        originals + [(name.upper(), ingredients[:-1] + ['1 pinch salt']) for name, ingredients in originals])]
+
+    def run():
+        for _ in Deduplicator(threshold=0.7).add_all(recipes):
+            pass
+
+    yield run, len(recipes)
+
+
+def _sr_legacy_foods(scale: int) -> List[SrLegacyFood]:
+    """ Returns 7793 SR Legacy foods (the size of its release) of 29 nutrients, every third without factors. """
+    rng = random.Random(0)
+    foods = []
+    for i in range(7793 * scale):
+        nutrients = [{'type': 'FoodNutrient', 'id': i * 100 + j,
+                      'nutrient': {'id': 1000 + j, 'number': str(200 + j), 'name': 'Nutrient', 'rank': j,
+                                   'unitName': 'g'},
+                      'amount': rng.uniform(0, 50)}
+                     for j in range(1, 30)]
+        foods.append(SrLegacyFood(_dict_={
+            'fdcId': i, 'foodClass': 'FinalFood', 'dataType': 'SR Legacy', 'tableAliasName': 'sr_legacy_food',
+            'description': 'Food {}'.format(i), 'foodNutrients': nutrients,
+            'nutrientConversionFactors': [
+                {'type': '.CalorieConversionFactor', 'proteinValue': 4.27, 'fatValue': 8.79,
+                 'carbohydrateValue': 3.87}] if i % 3 else [],
+        }))
+    return foods
+
+
+@benchmark('compute_calories', 'foods')
+def bench_compute_calories(scale: int):
+    """ ``energy.compute_calories`` of SR Legacy foods. """
+    foods = _sr_legacy_foods(scale)
+
+    def run():
+        compute_calories(foods)
+
+    yield run, len(foods)
+
+
+@benchmark('nutrition_information', 'foods')
+def bench_nutrition_information(scale: int):
+    """ ``energy.to_nutrition_information`` of the foods of ``compute_calories``. """
+    foods = _sr_legacy_foods(scale)
+
+    def run():
+        to_nutrition_information(foods)
+
+    yield run, len(foods)
+
+
+def _nutrient_matrix(scale: int) -> Tuple[np.ndarray, np.ndarray, List[str], np.ndarray]:
+    """ Returns the ``fdc_ids``, amounts, nutrients and categories of 50000 random foods of 32 nutrients. """
+    n, d = 50000 * scale, 32
+    rng = np.random.default_rng(0)
+    return np.arange(n), rng.gamma(1.0, 10.0, (n, d)), [str(200 + j) for j in range(d)], rng.integers(1, 29, n)
+
+
+@benchmark('nutrient_index', 'foods')
+def bench_nutrient_index(scale: int):
+    """ ``NutrientIndex.from_matrix`` with the inverted file of approximate search. """
+    fdc_ids, matrix, nutrients, categories = _nutrient_matrix(scale)
+
+    def run():
+        NutrientIndex.from_matrix(fdc_ids, matrix, nutrients, categories, approximate=True)
+
+    yield run, len(fdc_ids)
+
+
+def _bench_most_similar(scale: int, **kwargs):
+    """ ``NutrientIndex.most_similar`` of 100 indexed foods, by ``kwargs``. """
+    index = NutrientIndex.from_matrix(*_nutrient_matrix(scale), approximate=True)
+    queries = index.fdc_ids[:100]
+
+    def run():
+        for fdc_id in queries:
+            index.most_similar(fdc_id, 10, **kwargs)
+
+    yield run, len(queries)
+
+
+@benchmark('most_similar', 'queries')
+def bench_most_similar(scale: int):
+    """ Exact ``NutrientIndex.most_similar`` among 50000 foods. """
+    yield from _bench_most_similar(scale, approximate=False)
+
+
+@benchmark('most_similar_category', 'queries')
+def bench_most_similar_category(scale: int):
+    """ Exact ``NutrientIndex.most_similar`` among the foods of a category. """
+    yield from _bench_most_similar(scale, approximate=False, category=FoodCategoryInstance.SNACKS)
+
+
+@benchmark('most_similar_ivf', 'queries')
+def bench_most_similar_ivf(scale: int):
+    """ Approximate ``NutrientIndex.most_similar``, scanning ``n_probe`` clusters of the inverted file. """
+    yield from _bench_most_similar(scale)
+
+
+def measure(name: str, *, repeat: int = 5, scale: int = 1, memory: bool = True) -> dict:
+    """Runs the benchmark ``name``.
+
+    Args:
+        name: Name of a benchmark of ``BENCHMARKS``
+        repeat: Number of timed runs
+        scale: Multiplies the amount of input of the benchmark
+        memory: Whether to measure the peak memory, in an extra run
+
+    Returns:
+        The ``name``, ``unit`` and number of ``operations`` of the
+        benchmark, the ``best`` and ``median`` time of a run in seconds,
+        the ``throughput`` of the best run in operations per second and
+        the ``peakMemory`` allocated during a run in bytes
+
+    Raises:
+        ValueError: When there is no benchmark ``name``
+    """
+    try:
+        unit, bench = BENCHMARKS[name]
+    except KeyError as e:
+        raise ValueError('unknown benchmark \'{}\''.format(name)) from e.__context__
+    with bench(scale) as (run, operations):
+        times = []
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        peak_memory = None
+        if memory:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                run()
+                peak_memory = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    best = min(times)
+    return {
+        'name': name,
+        'unit': unit,
+        'operations': operations,
+        'best': best,
+        'median': statistics.median(times),
+        'throughput': operations / best,
+        'peakMemory': peak_memory,
+    }
+
+
+def run_benchmarks(names: Iterable[str] = None, *, repeat: int = 5, scale: int = 1, memory: bool = True) -> dict:
+    """Runs each of ``names``, all benchmarks by default, see ``measure``.
+
+    Returns:
+        The environment of the run and the ``results`` of each benchmark
+    """
+    return {
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'jsonBackend': utils.get_json_backend().name,
+        'repeat': repeat,
+        'scale': scale,
+        'results': [measure(name, repeat=repeat, scale=scale, memory=memory) for name in names or BENCHMARKS],
+    }
+
+
+def write_results(results: dict, path: Union[str, Path]) -> None:
+    """ Writes the ``results`` of ``run_benchmarks`` to ``path`` as JSON. """
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+        file.write('\n')
+
+
+def compare(baseline: dict, results: dict) -> Dict[str, float]:
+    """Compares two runs of ``run_benchmarks``.
+
+    Returns:
+        The ratio of the throughput of ``results`` to that of
+        ``baseline`` of each benchmark in both, above 1 when faster
+
+    Examples:
+        >>> compare({'results': [{'name': 'parse_date', 'throughput': 100000.0}]},
+        ...         {'results': [{'name': 'parse_date', 'throughput': 150000.0}]})
+        {'parse_date': 1.5}
+    """
+    before = {result['name']: result['throughput'] for result in baseline['results']}
+    return {result['name']: result['throughput'] / before[result['name']]
+            for result in results['results'] if result['name'] in before}
+
+
+def print_results(results: dict, baseline: dict = None, file=sys.stdout) -> None:
+    """ Prints the ``results`` of ``run_benchmarks`` as a table, compared to ``baseline`` if given. """
+    ratios = compare(baseline, results) if baseline is not None else {}
+    for result in results['results']:
+        line = '{name:<22}{throughput:>14,.0f} {unit}/s  best {best:.3f}s  median {median:.3f}s'.format(**result)
+        if result['peakMemory'] is not None:
+            line += '  peak {:.1f} MB'.format(result['peakMemory'] / 1e6)
+        if result['name'] in ratios:
+            line += '  {:.2f}x'.format(ratios[result['name']])
+        print(line, file=file)
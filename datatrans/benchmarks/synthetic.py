@@ -0,0 +1,704 @@
+"""Deterministic synthetic FoodData Central payloads and recipe corpora
+
+``FoodDataGenerator`` makes detail and search payloads shaped like the
+ones of the FoodData Central API, for a catalog of foods of every food
+class handled by ``FoodDetailResponse``, and ``RecipeGenerator`` makes
+records shaped like the lines of each ``to_jsonld.DataSet``.
+
+Every payload is a function of the seed and of the ``fdcId`` or the
+number of the record only, so that any part of a corpus can be made
+on its own, in any order, and the same seed always gives the same data.
+Nothing is held in memory, so corpora of millions of records can be
+streamed to disk with ``write_foods`` and ``write_recipes``::
+
+    python -m datatrans.benchmarks.synthetic --seed 1 --foods 1000000 --recipes 1000000 DIRECTORY
+"""
+import datetime
+import random
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+from datatrans import utils
+from datatrans.fooddata.detail.food import FoodAttributeTypeInstance, FoodCategoryInstance
+from datatrans.fooddata.search.request import FoodDataType
+
+__all__ = ['FIRST_FDC_ID', 'DATA_TYPE_CYCLE', 'FoodDataGenerator', 'RecipeGenerator', 'write_foods', 'write_recipes']
+
+FIRST_FDC_ID = 100000
+
+# data type of the foods by ``fdc_id % len(DATA_TYPE_CYCLE)``, about the
+# mix of a search of all data types
+DATA_TYPE_CYCLE = (
+    FoodDataType.BRANDED, FoodDataType.LEGACY, FoodDataType.BRANDED, FoodDataType.SURVEY, FoodDataType.BRANDED,
+    FoodDataType.FOUNDATION, FoodDataType.BRANDED, FoodDataType.LEGACY, FoodDataType.BRANDED, FoodDataType.SURVEY,
+    FoodDataType.BRANDED, FoodDataType.BRANDED, FoodDataType.LEGACY, FoodDataType.BRANDED, FoodDataType.SURVEY,
+    FoodDataType.BRANDED, FoodDataType.FOUNDATION, FoodDataType.BRANDED, FoodDataType.BRANDED, FoodDataType.BRANDED,
+)
+
+# foodClass, tableAliasName and publicationDate of each data type
+_FOOD_CLASSES = {
+    FoodDataType.FOUNDATION: ('FinalFood', 'foundation_food', '12/16/2019'),
+    FoodDataType.LEGACY: ('FinalFood', 'sr_legacy_food', '4/1/2019'),
+    FoodDataType.SURVEY: ('Survey', 'survey_fndds_food', '10/30/2020'),
+    FoodDataType.BRANDED: ('Branded', 'branded_food', None),
+}
+
+# (food category, name, variants, (protein, fat, carbohydrate) in g per 100 g)
+_BASE_FOODS = (
+    ('DAIRY_AND_EGG_PRODUCTS', 'Cheese', ('cheddar', 'swiss', 'mozzarella, whole milk', 'parmesan, grated',
+                                          'cottage, lowfat, 2% milkfat'), (24.0, 30.0, 2.0)),
+    ('DAIRY_AND_EGG_PRODUCTS', 'Milk', ('whole, 3.25% milkfat', 'reduced fat, fluid, 2% milkfat', 'nonfat, fluid'),
+     (3.3, 2.0, 4.9)),
+    ('DAIRY_AND_EGG_PRODUCTS', 'Egg', ('whole, raw, fresh', 'whole, cooked, hard-boiled', 'white, raw, fresh'),
+     (12.6, 9.5, 0.7)),
+    ('SPICES_AND_HERBS', 'Spices', ('pepper, black', 'cinnamon, ground', 'paprika', 'cumin seed'), (10.0, 6.0, 60.0)),
+    ('FATS_AND_OILS', 'Oil', ('olive, salad or cooking', 'canola', 'coconut', 'sesame, salad or cooking'),
+     (0.0, 100.0, 0.0)),
+    ('FATS_AND_OILS', 'Butter', ('salted', 'without salt', 'whipped, with salt'), (0.9, 81.0, 0.1)),
+    ('POULTRY_PRODUCTS', 'Chicken, broilers or fryers', ('breast, meat only, cooked, roasted',
+                                                         'thigh, meat and skin, raw', 'wing, meat and skin, fried'),
+     (27.0, 8.0, 0.0)),
+    ('FRUITS_AND_FRUIT_JUICES', 'Apples', ('raw, with skin', 'raw, without skin', 'dried, sulfured, uncooked'),
+     (0.3, 0.2, 14.0)),
+    ('FRUITS_AND_FRUIT_JUICES', 'Bananas', ('raw', 'dehydrated, or banana powder'), (1.1, 0.3, 23.0)),
+    ('FRUITS_AND_FRUIT_JUICES', 'Strawberries', ('raw', 'frozen, unsweetened'), (0.7, 0.3, 7.7)),
+    ('VEGETABLES_AND_VEGETABLE_PRODUCTS', 'Carrots', ('raw', 'cooked, boiled, drained, without salt'),
+     (0.9, 0.2, 9.6)),
+    ('VEGETABLES_AND_VEGETABLE_PRODUCTS', 'Onions', ('raw', 'cooked, boiled, drained, with salt'), (1.1, 0.1, 9.3)),
+    ('VEGETABLES_AND_VEGETABLE_PRODUCTS', 'Tomatoes, red, ripe', ('raw, year round average', 'canned, packed in '
+                                                                  'tomato juice'), (0.9, 0.2, 3.9)),
+    ('NUT_AND_SEED_PRODUCTS', 'Nuts', ('almonds', 'walnuts, english', 'cashew nuts, raw', 'pecans'),
+     (18.0, 55.0, 20.0)),
+    ('BEEF_PRODUCTS', 'Beef', ('ground, 85% lean meat / 15% fat, raw', 'round, eye of round, roast, cooked',
+                               'short loin, t-bone steak, raw'), (21.0, 14.0, 0.0)),
+    ('BEVERAGES', 'Beverages', ('coffee, brewed from grounds', 'tea, black, brewed', 'orange juice, chilled'),
+     (0.2, 0.0, 2.0)),
+    ('FINFISH_AND_SHELLFISH_PRODUCTS', 'Fish', ('salmon, Atlantic, farmed, raw', 'tuna, light, canned in water',
+                                                'cod, Atlantic, cooked, dry heat'), (21.0, 6.0, 0.0)),
+    ('LEGUMES_AND_LEGUME_PRODUCTS', 'Beans', ('black, mature seeds, cooked, boiled', 'kidney, red, mature seeds, raw',
+                                              'snap, green, raw'), (8.0, 0.5, 24.0)),
+    ('BAKED_PRODUCTS', 'Bread', ('whole-wheat, commercially prepared', 'white, commercially prepared',
+                                 'rye'), (11.0, 3.5, 46.0)),
+    ('SWEETS', 'Sugars', ('granulated', 'brown', 'powdered'), (0.0, 0.0, 99.0)),
+    ('CEREAL_GRAINS_AND_PASTA', 'Rice', ('white, long-grain, regular, enriched, cooked', 'brown, medium-grain, raw'),
+     (3.0, 0.5, 28.0)),
+    ('CEREAL_GRAINS_AND_PASTA', 'Wheat flour', ('white, all-purpose, enriched, bleached', 'whole-grain'),
+     (11.0, 1.5, 75.0)),
+)
+
+# (id, number, name, rank, unitName, typical amount per 100 g) of the
+# nutrients other than the proximates
+_NUTRIENTS = (
+    (1079, '291', 'Fiber, total dietary', 1200, 'g', 2.0),
+    (2000, '269', 'Sugars, total including NLEA', 1510, 'g', 5.0),
+    (1087, '301', 'Calcium, Ca', 5300, 'mg', 60.0),
+    (1089, '303', 'Iron, Fe', 5400, 'mg', 1.5),
+    (1090, '304', 'Magnesium, Mg', 5500, 'mg', 30.0),
+    (1091, '305', 'Phosphorus, P', 5600, 'mg', 150.0),
+    (1092, '306', 'Potassium, K', 5700, 'mg', 250.0),
+    (1093, '307', 'Sodium, Na', 5800, 'mg', 200.0),
+    (1095, '309', 'Zinc, Zn', 5900, 'mg', 1.2),
+    (1098, '312', 'Copper, Cu', 6000, 'mg', 0.1),
+    (1103, '317', 'Selenium, Se', 6200, 'µg', 10.0),
+    (1162, '401', 'Vitamin C, total ascorbic acid', 6300, 'mg', 8.0),
+    (1165, '404', 'Thiamin', 6400, 'mg', 0.1),
+    (1166, '405', 'Riboflavin', 6500, 'mg', 0.15),
+    (1167, '406', 'Niacin', 6600, 'mg', 2.5),
+    (1175, '415', 'Vitamin B-6', 6800, 'mg', 0.2),
+    (1177, '417', 'Folate, total', 6900, 'µg', 30.0),
+    (1178, '418', 'Vitamin B-12', 7300, 'µg', 0.5),
+    (1106, '320', 'Vitamin A, RAE', 7420, 'µg', 50.0),
+    (1104, '318', 'Vitamin A, IU', 7500, 'IU', 300.0),
+    (1109, '323', 'Vitamin E (alpha-tocopherol)', 7905, 'mg', 1.0),
+    (1114, '328', 'Vitamin D (D2 + D3)', 8700, 'µg', 0.5),
+    (1185, '430', 'Vitamin K (phylloquinone)', 8800, 'µg', 10.0),
+    (1258, '606', 'Fatty acids, total saturated', 9700, 'g', 2.0),
+    (1292, '645', 'Fatty acids, total monounsaturated', 11400, 'g', 2.0),
+    (1293, '646', 'Fatty acids, total polyunsaturated', 12900, 'g', 1.5),
+    (1257, '605', 'Fatty acids, total trans', 15400, 'g', 0.1),
+    (1253, '601', 'Cholesterol', 15700, 'mg', 20.0),
+)
+
+_PROXIMATES = {
+    'water': (1051, '255', 'Water', 100, 'g'),
+    'energy': (1008, '208', 'Energy', 300, 'kcal'),
+    'protein': (1003, '203', 'Protein', 600, 'g'),
+    'fat': (1004, '204', 'Total lipid (fat)', 800, 'g'),
+    'ash': (1007, '207', 'Ash', 1000, 'g'),
+    'carbohydrate': (1005, '205', 'Carbohydrate, by difference', 1110, 'g'),
+}
+
+# label nutrient of the nutrients of branded foods, by nutrient number
+_LABEL_NUTRIENTS = {
+    '204': 'fat', '606': 'saturatedFat', '605': 'transFat', '601': 'cholesterol', '307': 'sodium',
+    '205': 'carbohydrates', '291': 'fiber', '269': 'sugars', '203': 'protein', '301': 'calcium', '303': 'iron',
+    '306': 'potassium', '208': 'calories',
+}
+
+_SOURCES = {
+    'A': (1, 'Analytical data', {'id': 1, 'code': '1', 'description': 'Analytical or derived from analytical'}),
+    'NC': (49, 'Calculated', {'id': 3, 'code': '4', 'description': 'Calculated or imputed'}),
+    'LCCS': (70, 'Calculated from value per serving size measure',
+             {'id': 9, 'code': '12', 'description': 'Manufacturer\'s analytical; partial documentation'}),
+    'LCCD': (71, 'Calculated from a daily value percentage per serving size measure',
+             {'id': 9, 'code': '12', 'description': 'Manufacturer\'s analytical; partial documentation'}),
+}
+
+_MEASURES = (('cup', 'cup', 1.0), ('tbsp', 'tablespoon', 0.0625), ('tsp', 'teaspoon', 0.0208),
+             ('oz', 'ounce', 0.118), ('slice', 'slice', 0.125), ('piece', 'piece', 0.2))
+
+_BRAND_OWNERS = ('Kraft Heinz Foods Company', 'General Mills, Inc.', 'The Kroger Co.', 'Nestle USA Inc.',
+                 'Conagra Brands', 'Target Stores', 'Whole Foods Market, Inc.', 'Land O\'Lakes, Inc.',
+                 'Wegmans Food Markets, Inc.', 'Trader Joe\'s', 'Meijer, Inc.', 'Publix Super Markets, Inc.')
+
+_BRANDED_MODIFIERS = ('', '', 'ORGANIC ', 'REDUCED FAT ', 'PREMIUM ', 'CLASSIC ', 'NATURAL ', 'FAMILY SIZE ')
+
+_BRANDED_CATEGORIES = {
+    'DAIRY_AND_EGG_PRODUCTS': 'Cheese', 'SPICES_AND_HERBS': 'Herbs & Spices', 'FATS_AND_OILS': 'Oils Edible',
+    'POULTRY_PRODUCTS': 'Poultry, Chicken & Turkey', 'FRUITS_AND_FRUIT_JUICES': 'Pre-Packaged Fruit & Vegetables',
+    'VEGETABLES_AND_VEGETABLE_PRODUCTS': 'Canned Vegetables', 'NUT_AND_SEED_PRODUCTS': 'Popcorn, Peanuts, Seeds & '
+                                                                                      'Related Snacks',
+    'BEEF_PRODUCTS': 'Meat/Poultry/Other Animals  Prepared/Processed', 'BEVERAGES': 'Soda',
+    'FINFISH_AND_SHELLFISH_PRODUCTS': 'Fish  Unprepared/Unprocessed', 'LEGUMES_AND_LEGUME_PRODUCTS': 'Canned Legumes',
+    'BAKED_PRODUCTS': 'Breads & Buns', 'SWEETS': 'Granulated, Brown & Powdered Sugar',
+    'CEREAL_GRAINS_AND_PASTA': 'Rice',
+}
+
+_ADDITIVES = ('SALT', 'SUGAR', 'CITRIC ACID', 'NATURAL FLAVOR', 'SOY LECITHIN', 'XANTHAN GUM', 'ASCORBIC ACID',
+              'CANOLA OIL', 'ENZYMES', 'VITAMIN D3')
+
+
+def _round(x: float, digits: int = 3) -> float:
+    return float(round(x, digits))
+
+
+def _food_nutrient(rng: random.Random, id_: int, nutrient: tuple, amount: float, code: str,
+                   analytical: bool) -> dict:
+    nutrient_id, number, name, rank, unit_name = nutrient[:5]
+    derivation_id, description, source = _SOURCES[code]
+    food_nutrient = {
+        'type': 'FoodNutrient',
+        'id': id_,
+        'nutrient': {'id': nutrient_id, 'number': number, 'name': name, 'rank': rank, 'unitName': unit_name},
+        'foodNutrientDerivation': {'id': derivation_id, 'code': code, 'description': description,
+                                   'foodNutrientSource': source},
+        'amount': _round(amount),
+    }
+    if analytical:
+        food_nutrient['dataPoints'] = rng.randint(1, 40)
+        food_nutrient['min'] = _round(amount * rng.uniform(0.7, 1.0))
+        food_nutrient['max'] = _round(amount * rng.uniform(1.0, 1.3))
+    return food_nutrient
+
+
+class FoodDataGenerator:
+    """Makes FoodData Central payloads of a synthetic catalog of foods.
+
+    The catalog holds ``foods`` foods with consecutive ``fdcId`` from
+    ``first_fdc_id``, of the data type given by ``DATA_TYPE_CYCLE``.
+
+    Args:
+        seed: Seed of the catalog
+        foods: Number of foods in the catalog
+        first_fdc_id: ``fdcId`` of the first food
+
+    Examples:
+        >>> from datatrans.fooddata.detail import SrLegacyFood
+        >>> generator = FoodDataGenerator(seed=1)
+        >>> food = SrLegacyFood(_dict_=generator.detail(100001))
+        >>> food.fdc_id, food.data_type
+        (100001, <FoodDataType.LEGACY: 'SR Legacy'>)
+        >>> generator.detail(100001) == FoodDataGenerator(seed=1).detail(100001)
+        True
+        >>> page = generator.search({'includedDataTypes': {'Foundation': True}, 'pageNumber': 2}, page_size=3)
+        >>> page['totalHits'], page['totalPages'], [food['fdcId'] for food in page['foods']]
+        (1000, 334, [100036, 100045, 100056])
+    """
+
+    __slots__ = ('seed', 'foods', 'first_fdc_id')
+
+    def __init__(self, seed: int = 0, *, foods: int = 10000, first_fdc_id: int = FIRST_FDC_ID):
+        self.seed = seed
+        self.foods = foods
+        self.first_fdc_id = first_fdc_id
+
+    def __contains__(self, fdc_id: int) -> bool:
+        return self.first_fdc_id <= fdc_id < self.first_fdc_id + self.foods
+
+    def fdc_ids(self, data_types: Iterable[FoodDataType] = None) -> Iterator[int]:
+        """ Yields the ``fdcId`` of every food of the catalog, only of ``data_types`` if given. """
+        data_types = set(data_types or DATA_TYPE_CYCLE)
+        for fdc_id in range(self.first_fdc_id, self.first_fdc_id + self.foods):
+            if self.data_type(fdc_id) in data_types:
+                yield fdc_id
+
+    @staticmethod
+    def data_type(fdc_id: int) -> FoodDataType:
+        """ Returns the data type of the food ``fdc_id``. """
+        return DATA_TYPE_CYCLE[fdc_id % len(DATA_TYPE_CYCLE)]
+
+    def _rng(self, fdc_id: int) -> random.Random:
+        return random.Random(self.seed * 0x9E3779B97F4A7C15 + fdc_id)
+
+    def _identity(self, rng: random.Random, fdc_id: int) -> dict:
+        """ Draws what the detail and search payloads of a food share, always first from ``rng``. """
+        data_type = self.data_type(fdc_id)
+        category, name, variants, macros = rng.choice(_BASE_FOODS)
+        variant = rng.choice(variants)
+        identity = {
+            'fdcId': fdc_id,
+            'dataType': data_type.value,
+            'category': category,
+            'macros': macros,
+            'number': rng.randint(1001, 99999),
+        }
+        if data_type is FoodDataType.BRANDED:
+            brand_owner = rng.choice(_BRAND_OWNERS)
+            identity.update(
+                description='{}{} {}'.format(rng.choice(_BRANDED_MODIFIERS), variant.partition(',')[0],
+                                             name.partition(',')[0]).upper(),
+                gtinUpc='{:012d}'.format(rng.randrange(10 ** 11, 10 ** 12)),
+                brandOwner=brand_owner,
+                ingredients=', '.join([name.partition(',')[0].upper()] + rng.sample(_ADDITIVES, rng.randint(1, 5)))
+                + '.',
+                publishedDate=datetime.date(2019, 4, 1) + datetime.timedelta(days=rng.randrange(730)),
+            )
+        else:
+            identity['description'] = '{}, {}'.format(name, variant)
+            if data_type is FoodDataType.SURVEY:
+                identity['foodCode'] = str(rng.randint(11000000, 99999999))
+                identity['additionalDescriptions'] = '{} {}'.format(variant.partition(',')[0], name.lower())
+        return identity
+
+    def search_result(self, fdc_id: int, score: float = None) -> dict:
+        """ Returns the food ``fdc_id`` as found in the ``foods`` of a search payload. """
+        identity = self._identity(self._rng(fdc_id), fdc_id)
+        data_type = FoodDataType(identity['dataType'])
+        published = identity.get('publishedDate')
+        if published is None:
+            month, day, year = _FOOD_CLASSES[data_type][2].split('/')
+            published = datetime.date(int(year), int(month), int(day))
+        food = {
+            'fdcId': fdc_id,
+            'description': identity['description'],
+            'dataType': identity['dataType'],
+            'publishedDate': published.isoformat(),
+            'allHighlightFields': '',
+            'score': _round(score if score is not None else 500.0, 4),
+        }
+        if data_type is FoodDataType.BRANDED:
+            food.update(gtinUpc=identity['gtinUpc'], brandOwner=identity['brandOwner'],
+                        ingredients=identity['ingredients'])
+        elif data_type is FoodDataType.SURVEY:
+            food.update(foodCode=identity['foodCode'], additionalDescriptions=identity['additionalDescriptions'])
+        else:
+            food['ndbNumber'] = str(identity['number'])
+        return food
+
+    def search(self, criteria: dict = None, *, page_size: int = 50) -> dict:
+        """Returns the search payload of ``criteria``.
+
+        Every food of the catalog of the data types in
+        ``includedDataTypes`` matches, whatever the search input, in
+        ``fdcId`` order.
+
+        Args:
+            criteria: Optional. Search criteria in camelCase, as sent to
+                the API (see ``FoodSearchCriteria``)
+            page_size: Number of foods per page
+        """
+        criteria = dict(criteria or {})
+        page_number = criteria.setdefault('pageNumber', 1)
+        included = [FoodDataType(key) for key, value in (criteria.get('includedDataTypes') or {}).items() if value]
+        # positions of the included data types in ``DATA_TYPE_CYCLE``
+        cycle = len(DATA_TYPE_CYCLE)
+        offset = self.first_fdc_id % cycle
+        slots = [i for i in range(cycle) if not included or DATA_TYPE_CYCLE[(offset + i) % cycle] in included]
+        full_cycles, rest = divmod(self.foods, cycle)
+        total_hits = full_cycles * len(slots) + sum(1 for i in slots if i < rest)
+        first = (page_number - 1) * page_size
+        foods = []
+        for hit in range(first, min(first + page_size, total_hits)):
+            fdc_id = self.first_fdc_id + hit // len(slots) * cycle + slots[hit % len(slots)]
+            foods.append(self.search_result(fdc_id, score=1000.0 / (1 + hit / 100)))
+        return {
+            'foodSearchCriteria': criteria,
+            'totalHits': total_hits,
+            'currentPage': page_number,
+            'totalPages': -(-total_hits // page_size),
+            'foods': foods,
+        }
+
+    def detail(self, fdc_id: int) -> dict:
+        """Returns the detail payload of the food ``fdc_id``.
+
+        Raises:
+            KeyError: When there is no food ``fdc_id`` in the catalog
+        """
+        if fdc_id not in self:
+            raise KeyError(fdc_id)
+        rng = self._rng(fdc_id)
+        identity = self._identity(rng, fdc_id)
+        data_type = FoodDataType(identity['dataType'])
+        food_class, table_alias_name, publication_date = _FOOD_CLASSES[data_type]
+        category = FoodCategoryInstance[identity['category']].value
+        detail = {
+            'fdcId': fdc_id,
+            'foodClass': food_class,
+            'description': identity['description'],
+            'foodNutrients': self._food_nutrients(rng, fdc_id, data_type, identity['macros']),
+            'foodComponents': [],
+            'foodAttributes': [],
+            'tableAliasName': table_alias_name,
+            'dataType': data_type.value,
+            'foodPortions': [],
+            'changes': '',
+        }
+        if data_type is FoodDataType.BRANDED:
+            serving_size = float(rng.choice((15, 28, 30, 40, 55, 85, 113, 140, 240)))
+            detail.update(
+                brandOwner=identity['brandOwner'],
+                gtinUpc=identity['gtinUpc'],
+                dataSource=rng.choice(('LI', 'GDSN')),
+                ingredients=identity['ingredients'],
+                modifiedDate='{d.month}/{d.day}/{d.year}'.format(d=identity['publishedDate']
+                                                                 - datetime.timedelta(days=rng.randrange(60))),
+                availableDate='{d.month}/{d.day}/{d.year}'.format(d=identity['publishedDate']),
+                servingSize=serving_size,
+                servingSizeUnit='g',
+                householdServingFullText=rng.choice(('1 cup', '2 tbsp', '1 oz', '1 container', '1 slice', '1 piece')),
+                brandedFoodCategory=_BRANDED_CATEGORIES[identity['category']],
+                publicationDate='{d.month}/{d.day}/{d.year}'.format(d=identity['publishedDate']),
+                labelNutrients={
+                    _LABEL_NUTRIENTS[food_nutrient['nutrient']['number']]: {
+                        'value': _round(food_nutrient['amount'] * serving_size / 100)}
+                    for food_nutrient in detail['foodNutrients']
+                    if food_nutrient['nutrient']['number'] in _LABEL_NUTRIENTS},
+            )
+            return detail
+
+        detail['publicationDate'] = publication_date
+        detail['foodPortions'] = self._food_portions(rng, data_type)
+        detail['inputFoods'] = []
+        if data_type is FoodDataType.SURVEY:
+            detail.update(
+                foodCode=identity['foodCode'],
+                startDate='1/1/2015',
+                endDate='12/31/2016',
+                wweiaFoodCategory=category.description,
+                foodAttributes=[{
+                    'id': fdc_id * 10 + 1, 'sequenceNumber': 1, 'value': identity['additionalDescriptions'],
+                    'foodAttributeType': FoodAttributeTypeInstance.ADDITIONAL_DESCRIPTION.value.dict,
+                }],
+            )
+            return detail
+
+        detail.update(
+            ndbNumber=str(identity['number']),
+            foodCategory=category.dict,
+            isHistoricalReference=data_type is FoodDataType.LEGACY,
+            nutrientConversionFactors=[
+                {'type': '.ProteinConversionFactor', 'id': fdc_id * 10 + 1,
+                 'value': rng.choice((6.25, 6.38, 5.7, 5.3))},
+                {'type': '.CalorieConversionFactor', 'id': fdc_id * 10 + 2,
+                 'proteinValue': rng.choice((4.0, 4.27, 3.47, 2.44)),
+                 'fatValue': rng.choice((9.0, 8.79, 8.37)),
+                 'carbohydrateValue': rng.choice((4.0, 3.87, 4.12, 3.57))},
+            ],
+        )
+        if rng.random() < 0.5:
+            detail['foodAttributes'].append({
+                'id': fdc_id * 10 + 3, 'sequenceNumber': 1,
+                'value': identity['description'].partition(',')[0].lower(),
+                'foodAttributeType': FoodAttributeTypeInstance.COMMON_NAME.value.dict,
+            })
+        return detail
+
+    def details(self, fdc_ids: Iterable[int] = None) -> Iterator[dict]:
+        """ Yields the detail payload of each of ``fdc_ids``, every food of the catalog by default. """
+        for fdc_id in fdc_ids if fdc_ids is not None else self.fdc_ids():
+            yield self.detail(fdc_id)
+
+    @staticmethod
+    def _food_nutrients(rng: random.Random, fdc_id: int, data_type: FoodDataType,
+                        macros: Tuple[float, float, float]) -> List[dict]:
+        analytical = data_type in (FoodDataType.FOUNDATION, FoodDataType.LEGACY)
+        protein, fat, carbohydrate = (amount * rng.uniform(0.8, 1.2) for amount in macros)
+        total = protein + fat + carbohydrate
+        if total > 98:
+            protein, fat, carbohydrate = (amount * 98 / total for amount in (protein, fat, carbohydrate))
+        ash = min(rng.uniform(0.1, 3.0), 99 - protein - fat - carbohydrate)
+        water = 100 - protein - fat - carbohydrate - ash
+        proximates = {
+            'water': water, 'protein': protein, 'fat': fat, 'ash': ash, 'carbohydrate': carbohydrate,
+            'energy': round(4 * protein + 9 * fat + 4 * carbohydrate),
+        }
+        ids = iter(range(fdc_id * 100, fdc_id * 100 + 100))
+        food_nutrients = []
+        for key, nutrient in _PROXIMATES.items():
+            if data_type is FoodDataType.BRANDED and key in ('water', 'ash'):
+                continue
+            code = 'A' if analytical and key not in ('energy', 'carbohydrate') else 'NC'
+            if data_type is FoodDataType.BRANDED:
+                code = 'LCCS'
+            food_nutrients.append(_food_nutrient(rng, next(ids), nutrient, proximates[key], code,
+                                                 code == 'A'))
+        # branded foods report the nutrients of the label, others most
+        for nutrient in _NUTRIENTS:
+            if data_type is FoodDataType.BRANDED:
+                if nutrient[1] not in _LABEL_NUTRIENTS:
+                    continue
+                code = rng.choice(('LCCS', 'LCCD'))
+            elif rng.random() < 0.15:
+                continue
+            else:
+                code = 'A' if analytical and rng.random() < 0.7 else 'NC'
+            amount = nutrient[5] * rng.lognormvariate(0, 0.6) if rng.random() < 0.9 else 0.0
+            food_nutrients.append(_food_nutrient(rng, next(ids), nutrient, amount, code, code == 'A'))
+        return food_nutrients
+
+    @staticmethod
+    def _food_portions(rng: random.Random, data_type: FoodDataType) -> List[dict]:
+        portions = []
+        for sequence_number, (abbreviation, name, cups) in enumerate(rng.sample(_MEASURES, rng.randint(1, 4)),
+                                                                     start=1):
+            amount = rng.choice((1.0, 1.0, 0.5, 2.0))
+            gram_weight = _round(amount * cups * rng.uniform(100, 250), 1)
+            portion = {
+                'id': rng.randrange(1, 10 ** 6),
+                'sequenceNumber': sequence_number,
+                'gramWeight': gram_weight,
+            }
+            if data_type is FoodDataType.FOUNDATION:
+                portion.update(measureUnit={'id': 1000 + sequence_number, 'name': name, 'abbreviation': abbreviation},
+                               amount=amount, dataPoints=rng.randint(1, 12), minYearAcquired=rng.randint(2010, 2019),
+                               modifier='')
+            elif data_type is FoodDataType.SURVEY:
+                portion.update(measureUnit={'id': 9999, 'name': 'undetermined', 'abbreviation': 'undetermined'},
+                               portionDescription='{:g} {}'.format(amount, name),
+                               modifier=str(rng.randint(10000, 99999)))
+            else:
+                portion.update(measureUnit={'id': 9999, 'name': 'undetermined', 'abbreviation': 'undetermined'},
+                               amount=amount, modifier=abbreviation)
+            portions.append(portion)
+        return portions
+
+
+_ADJECTIVES = ('Classic', 'Easy', 'Spicy', 'Creamy', 'Roasted', 'Grilled', 'Slow-Cooker', 'Crispy', 'Lemony',
+               'Smoky', 'Garlicky', 'Weeknight', 'Best-Ever', 'Vegan', 'Brown Butter', 'Honey-Glazed')
+_DISHES = ('Chicken Thighs', 'Banana Bread', 'Beef Stew', 'Tomato Soup', 'Chocolate Chip Cookies', 'Pork Chops',
+           'Salmon', 'Mac and Cheese', 'Lentil Curry', 'Potato Salad', 'Apple Pie', 'Fried Rice', 'Meatballs',
+           'Pancakes', 'Carrot Cake', 'Shrimp Tacos', 'Vegetable Lasagna', 'Chili', 'Risotto', 'Scones')
+_INGREDIENTS = ('all-purpose flour', 'granulated sugar', 'packed brown sugar', 'unsalted butter, softened',
+                'large eggs', 'whole milk', 'kosher salt', 'baking powder', 'baking soda', 'vanilla extract',
+                'extra-virgin olive oil', 'garlic cloves, minced', 'yellow onion, chopped', 'carrots, diced',
+                'boneless, skinless chicken thighs', 'ground beef', 'canned crushed tomatoes', 'heavy cream',
+                'grated Parmesan', 'fresh lemon juice', 'ground cinnamon', 'ground cumin', 'smoked paprika',
+                'chicken stock', 'long-grain white rice', 'dried lentils', 'ripe bananas', 'crème fraîche',
+                'fresh thyme leaves', 'freshly ground black pepper')
+_QUANTITIES = ('1', '2', '3', '4', '½', '¼', '¾', '⅓', '1½', '2½')
+_UNITS = ('cup', 'cups', 'tablespoons', 'teaspoon', 'teaspoons', 'pound', 'ounces', '')
+_STEPS = ('Preheat the oven to {t}°F.', 'Whisk the {a} and the {b} in a large bowl.',
+          'Heat the {a} in a large skillet over medium-high heat.', 'Add the {b} and cook, stirring, {m} minutes.',
+          'Stir in the {a} and season with salt and pepper.', 'Bake until golden brown, {m} to {n} minutes.',
+          'Simmer, partially covered, until tender, about {m} minutes.', 'Let cool {m} minutes before serving.')
+_FIRST_NAMES = ('Mary', 'James', 'Claire', 'Ina', 'Jamie', 'Nigella', 'Yotam', 'Samin', 'José', 'Madhur',
+                'Melissa', 'Kenji', 'Dorie', 'Alison', 'Rick', 'Priya')
+_LAST_NAMES = ('Stone', 'Berry', 'Martin', 'Garten', 'Oliver', 'Lawson', 'Ottolenghi', 'Nosrat', 'Andrés',
+               'Jaffrey', 'Clark', 'López-Alt', 'Greenspan', 'Roman', 'Bayless', 'Krishna')
+_CUISINES = ('Italian', 'Mexican', 'Indian', 'Japanese', 'French', 'American', 'Thai', 'Middle Eastern')
+_COOKING_METHODS = ('Baking', 'Roasting', 'Grilling', 'Sautéing', 'Braising', 'No-Cook', 'Frying', 'Steaming')
+
+
+class RecipeGenerator:
+    """Makes records shaped like the lines of each ``to_jsonld.DataSet``.
+
+    Args:
+        seed: Seed of the corpus
+
+    Examples:
+        >>> from datatrans import to_jsonld
+        >>> generator = RecipeGenerator(seed=1)
+        >>> record = generator.record('COOKSTR', 0)
+        >>> record == RecipeGenerator(seed=1).record('COOKSTR', 0)
+        True
+        >>> to_jsonld.to_recipe(record, 'COOKSTR').json_serial()['name'] == record['title']
+        True
+    """
+
+    __slots__ = ('seed',)
+
+    DATA_SETS = ('ALLRECIPES', 'BBCCOUK', 'COOKSTR', 'EPICURIOUS')
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+
+    def _rng(self, data_set: str, number: int) -> random.Random:
+        return random.Random('{}:{}:{}'.format(self.seed, data_set, number))
+
+    @staticmethod
+    def _common(rng: random.Random) -> dict:
+        ingredients = ['{} {} {}'.format(rng.choice(_QUANTITIES), rng.choice(_UNITS), ingredient).replace('  ', ' ')
+                       for ingredient in rng.sample(_INGREDIENTS, rng.randint(3, 12))]
+        names = [ingredient.rpartition(' ')[2].strip(',') for ingredient in ingredients]
+        instructions = [rng.choice(_STEPS).format(t=rng.choice((350, 375, 400, 425)), a=rng.choice(names),
+                                                  b=rng.choice(names), m=rng.randint(2, 20), n=rng.randint(21, 60))
+                        for _ in range(rng.randint(2, 7))]
+        prep, cook = rng.choice((0, 5, 10, 15, 20, 30)), rng.choice((0, 10, 20, 25, 45, 60, 90))
+        return {
+            'title': '{} {}'.format(rng.choice(_ADJECTIVES), rng.choice(_DISHES)),
+            'author': '{} {}'.format(rng.choice(_FIRST_NAMES), rng.choice(_LAST_NAMES)),
+            'description': rng.choice(('', 'A family favorite.', 'Perfect for a weeknight dinner.',
+                                       'This one is always a hit at parties.')),
+            'ingredients': ingredients,
+            'instructions': instructions,
+            'prep': prep,
+            'cook': cook,
+            'total': prep + cook + (rng.choice((0, 10, 30)) if prep + cook else 0),
+            'reviews': int(rng.paretovariate(1.2)) - 1 if rng.random() < 0.8 else 0,
+            'rating': _round(rng.uniform(1, 5), 2),
+            'date': datetime.datetime(2010, 1, 1) + datetime.timedelta(seconds=rng.randrange(10 ** 9 // 3)),
+        }
+
+    def record(self, data_set: str, number: int) -> dict:
+        """Returns the record ``number`` of ``data_set``.
+
+        Raises:
+            ValueError: When ``data_set`` is not one of ``DATA_SETS``
+        """
+        data_set = data_set.upper()
+        rng = self._rng(data_set, number)
+        c = self._common(rng)
+        slug = '{}-{}'.format(c['title'].lower().replace(' ', '-'), number)
+        if data_set == 'EPICURIOUS':
+            return {
+                'id': '{:024x}'.format(rng.getrandbits(96)),
+                'url': 'https://www.epicurious.com/recipes/food/views/' + slug,
+                'pubDate': c['date'].strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                'hed': c['title'],
+                'dek': c['description'],
+                'prepSteps': c['instructions'],
+                'aggregateRating': _round(c['rating'] * 0.8, 2) if c['reviews'] else 0,
+                'reviewsCount': c['reviews'],
+                'willMakeAgainPct': rng.randint(0, 100) if c['reviews'] else 0,
+                'author': [{'name': c['author']}] if rng.random() < 0.7 else [],
+                'tag': ({'category': 'cuisine', 'name': rng.choice(_CUISINES)} if rng.random() < 0.5
+                        else {'category': 'ingredient', 'name': c['ingredients'][0].rpartition(' ')[2]}),
+                'ingredients': c['ingredients'],
+            }
+        if data_set == 'ALLRECIPES':
+            return {
+                'url': 'https://www.allrecipes.com/recipe/{}/{}/'.format(number, slug),
+                'title': c['title'],
+                'author': c['author'],
+                'description': c['description'],
+                'ingredients': c['ingredients'],
+                'instructions': c['instructions'],
+                'prep_time_minutes': c['prep'],
+                'cook_time_minutes': c['cook'],
+                'total_time_minutes': c['total'],
+                'rating_stars': c['rating'] if c['reviews'] else 0.0,
+                'review_count': c['reviews'],
+                'photo_url': 'https://images.media-allrecipes.com/userphotos/{}.jpg'.format(rng.randrange(10 ** 7)),
+            }
+        if data_set == 'BBCCOUK':
+            return {
+                'url': 'https://www.bbc.co.uk/food/recipes/' + slug.replace('-', '_'),
+                'title': c['title'],
+                'chef': c['author'],
+                'description': c['description'],
+                'ingredients': c['ingredients'],
+                'instructions': c['instructions'],
+                'preparation_time_minutes': c['prep'],
+                'cooking_time_minutes': c['cook'],
+                'total_time_minutes': c['total'],
+                'serves': rng.randint(1, 12),
+            }
+        if data_set == 'COOKSTR':
+            return {
+                'url': 'https://www.cookstr.com/recipes/' + slug,
+                'title': c['title'],
+                'chef': c['author'] if rng.random() < 0.8 else '',
+                'description': c['description'],
+                'cooking_method': rng.choice(_COOKING_METHODS),
+                'date_modified': c['date'].isoformat(),
+                'ingredients': c['ingredients'],
+                'instructions': c['instructions'],
+                'rating_value': _round(c['rating'], 1) if c['reviews'] else 0,
+                'rating_count': c['reviews'],
+            }
+        raise ValueError('unknown data set \'{}\''.format(data_set))
+
+    def records(self, data_set: str, n: int, *, start: int = 0) -> Iterator[dict]:
+        """ Yields the records ``start`` to ``start + n`` of ``data_set``. """
+        for number in range(start, start + n):
+            yield self.record(data_set, number)
+
+
+def write_foods(path: Union[str, Path], foods: int = 10000, *, seed: int = 0, **kwargs) -> int:
+    """Writes the detail payload of every food of a catalog to ``path``, one per line.
+
+    Args:
+        path: Location of the output
+        foods: Number of foods in the catalog
+        seed: Seed of the catalog
+        **kwargs: Passed on to ``utils.RecordWriter``, e.g. ``compression``
+
+    Returns:
+        The number of foods written
+    """
+    with utils.RecordWriter(path, **kwargs) as writer:
+        for detail in FoodDataGenerator(seed, foods=foods).details():
+            writer.write_json(detail)
+        return writer.records
+
+
+def write_recipes(directory: Union[str, Path], recipes: int = 10000, *, seed: int = 0,
+                  data_sets: Iterable[str] = RecipeGenerator.DATA_SETS, **kwargs) -> Dict[str, Path]:
+    """Writes ``recipes`` records of each of ``data_sets`` to ``directory``.
+
+    The files are named like those of ``to_jsonld.DataSet``, e.g.
+    ``cookstr-recipes.json``, with the suffix of ``compression`` if any.
+
+    Args:
+        directory: Location of the output
+        recipes: Number of records per data set
+        seed: Seed of the corpus
+        data_sets: Names of the data sets
+        **kwargs: Passed on to ``utils.RecordWriter``, e.g. ``compression``
+
+    Returns:
+        The path of the file of each data set
+    """
+    generator = RecipeGenerator(seed)
+    suffix = utils.COMPRESSIONS.get(kwargs.get('compression'), '')
+    paths = {}
+    for data_set in data_sets:
+        path = paths[data_set] = Path(directory) / '{}-recipes.json{}'.format(data_set.lower(), suffix)
+        with utils.RecordWriter(path, **kwargs) as writer:
+            for record in generator.records(data_set, recipes):
+                writer.write_json(record)
+    return paths
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Writes synthetic FoodData Central foods and recipes.')
+    parser.add_argument('directory', type=Path)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--foods', type=int, default=10000, help='number of foods, written to foods.json')
+    parser.add_argument('--recipes', type=int, default=10000, help='number of recipes per data set')
+    parser.add_argument('--compression', choices=tuple(utils.COMPRESSIONS))
+    args = parser.parse_args()
+
+    args.directory.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    suffix = utils.COMPRESSIONS.get(args.compression, '')
+    count = write_foods(args.directory / ('foods.json' + suffix), args.foods, seed=args.seed,
+                        compression=args.compression)
+    print('{} foods in {:.1f}s'.format(count, time.perf_counter() - start))
+    start = time.perf_counter()
+    paths = write_recipes(args.directory, args.recipes, seed=args.seed, compression=args.compression)
+    print('{} recipes in {:.1f}s'.format(args.recipes * len(paths), time.perf_counter() - start))
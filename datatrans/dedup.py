@@ -0,0 +1,300 @@
+"""Near-duplicate recipe detection with MinHash and locality-sensitive hashing
+
+Recipes are compared on the shingles (word n-grams) of their normalized
+``name`` and ``recipeIngredient``. Each recipe gets a MinHash signature
+whose positions agree with another signature's with a probability equal
+to the Jaccard similarity of their shingle sets. Signatures are cut into
+bands, and only recipes sharing a whole band with one kept before are
+compared, so that finding duplicates takes roughly linear time.
+
+References:
+    https://en.wikipedia.org/wiki/MinHash
+    Leskovec, Rajaraman and Ullman, Mining of Massive Datasets, ch. 3
+    http://www.mmds.org/
+"""
+import re
+import zlib
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+__all__ = ['normalize', 'shingles', 'lsh_parameters', 'MinHasher', 'Deduplicator']
+
+# quantities and units, which differ between sites for the same recipe
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'or', 'of', 'to', 'the', 'for', 'in', 'into', 'about', 'plus', 'more', 'taste', 'optional',
+    'cup', 'cups', 'c', 'tablespoon', 'tablespoons', 'tbsp', 'tbs', 'teaspoon', 'teaspoons', 'tsp',
+    'ounce', 'ounces', 'oz', 'pound', 'pounds', 'lb', 'lbs', 'g', 'gram', 'grams', 'kg', 'ml', 'l', 'litre',
+    'liter', 'pint', 'pints', 'quart', 'quarts', 'pinch', 'dash', 'clove', 'cloves', 'can', 'cans',
+    'large', 'medium', 'small', 'whole', 'fresh', 'freshly', 'chopped', 'finely', 'sliced', 'diced', 'minced',
+))
+
+_WORD = re.compile(r'[^\W\d_]+')
+
+Key = Hashable
+
+
+def normalize(text: str) -> List[str]:
+    """Returns the words of ``text`` that tell recipes apart.
+
+    Examples:
+        >>> normalize('2 ¾ cups all-purpose Flour, sifted')
+        ['all', 'purpose', 'flour', 'sifted']
+    """
+    return [word for word in _WORD.findall(text.lower()) if word not in STOPWORDS and word.isalpha()]
+
+
+def shingles(name: Optional[str], ingredients: Union[str, Iterable[str], None], size: int = 2) -> Set[str]:
+    """Returns the word ``size``-grams of the name and of each ingredient.
+
+    Shingles do not span ingredients, so that their order does not
+    matter. Texts shorter than ``size`` words give one shingle.
+
+    Examples:
+        >>> sorted(shingles('Coffee Cake', ['2 cups flour', '1 cup brown sugar']))
+        ['brown sugar', 'coffee cake', 'flour']
+    """
+    if isinstance(ingredients, str):
+        ingredients = (ingredients,)
+    result = set()
+    for text in (name or '', *(ingredients or ())):
+        words = normalize(text)
+        if len(words) <= size:
+            if words:
+                result.add(' '.join(words))
+            continue
+        result.update(map(' '.join, zip(*(words[i:] for i in range(size)))))
+    return result
+
+
+def lsh_parameters(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Returns the ``(bands, rows)`` whose similarity threshold is closest to ``threshold``.
+
+    Pairs of similarity ``s`` share at least one band with probability
+    ``1 - (1 - s ** rows) ** bands``, which rises steeply around
+    ``(1 / bands) ** (1 / rows)``.
+
+    Examples:
+        >>> lsh_parameters(128, 0.8)
+        (11, 11)
+    """
+    return min(((bands, num_perm // bands) for bands in range(1, num_perm + 1)),
+               key=lambda br: (abs((1 / br[0]) ** (1 / br[1]) - threshold), -br[0] * br[1]))
+
+
+class MinHasher:
+    """Computes MinHash signatures.
+
+    Shingles are hashed with CRC-32, then permuted by ``num_perm``
+    multiply-shift hash functions ``(a * x + b) >> 32`` on 64-bit
+    integers.
+
+    Args:
+        num_perm: Length of the signatures
+        shingle_size: Number of words per shingle
+        seed: Seed of the hash functions. Signatures are only comparable
+            between hashers of the same ``num_perm`` and ``seed``.
+    """
+
+    __slots__ = ('num_perm', 'shingle_size', '_a', '_b')
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 2, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = (rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) << np.uint64(1) | np.uint64(1))[:, None]
+        self._b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)[:, None]
+
+    def hash_shingles(self, name: Optional[str], ingredients: Union[str, Iterable[str], None]) -> np.ndarray:
+        """ Returns the hashes of the shingles of a recipe, see ``shingles``. """
+        return np.array([zlib.crc32(shingle.encode('utf-8'))
+                         for shingle in shingles(name, ingredients, self.shingle_size)], dtype=np.uint64)
+
+    def signatures(self, hashes: Sequence[np.ndarray], block_size: int = 1 << 16) -> np.ndarray:
+        """Returns the signatures of many shingle hash sets at once.
+
+        Args:
+            hashes: Non-empty arrays of shingle hashes, see
+                ``hash_shingles``
+            block_size: Approximate number of shingles hashed at a time
+
+        Returns:
+            A ``(len(hashes), num_perm)`` array
+        """
+        result = np.empty((len(hashes), self.num_perm), dtype=np.uint32)
+        start = 0
+        while start < len(hashes):
+            end = start
+            size = 0
+            while end < len(hashes) and (size == 0 or size + len(hashes[end]) <= block_size):
+                size += len(hashes[end])
+                end += 1
+            values = np.concatenate(hashes[start:end])
+            offsets = np.cumsum([0] + [len(h) for h in hashes[start:end - 1]])
+            # the minimum of each record's shingles, under every permutation
+            permuted = (self._a * values + self._b) >> np.uint64(32)
+            result[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+            start = end
+        return result
+
+
+class Deduplicator:
+    """Finds the recipes that are near-duplicates of one seen before.
+
+    Recipes are added one at a time (or in batches with ``add_all``),
+    in order; the first of a group of near-duplicates is kept and the
+    others are reported as duplicates of it. Recipes without any shingle
+    are always kept.
+
+    Args:
+        threshold: Minimum estimated Jaccard similarity of duplicates
+        num_perm: Length of the MinHash signatures. Longer signatures
+            estimate similarity more precisely but take more memory
+            (4 bytes per position per kept recipe).
+        shingle_size: Number of words per shingle
+        bands: Optional. Number of LSH bands, chosen after ``threshold``
+            by default (see ``lsh_parameters``)
+        seed: Seed of the hash functions
+
+    Attributes:
+        records (int): Number of recipes added
+        duplicates (int): Number of recipes found to be duplicates
+        clusters (Dict[Key, List[Key]]): Keys of the duplicates of each
+            kept recipe that has any
+
+    Examples:
+        >>> deduplicator = Deduplicator(threshold=0.6)
+        >>> deduplicator.add('a', 'Classic Coffee Cake', ['2 cups flour', '1 cup brown sugar', '2 large eggs'])
+        >>> deduplicator.add('b', 'Apple Pie', ['6 apples', '1 pie crust', '1/2 cup white sugar'])
+        >>> deduplicator.add('c', 'Classic coffee cake', ['2 c. flour', '1 c brown sugar', '2 eggs'])
+        'a'
+        >>> deduplicator.clusters
+        {'a': ['c']}
+    """
+
+    def __init__(self, threshold: float = 0.8, *, num_perm: int = 128, shingle_size: int = 2, bands: int = None,
+                 seed: int = 1):
+        if not 0 < threshold <= 1:
+            raise ValueError('threshold should be in (0, 1]')
+        self.threshold = threshold
+        self.bands, self.rows = lsh_parameters(num_perm, threshold) if bands is None else (bands, num_perm // bands)
+        if self.rows < 1:
+            raise ValueError('more bands than num_perm')
+        self.hasher = MinHasher(self.bands * self.rows, shingle_size, seed)
+        self.records = 0
+        self.duplicates = 0
+        self.clusters: Dict[Key, List[Key]] = {}
+        self._band_weights = np.random.default_rng(seed).integers(1, 1 << 63, self.rows, dtype=np.uint64)
+        self._buckets: List[Dict[int, Union[int, List[int]]]] = [{} for _ in range(self.bands)]
+        self._kept: List[Key] = []
+        self._signatures = np.empty((1024, self.hasher.num_perm), dtype=np.uint32)
+
+    def _band_keys(self, signatures: np.ndarray) -> List[List[int]]:
+        """ Returns a hash of each band of each signature. """
+        bands = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        # wraps around modulo 2 ** 64
+        return (bands * self._band_weights).sum(axis=2, dtype=np.uint64).tolist()
+
+    def _add(self, key: Key, signature: Optional[np.ndarray], band_keys: Optional[List[int]]) -> Optional[Key]:
+        self.records += 1
+        if signature is None:
+            return None
+        candidates = set()
+        for bucket, band_key in zip(self._buckets, band_keys):
+            found = bucket.get(band_key)
+            if found is None:
+                continue
+            if type(found) is list:
+                candidates.update(found)
+            else:
+                candidates.add(found)
+        if candidates:
+            indexes = np.fromiter(sorted(candidates), dtype=np.intp, count=len(candidates))
+            similarities = np.count_nonzero(self._signatures[indexes] == signature, axis=1) / signature.size
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                representative = self._kept[indexes[best]]
+                self.clusters.setdefault(representative, []).append(key)
+                self.duplicates += 1
+                return representative
+
+        index = len(self._kept)
+        if index == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+        self._signatures[index] = signature
+        self._kept.append(key)
+        for bucket, band_key in zip(self._buckets, band_keys):
+            found = bucket.get(band_key)
+            if found is None:
+                bucket[band_key] = index
+            elif type(found) is list:
+                found.append(index)
+            else:
+                bucket[band_key] = [found, index]
+        return None
+
+    def add(self, key: Key, name: Optional[str], ingredients: Union[str, Iterable[str], None]) -> Optional[Key]:
+        """Adds a recipe.
+
+        Args:
+            key: Identifies the recipe in ``clusters``, e.g.
+                ``(source, line_number)``
+            name: ``name`` of the recipe
+            ingredients: ``recipeIngredient`` of the recipe
+
+        Returns:
+            The key of the kept recipe ``key`` is a duplicate of, or None
+            if it is kept
+        """
+        return next(self.add_all(((key, name, ingredients),)))[1]
+
+    def add_all(self, recipes: Iterable[Tuple[Key, Optional[str], Union[str, Iterable[str], None]]],
+                batch_size: int = 4096) -> Iterator[Tuple[Key, Optional[Key]]]:
+        """Adds many recipes, computing their signatures in batches.
+
+        Args:
+            recipes: ``(key, name, ingredients)`` of each recipe, see
+                ``add``
+            batch_size: Number of recipes per batch
+
+        Yields:
+            ``(key, representative)`` of each recipe, in order, where
+            ``representative`` is as returned by ``add``
+        """
+        recipes = iter(recipes)
+        while True:
+            batch = [(key, self.hasher.hash_shingles(name, ingredients))
+                     for key, name, ingredients in _take(recipes, batch_size)]
+            if not batch:
+                return
+            hashed = [hashes for _, hashes in batch if len(hashes)]
+            signatures = self.hasher.signatures(hashed)
+            band_keys = iter(self._band_keys(signatures))
+            signatures = iter(signatures)
+            for key, hashes in batch:
+                if len(hashes):
+                    yield key, self._add(key, next(signatures), next(band_keys))
+                else:
+                    yield key, self._add(key, None, None)
+
+    def report(self) -> dict:
+        """ Returns the number of recipes and the clusters of duplicates as a JSON serializable dict. """
+        return {
+            'records': self.records,
+            'kept': self.records - self.duplicates,
+            'duplicates': self.duplicates,
+            'threshold': self.threshold,
+            'bands': self.bands,
+            'rows': self.rows,
+            'clusters': [{'kept': key, 'duplicates': duplicates}
+                         for key, duplicates in sorted(self.clusters.items(), key=lambda item: -len(item[1]))],
+        }
+
+
+def _take(iterator: Iterator, n: int) -> list:
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) == n:
+            break
+    return batch
@@ -1,3 +1,22 @@
-from datatrans.fooddata import api
-from datatrans.fooddata import detail
-from datatrans.fooddata import search
+"""FoodData Central data classes and API client
+
+The submodules are imported when first used (PEP 562) rather than with
+the package, so that parsing saved payloads with ``detail`` or
+``search`` does not import ``requests``, which only ``api`` needs.
+"""
+import importlib
+
+__all__ = ['api', 'detail', 'instrumentation', 'mirror', 'search']
+
+
+def __getattr__(name: str):
+    if name == 'response':
+        # was ``search.response`` when the submodules were imported eagerly
+        return importlib.import_module('.search.response', __name__)
+    if name in __all__:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module \'{}\' has no attribute \'{}\''.format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
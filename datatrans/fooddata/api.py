@@ -3,20 +3,96 @@
 References:
     https://fdc.nal.usda.gov/api-guide.html
 """
-import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Hashable, Iterable, Optional, TypeVar, Union
+from urllib.parse import urlencode
 
-import decouple
 import requests
+import requests.adapters
 
 from datatrans import utils
 from datatrans.fooddata import search
+from datatrans.fooddata.instrumentation import Instrumentation, RequestEnd, RequestStart
 
-__all__ = ['send_food_search_api_request', 'send_food_detail_api_request']
+if TYPE_CHECKING:
+    from datatrans.fooddata import detail
+
+__all__ = ['API_URL', 'INSTRUMENTATION', 'send_food_search_api_request', 'send_food_detail_api_request',
+           'send_foods_api_request', 'conditional_headers', 'FoodDataClient']
+
+_DEFAULT_API_URL = 'https://api.nal.usda.gov/fdc/v1'
+
+T = TypeVar('T')
+
+# Instrumentation of the requests of this module, and of the clients by default
+INSTRUMENTATION = Instrumentation()
+
+# formats of the payloads of the Food Detail and Foods endpoints
+_DETAIL_FORMATS = ('full', 'abridged')
+# most nutrients the ``nutrients`` filter takes
+_MAX_NUTRIENTS = 25
+
+
+def _config(option: str, default: str) -> str:
+    """ Returns the setting ``option``, read from the environment or ``.env`` when first needed, not on import. """
+    import decouple
+    return decouple.config(option, default)
+
+
+def _api_key(api_key: Optional[str]) -> str:
+    return api_key or _config('DATA_GOV_API_KEY', 'MY_API_KEY')
+
+
+def _api_url(api_url: Optional[str]) -> str:
+    return api_url or _config('FDC_API_URL', _DEFAULT_API_URL)
+
+
+def __getattr__(name: str):
+    # ``API_URL``, the base URL of the API, e.g. of a local stub (see
+    # ``benchmarks.stub``), is only read from the settings when used
+    if name == 'API_URL':
+        return _api_url(None)
+    raise AttributeError('module \'{}\' has no attribute \'{}\''.format(__name__, name))
+
+
+def _send(session, method: str, endpoint: str, url: str, instrumentation: Instrumentation,
+          **kwargs) -> requests.Response:
+    """ Sends a request with ``session`` (or ``requests``), recording it in ``instrumentation``. """
+    bytes_sent = len(kwargs.get('data') or b'')
+    start = instrumentation.request_started(RequestStart(endpoint, method, url))
+    try:
+        response = session.request(method, url, **kwargs)
+    except requests.RequestException as e:
+        instrumentation.request_ended(RequestEnd(endpoint, method, url, None, time.perf_counter() - start,
+                                                 bytes_sent, 0, e))
+        raise
+    instrumentation.request_ended(RequestEnd(endpoint, method, url, response.status_code,
+                                             time.perf_counter() - start, bytes_sent, len(response.content)))
+    return response
+
+
+def _detail_params(format: Optional[str], nutrients: Optional[Iterable[Union[int, str]]]) -> dict:
+    """ Returns the ``format`` and ``nutrients`` parameters of a Food Detail or Foods request, if given. """
+    params = {}
+    if format is not None:
+        if format not in _DETAIL_FORMATS:
+            raise ValueError('invalid format \'{}\', expected one of {}'.format(format, _DETAIL_FORMATS))
+        params['format'] = format
+    if nutrients is not None:
+        nutrients = [int(number) for number in nutrients]
+        if not 0 < len(nutrients) <= _MAX_NUTRIENTS:
+            raise ValueError('between 1 and {} nutrients can be requested, not \'{}\''
+                             .format(_MAX_NUTRIENTS, len(nutrients)))
+        params['nutrients'] = nutrients
+    return params
 
 
 def send_food_search_api_request(
         criteria: search.request.FoodSearchCriteria,
-        *, api_key: str = decouple.config('DATA_GOV_API_KEY', 'MY_API_KEY')
+        *, api_key: str = None, api_url: str = None
 ) -> requests.Response:
     """Send a Food Search Endpoint request.
 
@@ -31,9 +107,12 @@ def send_food_search_api_request(
             page_number (int): The page of results to return
             sort_field (SortField): The name of the field by which to sort
             sort_direction (SortDirection): The direction of the sorting
-        api_key: Required. Must be a data.gov registered API key.
+        api_key: Optional. Must be a data.gov registered API key, defaults
+            to the ``DATA_GOV_API_KEY`` setting.
+        api_url: Optional. Base URL of the API, defaults to ``API_URL``
     """
-    url = 'https://api.nal.usda.gov/fdc/v1/search'
+    url = _api_url(api_url) + '/search'
+    api_key = _api_key(api_key)
     data = {utils.snake_to_camel(k): v for k, v in criteria.items() if v is not None}
 
     if not data:
@@ -41,24 +120,286 @@ def send_food_search_api_request(
     if api_key == 'MY_API_KEY':
         raise UserWarning('Invalid API key, configure API key in .env first')
 
-    return requests.post(url, params={'api_key': api_key},
-                         data=json.dumps(data, cls=utils.JSONEncoder),
-                         headers={'Content-Type': 'application/json'})
+    return _send(requests, 'POST', 'search', url, INSTRUMENTATION, params={'api_key': api_key},
+                 data=utils.dumpb(data),
+                 headers={'Content-Type': 'application/json'})
 
 
 def send_food_detail_api_request(
         fdc_id: int,
-        *, api_key: str = decouple.config('DATA_GOV_API_KEY', 'MY_API_KEY')
+        *, format: str = None, nutrients: Iterable[Union[int, str]] = None,
+        api_key: str = None, api_url: str = None
 ) -> requests.Response:
     """Send a Food Detail Endpoint request.
 
     Args:
-        fdc_id: Required. Must be a data.gov registered API key.
-        api_key: Required. Unique identifier for the food.
+        fdc_id: Required. Unique identifier for the food.
+        format: Optional. ``'abridged'`` for the abridged payload, with
+            the description, identifiers and nutrient amounts of the food
+            only, or ``'full'`` (the default of the API)
+        nutrients: Optional. Numbers of up to 25 nutrients (e.g. 203 for
+            protein) to return the amounts of, all by default
+        api_key: Optional. Must be a data.gov registered API key, defaults
+            to the ``DATA_GOV_API_KEY`` setting.
+        api_url: Optional. Base URL of the API, defaults to ``API_URL``
+
+    Raises:
+        ValueError: When ``format`` or the number of ``nutrients`` is invalid
+    """
+    url = _api_url(api_url) + '/' + str(fdc_id)
+    params = _detail_params(format, nutrients)
+    params['api_key'] = _api_key(api_key)
+    return _send(requests, 'GET', 'food', url, INSTRUMENTATION, params=params,
+                 headers={'Content-Type': 'application/json'})
+
+
+def send_foods_api_request(
+        fdc_ids: Iterable[int],
+        *, format: str = None, nutrients: Iterable[Union[int, str]] = None,
+        api_key: str = None, api_url: str = None
+) -> requests.Response:
+    """Send a Foods Endpoint request, for the details of several foods at once.
+
+    Args:
+        fdc_ids: Required. Unique identifiers of the foods.
+        format: Optional. See ``send_food_detail_api_request``
+        nutrients: Optional. See ``send_food_detail_api_request``
+        api_key: Optional. Must be a data.gov registered API key, defaults
+            to the ``DATA_GOV_API_KEY`` setting.
+        api_url: Optional. Base URL of the API, defaults to ``API_URL``
+
+    Raises:
+        ValueError: When ``format`` or the number of ``nutrients`` is invalid
+    """
+    url = _api_url(api_url) + '/foods'
+    data = {'fdcIds': list(fdc_ids), **_detail_params(format, nutrients)}
+    return _send(requests, 'POST', 'foods', url, INSTRUMENTATION, params={'api_key': _api_key(api_key)},
+                 data=utils.dumpb(data),
+                 headers={'Content-Type': 'application/json'})
+
+
+def conditional_headers(etag: str = None, last_modified: str = None) -> dict:
+    """Returns the headers of a request revalidating a response with its ``ETag`` and ``Last-Modified``.
+
+    Examples:
+        >>> conditional_headers('"5d8c72a5"', None)
+        {'If-None-Match': '"5d8c72a5"'}
     """
-    url = 'https://api.nal.usda.gov/fdc/v1/' + str(fdc_id)
-    return requests.get(url, params={'api_key': api_key},
-                        headers={'Content-Type': 'application/json'})
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
+
+
+class FoodDataClient:
+    """Client of the FoodData Central API for crawling many foods.
+
+    Compared to the ``send_*`` functions, the client:
+
+    - reuses its connections, up to ``pool_size`` at once, so it can be
+      shared by that many threads
+    - retries requests that fail with a connection error, a timeout,
+      a 429 or a 5xx, after the ``Retry-After`` of the response or an
+      exponential backoff with jitter
+    - caches up to ``cache_size`` successful responses, least recently
+      used first out, and revalidates them when asked to with their
+      ``ETag`` or ``Last-Modified`` (see ``request``)
+    - coalesces identical requests made at once by several threads into
+      one, whose response they share, and ``food_detail`` calls into
+      one, whose parsed response they share
+
+    Every request, retries included, is recorded in ``instrumentation``.
+
+    Args:
+        api_key: Optional. data.gov API key, defaults to the
+            ``DATA_GOV_API_KEY`` setting
+        api_url: Optional. Base URL of the API, defaults to ``API_URL``
+        retries: Number of times a request is sent again at most
+        backoff: Seconds before the first retry; doubles at each retry
+        max_backoff: Most seconds between retries
+        timeout: Seconds to wait for a response
+        cache_size: Number of responses cached, 0 to disable the cache
+        pool_size: Number of connections kept open
+        coalesce: Whether to coalesce identical requests in flight
+        instrumentation: Optional. Defaults to ``INSTRUMENTATION``
+    """
+
+    RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+    def __init__(self, api_key: str = None, *, api_url: str = None, retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 30.0, timeout: float = 30.0, cache_size: int = 1024, pool_size: int = 10,
+                 coalesce: bool = True, instrumentation: Instrumentation = None):
+        self.api_key = _api_key(api_key)
+        self.api_url = _api_url(api_url)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.coalesce = coalesce
+        self.instrumentation = instrumentation if instrumentation is not None else INSTRUMENTATION
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Content-Type'] = 'application/json'
+        self._cache: 'OrderedDict[Hashable, requests.Response]' = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # the keys of the calls in flight start with their endpoint
+        self._flights = utils.SingleFlight(on_shared=lambda key: self.instrumentation.coalesced(key[0]))
+
+    def __enter__(self) -> 'FoodDataClient':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """ Closes the connections. """
+        self.session.close()
+
+    def search(self, criteria: search.request.FoodSearchCriteria) -> requests.Response:
+        """ Sends a Food Search Endpoint request, see ``send_food_search_api_request``. """
+        data = {utils.snake_to_camel(k): v for k, v in criteria.items() if v is not None}
+        if not data:
+            raise ValueError('No criteria to search')
+        return self.request('POST', 'search', '/search', data=utils.dumpb(data))
+
+    def food(self, fdc_id: int, *, format: str = None, nutrients: Iterable[Union[int, str]] = None,
+             revalidate: bool = False) -> requests.Response:
+        """ Sends a Food Detail Endpoint request, see ``send_food_detail_api_request`` and ``request``. """
+        path = '/' + str(fdc_id)
+        params = _detail_params(format, nutrients)
+        if params:
+            # in the path, so that each projection of the food is cached apart
+            path += '?' + urlencode(params, doseq=True)
+        return self.request('GET', 'food', path, revalidate=revalidate)
+
+    def foods(self, fdc_ids: Iterable[int], *, format: str = None, nutrients: Iterable[Union[int, str]] = None,
+              revalidate: bool = False) -> requests.Response:
+        """ Sends a Foods Endpoint request, see ``send_foods_api_request`` and ``request``. """
+        data = {'fdcIds': list(fdc_ids), **_detail_params(format, nutrients)}
+        return self.request('POST', 'foods', '/foods', data=utils.dumpb(data), revalidate=revalidate)
+
+    def food_detail(self, fdc_id: int, *, format: str = None, nutrients: Iterable[Union[int, str]] = None,
+                    revalidate: bool = False,
+                    data_type: 'search.request.FoodDataType' = None) -> 'detail.response.FoodDetailResponse':
+        """Sends a Food Detail Endpoint request, see ``food``, and parses its response.
+
+        Identical calls made at once share the request and the parsed
+        response, unless ``coalesce`` is False.
+
+        Args:
+            data_type: Optional. See ``detail.response.parse_food``
+
+        Raises:
+            requests.HTTPError: When the API answered with an error
+        """
+        # imported when used, so that the other requests do not import the detail classes
+        from datatrans.fooddata.detail.response import FoodDetailResponse
+
+        nutrients = tuple(nutrients) if nutrients is not None else None
+
+        def fetch() -> FoodDetailResponse:
+            response = self.food(fdc_id, format=format, nutrients=nutrients, revalidate=revalidate)
+            response.raise_for_status()
+            return FoodDetailResponse(response, data_type=data_type)
+
+        return self._coalesce(('food', 'food_detail', fdc_id, format, nutrients, revalidate, data_type), fetch)
+
+    def _coalesce(self, key: tuple, function: Callable[..., T], *args) -> T:
+        """ Returns ``function(*args)``, shared with the identical calls in flight if ``coalesce``. """
+        if not self.coalesce:
+            return function(*args)
+        return self._flights.do(key, function, *args)[0]
+
+    def request(self, method: str, endpoint: str, path: str, *, data: bytes = None, headers: dict = None,
+                revalidate: bool = False) -> requests.Response:
+        """Sends a request to ``path`` under ``api_url``, or returns its cached response.
+
+        A response is revalidated rather than returned from the cache
+        when ``revalidate``: the request is sent with the
+        ``If-None-Match`` and ``If-Modified-Since`` headers of the
+        ``ETag`` and ``Last-Modified`` of the cached response, if it has
+        them, and the cached response is returned again if the API
+        answers ``304 Not Modified``.
+
+        Args:
+            method: HTTP method
+            endpoint: Name of the endpoint in the metrics
+            path: Path of the endpoint, from ``api_url``
+            data: Optional. Body of the request
+            headers: Optional. Headers of the request, e.g.
+                ``conditional_headers`` of a copy of the response kept
+                elsewhere. The cache is not looked up for requests with
+                headers, as the API may answer them with a 304.
+            revalidate: Whether to revalidate the cached response
+
+        Returns:
+            The response, the last one if every retry failed
+
+        Raises:
+            requests.RequestException: When the last retry got no response
+        """
+        key = (method, path, data)
+        cached = None
+        if self.cache_size and not headers:
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+            self.instrumentation.cache_lookup(endpoint, hit=cached is not None)
+            if cached is not None:
+                if not revalidate:
+                    return cached
+                headers = conditional_headers(cached.headers.get('ETag'), cached.headers.get('Last-Modified'))
+
+        response = self._coalesce((endpoint,) + key + (tuple(sorted(headers.items())) if headers else None,),
+                                  self._fetch, key, method, endpoint, path, data, headers)
+        if response.status_code == 304 and cached is not None:
+            return cached
+        return response
+
+    def _fetch(self, key: Hashable, method: str, endpoint: str, path: str, data: Optional[bytes],
+               headers: Optional[dict]) -> requests.Response:
+        response = self._send_with_retries(method, endpoint, self.api_url + path, data, headers)
+        if self.cache_size and response.status_code == 200:
+            with self._cache_lock:
+                self._cache[key] = response
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return response
+
+    def _send_with_retries(self, method: str, endpoint: str, url: str, data: Optional[bytes],
+                           headers: Optional[dict] = None) -> requests.Response:
+        for attempt in range(self.retries + 1):
+            try:
+                response = _send(self.session, method, endpoint, url, self.instrumentation,
+                                 params={'api_key': self.api_key}, data=data, headers=headers,
+                                 timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise
+                reason, delay = type(e).__name__, self._backoff(attempt)
+            else:
+                if response.status_code not in self.RETRY_STATUSES or attempt == self.retries:
+                    return response
+                reason, delay = str(response.status_code), self._retry_after(response, attempt)
+            self.instrumentation.retried(endpoint, reason)
+            time.sleep(delay)
+
+    def _backoff(self, attempt: int) -> float:
+        """ Returns the exponential backoff of ``attempt`` with "equal jitter". """
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _retry_after(self, response: requests.Response, attempt: int) -> float:
+        try:
+            return min(self.max_backoff, float(response.headers['Retry-After']))
+        except (KeyError, ValueError):
+            return self._backoff(attempt)
 
 
 if __name__ == '__main__':
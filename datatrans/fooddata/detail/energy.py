@@ -0,0 +1,123 @@
+"""Batch calorie computation for FoodData Central foods
+
+Energy is computed per 100 g of food from the macronutrient amounts in
+``food_nutrients``, weighted by the food's ``CalorieConversionFactor``
+(as found in ``nutrient_conversion_factors`` of ``FoundationFood`` and
+``SrLegacyFood``). Foods without specific factors fall back to the
+general Atwater factors.
+
+The work is done on whole arrays at once so that a full catalog can be
+converted in a single pass.
+
+References:
+    https://fdc.nal.usda.gov/portal-data/external/dataDictionary
+    https://www.ars.usda.gov/ARSUserFiles/80400525/Data/Classics/ah74.pdf
+"""
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+from datatrans.fooddata.detail.nutrient import NutrientConversionFactorType
+from datatrans.structured_data import NutritionInformation
+from datatrans.structured_data.lower.quantity import Energy, EnergyUnit
+
+__all__ = ['PROTEIN', 'FAT', 'CARBOHYDRATE', 'ALCOHOL', 'ATWATER_FACTORS', 'nutrient_matrix',
+           'calorie_conversion_factors', 'compute_calories', 'to_nutrition_information']
+
+# Nutrient numbers as they appear in ``Nutrient.number``
+PROTEIN = '203'
+FAT = '204'
+CARBOHYDRATE = '205'  # by difference
+ALCOHOL = '221'
+
+MACRONUTRIENTS = (PROTEIN, FAT, CARBOHYDRATE, ALCOHOL)
+
+# kcal per gram, in the same order as ``MACRONUTRIENTS``
+ATWATER_FACTORS = (4.0, 9.0, 4.0, 7.0)
+
+
+def nutrient_matrix(foods: Sequence, numbers: Sequence[str]) -> np.ndarray:
+    """Returns the amounts of the nutrients ``numbers`` of every food.
+
+    Args:
+        foods: Foods with ``food_nutrients``
+        numbers: Nutrient numbers, one per column
+
+    Returns:
+        A ``(len(foods), len(numbers))`` array, NaN where a food does not
+        report the nutrient.
+    """
+    column = {number: i for i, number in enumerate(numbers)}
+    rows, cols, amounts = [], [], []
+    for row, food in enumerate(foods):
+        for food_nutrient in food.food_nutrients or ():
+            nutrient = food_nutrient.nutrient
+            if nutrient is None or food_nutrient.amount is None:
+                continue
+            col = column.get(nutrient.number)
+            if col is not None:
+                rows.append(row)
+                cols.append(col)
+                amounts.append(food_nutrient.amount)
+    matrix = np.full((len(foods), len(numbers)), np.nan)
+    matrix[rows, cols] = amounts
+    return matrix
+
+
+def calorie_conversion_factors(foods: Sequence) -> np.ndarray:
+    """Returns the calorie conversion factors of every food.
+
+    Factors missing from a food's ``CalorieConversionFactor`` (or foods
+    without one, e.g. ``BrandedFood``) are given the Atwater defaults.
+
+    Returns:
+        A ``(len(foods), 4)`` array of protein, fat, carbohydrate and
+        alcohol factors in kcal/g.
+    """
+    factors = np.tile(np.array(ATWATER_FACTORS), (len(foods), 1))
+    for row, food in enumerate(foods):
+        for factor in getattr(food, 'nutrient_conversion_factors', None) or ():
+            if factor.type is not NutrientConversionFactorType.CALORIE:
+                continue
+            for col, value in enumerate((factor.protein_value, factor.fat_value, factor.carbohydrate_value)):
+                if value is not None:
+                    factors[row, col] = value
+            break
+    return factors
+
+
+def compute_calories(foods: Sequence) -> np.ndarray:
+    """Returns the energy of every food in kcal per 100 g.
+
+    Missing macronutrients count as zero.
+
+    Examples:
+        >>> from datatrans.fooddata.detail import FoodNutrient, NutrientConversionFactor
+        >>> class Food:
+        ...     def __init__(self, nutrients, factors=()):
+        ...         self.food_nutrients = [FoodNutrient(_dict_={'nutrient': {'number': k}, 'amount': v})
+        ...                                for k, v in nutrients.items()]
+        ...         self.nutrient_conversion_factors = [NutrientConversionFactor(_dict_=f) for f in factors]
+        >>> compute_calories([
+        ...     Food({PROTEIN: 10, FAT: 10, CARBOHYDRATE: 10}),
+        ...     Food({PROTEIN: 0.85, FAT: 81.11, CARBOHYDRATE: 0.06},
+        ...          [{'type': '.CalorieConversionFactor', 'proteinValue': 4.27,
+        ...            'fatValue': 8.79, 'carbohydrateValue': 3.87}]),
+        ... ]).round(1).tolist()
+        [170.0, 716.8]
+    """
+    amounts = np.nan_to_num(nutrient_matrix(foods, MACRONUTRIENTS))
+    return np.einsum('ij,ij->i', amounts, calorie_conversion_factors(foods))
+
+
+def to_nutrition_information(foods: Sequence, ndigits: int = 0) -> List[NutritionInformation]:
+    """Returns a ``NutritionInformation`` per food with its ``calories``.
+
+    Args:
+        foods: Foods with ``food_nutrients``
+        ndigits: Precision of the calories
+    """
+    calories: Iterable[float] = compute_calories(foods).round(ndigits).tolist()
+    if ndigits <= 0:
+        calories = map(int, calories)
+    return [NutritionInformation(calories=Energy(value, EnergyUnit.CALORIE)) for value in calories]
@@ -9,7 +9,7 @@ from typing import List, Dict, Union
 
 from datatrans import utils
 from datatrans.fooddata.detail.base import IdMixin
-from datatrans.fooddata.detail.nutrient import FoodNutrient, NutrientConversionFactor
+from datatrans.fooddata.detail.nutrient import FoodNutrient, NutrientConversionFactor, parse_abridged_food_nutrient
 from datatrans.fooddata.search.request import FoodDataType
 from datatrans.utils.classes import JSONEnum as Enum
 
@@ -18,12 +18,16 @@ __all__ = ['FoodClass', 'FoodCategory', 'FoodCategoryInstance', 'FoodAttribute',
 
 
 def parse_fooddata_date(date_str: str) -> datetime.date:
-    """ Wrapper specific for fooddata's format """
+    """ Wrapper specific for fooddata's format, M/D/YYYY, or YYYY-MM-DD in abridged payloads """
+    if '-' in date_str:
+        return datetime.date.fromisoformat(date_str)
     return utils.fooddata.parse_date(date_str, sep='/', format='MDY')
 
 
 def parse_food_nutrients(data: List[Dict[str, Union[str, int, float]]]) -> List[FoodNutrient]:
-    return [FoodNutrient(_dict_=d) for d in data]
+    """ Parses the full food nutrients, or the flat ones of abridged payloads. """
+    return [FoodNutrient(_dict_=d) if 'nutrient' in d or 'number' not in d else parse_abridged_food_nutrient(d)
+            for d in data]
 
 
 def parse_label_nutrients(data: Dict[str, Dict[str, float]]) -> List[Dict[str, float]]:
@@ -384,20 +388,21 @@ class SrLegacyFood(utils.DataClass):
 
     def __init__(self, _dict_: dict = None, **kwargs):
         super().__init__(_dict_, **kwargs)
-        if self.food_class is not FoodClass.LEGACY:
+        # abridged payloads have neither food class nor table alias name
+        if self.food_class is not None and self.food_class is not FoodClass.LEGACY:
             raise ValueError('invalid value for \'{}\': \'{}\' \'{}\''
                              .format(self.__class__.__name__, 'food_class', self.food_class))
         if self.data_type is not FoodDataType.LEGACY:
             raise ValueError('invalid value for \'{}\': \'{}\' \'{}\''
                              .format(self.__class__.__name__, 'data_type', self.data_type))
-        if self.table_alias_name != 'sr_legacy_food':
+        if self.table_alias_name is not None and self.table_alias_name != 'sr_legacy_food':
             raise ValueError('invalid value for \'{}\': \'{}\' \'{}\''
                              .format(self.__class__.__name__, 'table_alias_name', self.table_alias_name))
 
     @property
     def common_names(self):
         """ Returns the common name if any, else None """
-        for attr in self.food_attributes:
+        for attr in self.food_attributes or ():
             if attr.food_attribute_type == FoodAttributeTypeInstance.COMMON_NAME.value:
                 return attr.value
 
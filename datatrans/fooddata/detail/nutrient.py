@@ -3,7 +3,7 @@ from datatrans.fooddata.detail.base import IdMixin
 from datatrans.utils.classes import JSONEnum as Enum
 
 __all__ = ['Nutrient', 'FoodNutrient', 'FoodNutrientDerivation', 'FoodNutrientSource', 'NutrientConversionFactorType',
-           'NutrientConversionFactor']
+           'NutrientConversionFactor', 'parse_abridged_food_nutrient']
 
 
 class Nutrient(IdMixin, utils.DataClass):
@@ -84,6 +84,32 @@ class FoodNutrient(IdMixin, utils.DataClass):
     )
 
 
+def parse_abridged_food_nutrient(data: dict) -> FoodNutrient:
+    """Returns the ``FoodNutrient`` of a nutrient of an abridged payload.
+
+    Abridged payloads (``format=abridged``) flatten the nutrient and its
+    derivation into the food nutrient, and leave out their ids.
+
+    Examples:
+        >>> food_nutrient = parse_abridged_food_nutrient({
+        ...     'number': '203', 'name': 'Protein', 'amount': 0.85, 'unitName': 'G',
+        ...     'derivationCode': 'A', 'derivationDescription': 'Analytical'})
+        >>> food_nutrient.nutrient.number, food_nutrient.amount, food_nutrient.food_nutrient_derivation.code
+        ('203', 0.85, 'A')
+    """
+    data = dict(data)
+    number = data.pop('number', None)
+    data['nutrient'] = {
+        'number': str(number) if number is not None else None,
+        'name': data.pop('name', None),
+        'unitName': data.pop('unitName', None),
+    }
+    code, description = data.pop('derivationCode', None), data.pop('derivationDescription', None)
+    if code is not None or description is not None:
+        data['foodNutrientDerivation'] = {'code': code, 'description': description}
+    return FoodNutrient(_dict_=data)
+
+
 class NutrientConversionFactorType(Enum):
     PROTEIN = '.ProteinConversionFactor'
     CALORIE = '.CalorieConversionFactor'
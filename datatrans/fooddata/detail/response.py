@@ -1,9 +1,55 @@
-import requests
+from typing import TYPE_CHECKING, List, Union
 
+from datatrans import utils
 from datatrans.fooddata.search.request import FoodDataType
 from .food import FoodClass, FoundationFood, SurveyFnddsFood, BrandedFood, SrLegacyFood
 
-__all__ = ['FoodDetailResponse']
+if TYPE_CHECKING:
+    # only annotates, so that parsing responses does not import requests
+    import requests
+
+__all__ = ['FoodDetailResponse', 'FoodsResponse', 'parse_food']
+
+Food = Union[FoundationFood, SurveyFnddsFood, BrandedFood, SrLegacyFood]
+
+_FOOD_CLASSES = {
+    FoodDataType.FOUNDATION: FoundationFood,
+    FoodDataType.SURVEY: SurveyFnddsFood,
+    FoodDataType.BRANDED: BrandedFood,
+    FoodDataType.LEGACY: SrLegacyFood,
+}
+
+
+def parse_food(data: dict, data_type: FoodDataType = None) -> Food:
+    """Returns the food of a detail payload, full or abridged.
+
+    Args:
+        data: The decoded payload of a food
+        data_type: Optional. The data type of the food, for payloads
+            without one, to tell SR Legacy foods from Foundation foods,
+            which share their food class
+
+    Raises:
+        ValueError: When neither the data type nor the food class of
+            the food is recognized
+    """
+    if 'dataType' in data:
+        try:
+            data_type = FoodDataType(data['dataType'])
+        except ValueError:
+            raise ValueError('\'dataType\' is not recognized') from None
+    if data_type is not None:
+        return _FOOD_CLASSES[data_type](_dict_=data)
+    # abridged payloads (format=abridged) always have a data type, full
+    # ones also have a food class
+    if data.get('foodClass') == FoodClass.FOUNDATION.value:
+        # SrLegacyFood requires its data type
+        return FoundationFood(_dict_=data)
+    if data.get('foodClass') == FoodClass.SURVEY.value:
+        return SurveyFnddsFood(_dict_=data)
+    if data.get('foodClass') == FoodClass.BRANDED.value:
+        return BrandedFood(_dict_=data)
+    raise ValueError('\'foodClass\' is not recognized')
 
 
 class FoodDetailResponse:
@@ -14,34 +60,32 @@ class FoodDetailResponse:
         'food',
     )
 
-    def __init__(self, response: requests.Response, **kwargs):
+    def __init__(self, response: 'requests.Response', **kwargs):
         """
 
         Args:
-            response: The Response returned by the FoodData Detail endpoint
+            response: The Response returned by the FoodData Detail
+                endpoint, with the full or the abridged payload
         """
         self.response = response
+        self.food = parse_food(utils.loads(response.content), kwargs.pop('data_type', None))
+
+
+class FoodsResponse:
+    """ FoodData Foods endpoint Response handler. """
 
-        data = response.json()
-        if data['foodClass'] == FoodClass.FOUNDATION.value:
-            data_type = kwargs.pop('data_type', None)
-            if data_type:
-                if data_type is FoodDataType.LEGACY:
-                    self.food = SrLegacyFood(_dict_=data)
-                    return
-                if data_type is FoodDataType.FOUNDATION:
-                    self.food = FoundationFood(_dict_=data)
-                    return
-            try:
-                self.food = SrLegacyFood(_dict_=data)
-            except ValueError as e:
-                try:
-                    self.food = FoundationFood(_dict_=data)
-                except ValueError as ee:
-                    raise ee from e
-        elif data['foodClass'] == FoodClass.SURVEY.value:
-            self.food = SurveyFnddsFood(_dict_=data)
-        elif data['foodClass'] == FoodClass.BRANDED.value:
-            self.food = BrandedFood(_dict_=data)
-        else:
-            raise ValueError('\'foodClass\' is not recognized')
+    __slots__ = (
+        'response',
+        'foods',
+    )
+
+    def __init__(self, response: 'requests.Response', **kwargs):
+        """
+
+        Args:
+            response: The Response returned by the FoodData Foods
+                endpoint, with the full or the abridged payloads
+        """
+        self.response = response
+        data_type = kwargs.pop('data_type', None)
+        self.foods: List[Food] = [parse_food(data, data_type) for data in utils.loads(response.content)]
@@ -0,0 +1,263 @@
+"""Nearest-neighbour search over food nutrient profiles
+
+Each food is represented by a vector of its nutrient amounts per 100 g.
+Every nutrient is standardized over the catalog and each vector is then
+scaled to unit length, so that the dot product of two vectors is the
+cosine similarity of their nutrient profiles.
+
+Exact search scans the catalog in blocks of rows with one matrix
+multiplication per block. For large catalogs, an approximate mode
+clusters the vectors (inverted file) and only scans the clusters
+closest to the query.
+"""
+import numbers
+from collections import Counter
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from datatrans.fooddata.detail.energy import nutrient_matrix
+from datatrans.fooddata.detail.food import BrandedFood, FoodCategory, FoodCategoryInstance
+
+__all__ = ['NutrientIndex']
+
+NO_CATEGORY = -1
+
+
+def _category_id(category: Union[FoodCategoryInstance, FoodCategory, None]) -> int:
+    if category is None:
+        return NO_CATEGORY
+    if isinstance(category, FoodCategoryInstance):
+        category = category.value
+    return category.id
+
+
+def _food_category_id(food) -> int:
+    category = getattr(food, 'food_category', None)
+    if category is None and isinstance(food, BrandedFood):
+        category = FoodCategoryInstance.BRANDED_FOOD_PRODUCTS_DATABASE
+    return _category_id(category)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """ Returns the indices of the ``k`` highest ``scores`` of each row, best first. """
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1)
+
+
+class NutrientIndex:
+    """Similarity index over the nutrient vectors of ``fooddata.detail`` foods.
+
+    Attributes:
+        nutrients (Tuple[str]): Nutrient numbers making up each vector
+        fdc_ids (np.ndarray): ``fdc_id`` of each indexed food
+        categories (np.ndarray): ``FoodCategory.id`` of each indexed food
+        vectors (np.ndarray): Normalized nutrient vectors, one row per food
+    """
+
+    __slots__ = ('nutrients', 'fdc_ids', 'categories', 'vectors', 'mean', 'scale', 'block_size',
+                 'centroids', 'lists', 'n_probe', '_positions')
+
+    def __init__(self, foods: Sequence, nutrients: Sequence[str] = None, *, max_nutrients: int = 64,
+                 approximate: bool = False, n_lists: int = None, n_probe: int = 8,
+                 block_size: int = 65536, seed: int = 0):
+        """
+
+        Args:
+            foods: Foods with ``fdc_id`` and ``food_nutrients``
+            nutrients: Optional. Nutrient numbers to compare foods on.
+                Defaults to the ``max_nutrients`` most reported ones.
+            approximate: Build an inverted file for approximate search
+            n_lists: Optional. Number of clusters of the inverted file.
+                Defaults to the square root of the number of foods.
+            n_probe: Number of clusters scanned per approximate query
+            block_size: Number of rows multiplied at once in exact search
+            seed: Seed of the clustering
+        """
+        if nutrients is None:
+            counts = Counter(food_nutrient.nutrient.number
+                             for food in foods
+                             for food_nutrient in food.food_nutrients or ()
+                             if food_nutrient.nutrient is not None and food_nutrient.amount is not None)
+            nutrients = [number for number, _ in counts.most_common(max_nutrients)]
+        self._build(np.fromiter((food.fdc_id for food in foods), dtype=np.int64, count=len(foods)),
+                    nutrient_matrix(foods, nutrients), nutrients,
+                    np.fromiter(map(_food_category_id, foods), dtype=np.int32, count=len(foods)),
+                    approximate=approximate, n_lists=n_lists, n_probe=n_probe, block_size=block_size, seed=seed)
+
+    @classmethod
+    def from_matrix(cls, fdc_ids: Sequence[int], matrix: np.ndarray, nutrients: Sequence[str],
+                    categories: Sequence[int] = None, **kwargs) -> 'NutrientIndex':
+        """Builds an index from nutrient amounts that are already in an array.
+
+        Args:
+            fdc_ids: ``fdc_id`` of each row of ``matrix``
+            matrix: Amounts per 100 g, NaN where missing, one column per nutrient
+            nutrients: Nutrient numbers of the columns of ``matrix``
+            categories: Optional. ``FoodCategory.id`` of each row
+            **kwargs: See ``__init__``
+        """
+        self = cls.__new__(cls)
+        if categories is None:
+            categories = np.full(len(fdc_ids), NO_CATEGORY)
+        self._build(np.asarray(fdc_ids, dtype=np.int64), np.asarray(matrix, dtype=float), nutrients,
+                    np.asarray(categories, dtype=np.int32), **kwargs)
+        return self
+
+    def _build(self, fdc_ids: np.ndarray, matrix: np.ndarray, nutrients: Sequence[str], categories: np.ndarray, *,
+               approximate: bool = False, n_lists: int = None, n_probe: int = 8,
+               block_size: int = 65536, seed: int = 0) -> None:
+        self.nutrients = tuple(nutrients)
+        self.fdc_ids = fdc_ids
+        self.categories = categories
+        self._positions = {fdc_id: i for i, fdc_id in enumerate(fdc_ids.tolist())}
+        self.block_size = block_size
+
+        with np.errstate(invalid='ignore'):
+            self.mean = np.nan_to_num(np.nanmean(matrix, axis=0)) if len(matrix) else np.zeros(len(self.nutrients))
+            scale = np.nan_to_num(np.nanstd(matrix, axis=0)) if len(matrix) else np.ones(len(self.nutrients))
+        self.scale = np.where(scale > 0, scale, 1.0)
+        self.vectors = self._normalize(matrix)
+
+        self.centroids = None
+        self.lists = None
+        self.n_probe = n_probe
+        if approximate:
+            self._build_inverted_file(n_lists or max(1, int(np.sqrt(len(matrix)))), seed)
+
+    def __len__(self):
+        return len(self.fdc_ids)
+
+    def _normalize(self, matrix: np.ndarray) -> np.ndarray:
+        """ Standardizes ``matrix`` (missing nutrients count as average) and scales rows to unit length. """
+        z = np.nan_to_num((matrix - self.mean) / self.scale).astype(np.float32)
+        norms = np.linalg.norm(z, axis=1, keepdims=True)
+        return z / np.where(norms > 0, norms, 1.0)
+
+    def _build_inverted_file(self, n_lists: int, seed: int, iterations: int = 10) -> None:
+        """ Clusters the vectors with spherical k-means. """
+        rng = np.random.default_rng(seed)
+        n_lists = min(n_lists, len(self))
+        if n_lists == 0:
+            self.centroids = np.empty((0, len(self.nutrients)), dtype=np.float32)
+            self.lists = []
+            return
+        sample = self.vectors[rng.choice(len(self), size=min(len(self), n_lists * 256), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.where(norms > 0, sums / np.where(norms > 0, norms, 1.0), centroids)
+        assignment = np.concatenate([np.argmax(self.vectors[i:i + self.block_size] @ centroids.T, axis=1)
+                                     for i in range(0, len(self), self.block_size)])
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+        self.centroids = centroids
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+
+    def vectorize(self, foods: Sequence) -> np.ndarray:
+        """ Returns the normalized nutrient vectors of foods, indexed or not. """
+        return self._normalize(nutrient_matrix(foods, self.nutrients))
+
+    def _search_rows(self, queries: np.ndarray, rows: Optional[np.ndarray], k: int,
+                     category: int) -> Tuple[np.ndarray, np.ndarray]:
+        """ Exact search over ``rows`` (or the whole catalog) in blocks. """
+        if rows is None:
+            blocks = (np.arange(i, min(i + self.block_size, len(self))) for i in range(0, len(self), self.block_size))
+        else:
+            blocks = (rows[i:i + self.block_size] for i in range(0, len(rows), self.block_size))
+        best_rows = np.empty((len(queries), 0), dtype=np.intp)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for block in blocks:
+            contiguous = rows is None
+            if category != NO_CATEGORY:
+                block = block[self.categories[block] == category]
+                contiguous = False
+            if len(block) == 0:
+                continue
+            if contiguous:
+                # a view, not a copy
+                scores = queries @ self.vectors[block[0]:block[-1] + 1].T
+            else:
+                scores = queries @ self.vectors[block].T
+            top = _top_k(scores, k)
+            best_rows = np.concatenate([best_rows, block[top]], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            if best_rows.shape[1] > k:
+                top = _top_k(best_scores, k)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+        return best_rows, best_scores
+
+    def search(self, queries: np.ndarray, k: int = 10, *,
+               category: Union[FoodCategoryInstance, FoodCategory] = None,
+               approximate: bool = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the ``k`` most similar foods of each normalized query vector.
+
+        Args:
+            queries: ``(m, len(nutrients))`` array, as returned by ``vectorize``
+            k: Number of neighbours
+            category: Optional. Only return foods of this category
+            approximate: Optional. Defaults to True when the index was
+                built with ``approximate=True``
+
+        Returns:
+            The row positions and the cosine similarities of the
+            neighbours, best first, each of shape ``(m, <= k)``.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        category = _category_id(category)
+        if approximate is None:
+            approximate = self.lists is not None
+        if not approximate:
+            return self._search_rows(queries, None, k, category)
+        if self.lists is None:
+            raise ValueError('index was built without approximate=True')
+
+        probes = _top_k(queries @ self.centroids.T, self.n_probe)
+        results = [self._search_rows(query[np.newaxis], np.concatenate([self.lists[i] for i in probe]), k, category)
+                   for query, probe in zip(queries, probes)]
+        width = max((rows.shape[1] for rows, _ in results), default=0)
+        best_rows = np.full((len(queries), width), -1, dtype=np.intp)
+        best_scores = np.full((len(queries), width), -np.inf, dtype=np.float32)
+        for i, (rows, scores) in enumerate(results):
+            best_rows[i, :rows.shape[1]] = rows[0]
+            best_scores[i, :scores.shape[1]] = scores[0]
+        return best_rows, best_scores
+
+    def most_similar(self, food, k: int = 10, *,
+                     category: Union[FoodCategoryInstance, FoodCategory] = None,
+                     approximate: bool = None) -> List[Tuple[int, float]]:
+        """Returns the ``k`` foods most nutritionally similar to ``food``.
+
+        Args:
+            food: An indexed ``fdc_id``, or any food with ``food_nutrients``
+            k: Number of neighbours
+            category: Optional. Only return foods of this category
+            approximate: Optional. See ``search``
+
+        Returns:
+            A list of ``(fdc_id, similarity)``, most similar first. The
+            food itself is excluded.
+
+        Examples:
+            >>> index = NutrientIndex.from_matrix([11, 12, 13], [[1.0, 2.0], [1.1, 2.1], [3.0, 0.5]], ['203', '204'])
+            >>> [(fdc_id, round(score, 2)) for fdc_id, score in index.most_similar(index.fdc_ids[0], 1)]
+            [(12, 0.99)]
+        """
+        if isinstance(food, numbers.Integral):
+            fdc_id = int(food)
+            query = self.vectors[self._positions[fdc_id]]
+        else:
+            query = self.vectorize([food])[0]
+            fdc_id = food.fdc_id
+        rows, scores = self.search(query, k + 1, category=category, approximate=approximate)
+        return [(int(self.fdc_ids[row]), float(score))
+                for row, score in zip(rows[0], scores[0])
+                if row >= 0 and self.fdc_ids[row] != fdc_id][:k]
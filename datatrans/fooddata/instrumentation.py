@@ -0,0 +1,318 @@
+"""Instrumentation of the requests to the FoodData Central API
+
+Every request sent by ``fooddata.api`` goes through an
+``Instrumentation``: it calls the listeners added with ``add_listener``
+when the request starts and ends, and records per endpoint:
+
+- a histogram of the latency of the requests
+- the bytes sent and received
+- the number of responses per status code, and of errors per exception
+- the number of retries per reason
+- the cache hits and misses
+- the number of requests coalesced with an identical one in flight
+
+``snapshot`` returns the metrics as a JSON serializable dict, and
+``to_prometheus`` in the Prometheus text exposition format.
+
+References:
+    https://prometheus.io/docs/instrumenting/exposition_formats/
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+__all__ = ['LATENCY_BUCKETS', 'RequestStart', 'RequestEnd', 'Histogram', 'Instrumentation']
+
+# upper bounds in seconds of the latency histogram buckets, as the
+# default buckets of the Prometheus clients
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStart(NamedTuple):
+    """ A request about to be sent. """
+    endpoint: str
+    method: str
+    url: str
+
+
+class RequestEnd(NamedTuple):
+    """A request that got a response, or failed with ``error``.
+
+    ``status`` is None when there is no response.
+    """
+    endpoint: str
+    method: str
+    url: str
+    status: Optional[int]
+    elapsed: float
+    bytes_sent: int
+    bytes_received: int
+    error: Optional[BaseException] = None
+
+
+class Histogram:
+    """Counts of observed values in buckets of upper bounds ``bounds``.
+
+    Examples:
+        >>> histogram = Histogram((0.1, 1.0))
+        >>> for value in (0.05, 0.2, 0.3, 2.0):
+        ...     histogram.observe(value)
+        >>> histogram.count, histogram.cumulative_counts()
+        (4, [1, 3, 4])
+        >>> histogram.quantile(0.5)
+        0.55
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        # the last bucket counts the values above every bound
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self) -> List[int]:
+        """ Returns the number of values at most each bound, then of all values. """
+        total = 0
+        cumulative = []
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Returns an estimate of the quantile ``q`` of the values.
+
+        The value is interpolated linearly within its bucket, as
+        Prometheus' ``histogram_quantile`` does. Values above the last
+        bound are estimated at that bound.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower, below = 0.0, 0
+        for bound, cumulative in zip(self.bounds, self.cumulative_counts()):
+            if cumulative >= rank:
+                in_bucket = cumulative - below
+                return lower + (bound - lower) * ((rank - below) / in_bucket if in_bucket else 0)
+            lower, below = bound, cumulative
+        return self.bounds[-1] if self.bounds else None
+
+    def as_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': {str(bound): count for bound, count in zip(self.bounds + ('+Inf',), self.cumulative_counts())},
+        }
+
+
+class _EndpointMetrics:
+    __slots__ = ('latency', 'in_flight', 'bytes_sent', 'bytes_received', 'statuses', 'errors', 'retries',
+                 'cache_hits', 'cache_misses', 'coalesced')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.latency = Histogram(buckets)
+        self.in_flight = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.statuses: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.retries: Counter = Counter()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.coalesced = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'requests': self.latency.count,
+            'inFlight': self.in_flight,
+            'bytesSent': self.bytes_sent,
+            'bytesReceived': self.bytes_received,
+            'statuses': {str(status): n for status, n in sorted(self.statuses.items())},
+            'errors': dict(self.errors),
+            'retries': dict(self.retries),
+            'cache': {'hits': self.cache_hits, 'misses': self.cache_misses,
+                      'hitRate': self.cache_hits / lookups if lookups else None},
+            'coalesced': self.coalesced,
+            'latency': self.latency.as_dict(),
+        }
+
+
+def _labels(**labels: str) -> str:
+    return '{' + ','.join('{}="{}"'.format(key, str(value).replace('\\', r'\\').replace('"', r'\"'))
+                          for key, value in labels.items()) + '}'
+
+
+class Instrumentation:
+    """Listeners and metrics of the requests of the API client.
+
+    Safe to share between threads.
+
+    Args:
+        buckets: Upper bounds in seconds of the latency histogram buckets
+
+    Examples:
+        >>> instrumentation = Instrumentation()
+        >>> started = instrumentation.request_started(RequestStart('food', 'GET', 'https://example.com/1'))
+        >>> instrumentation.request_ended(RequestEnd('food', 'GET', 'https://example.com/1', 200, 0.042, 0, 2048))
+        >>> instrumentation.cache_lookup('food', hit=True)
+        >>> metrics = instrumentation.snapshot()['endpoints']['food']
+        >>> metrics['requests'], metrics['statuses'], metrics['cache']['hitRate'], metrics['latency']['buckets']['0.05']
+        (1, {'200': 1}, 1.0, 1)
+        >>> print(instrumentation.to_prometheus().splitlines()[2])
+        datatrans_fdc_requests_total{endpoint="food",status="200"} 1
+    """
+
+    __slots__ = ('buckets', '_endpoints', '_on_start', '_on_end', '_lock', '_since')
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._endpoints: Dict[str, _EndpointMetrics] = {}
+        self._on_start: List[Callable[[RequestStart], None]] = []
+        self._on_end: List[Callable[[RequestEnd], None]] = []
+        self._lock = threading.Lock()
+        self._since = time.time()
+
+    def add_listener(self, on_start: Callable[[RequestStart], None] = None,
+                     on_end: Callable[[RequestEnd], None] = None) -> None:
+        """ Calls ``on_start`` before, and ``on_end`` after, each request, in the thread of the request. """
+        if on_start is not None:
+            self._on_start.append(on_start)
+        if on_end is not None:
+            self._on_end.append(on_end)
+
+    def remove_listener(self, on_start: Callable[[RequestStart], None] = None,
+                        on_end: Callable[[RequestEnd], None] = None) -> None:
+        if on_start is not None:
+            self._on_start.remove(on_start)
+        if on_end is not None:
+            self._on_end.remove(on_end)
+
+    def _metrics(self, endpoint: str) -> _EndpointMetrics:
+        try:
+            return self._endpoints[endpoint]
+        except KeyError:
+            return self._endpoints.setdefault(endpoint, _EndpointMetrics(self.buckets))
+
+    def request_started(self, request: RequestStart) -> float:
+        """Records the start of ``request``.
+
+        Returns:
+            The ``time.perf_counter()`` of the start
+        """
+        with self._lock:
+            self._metrics(request.endpoint).in_flight += 1
+        for on_start in self._on_start:
+            on_start(request)
+        return time.perf_counter()
+
+    def request_ended(self, result: RequestEnd) -> None:
+        """ Records the response to, or the failure of, a request. """
+        with self._lock:
+            metrics = self._metrics(result.endpoint)
+            metrics.in_flight -= 1
+            metrics.latency.observe(result.elapsed)
+            metrics.bytes_sent += result.bytes_sent
+            metrics.bytes_received += result.bytes_received
+            if result.status is not None:
+                metrics.statuses[result.status] += 1
+            if result.error is not None:
+                metrics.errors[type(result.error).__name__] += 1
+        for on_end in self._on_end:
+            on_end(result)
+
+    def retried(self, endpoint: str, reason: str) -> None:
+        """ Records a retry of a request to ``endpoint``, because of ``reason`` (status code or error). """
+        with self._lock:
+            self._metrics(endpoint).retries[reason] += 1
+
+    def cache_lookup(self, endpoint: str, hit: bool) -> None:
+        """ Records a lookup of the response cache for ``endpoint``. """
+        with self._lock:
+            metrics = self._metrics(endpoint)
+            if hit:
+                metrics.cache_hits += 1
+            else:
+                metrics.cache_misses += 1
+
+    def coalesced(self, endpoint: str) -> None:
+        """ Records a request to ``endpoint`` given the response of an identical request in flight. """
+        with self._lock:
+            self._metrics(endpoint).coalesced += 1
+
+    def reset(self) -> None:
+        """ Forgets the metrics recorded so far, but not the listeners. """
+        with self._lock:
+            self._endpoints.clear()
+            self._since = time.time()
+
+    def snapshot(self) -> dict:
+        """ Returns the metrics recorded since the creation or ``reset``, per endpoint. """
+        with self._lock:
+            return {
+                'since': self._since,
+                'time': time.time(),
+                'endpoints': {endpoint: metrics.as_dict() for endpoint, metrics in sorted(self._endpoints.items())},
+            }
+
+    def to_prometheus(self, prefix: str = 'datatrans_fdc') -> str:
+        """ Returns the metrics in the Prometheus text exposition format. """
+        lines = []
+
+        def family(name: str, type_: str, help_: str, samples) -> None:
+            samples = list(samples)
+            if samples:
+                lines.append('# HELP {}_{} {}'.format(prefix, name, help_))
+                lines.append('# TYPE {}_{} {}'.format(prefix, name, type_))
+                lines.extend('{}_{}{} {}'.format(prefix, suffix, labels, value) for suffix, labels, value in samples)
+
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            family('requests_total', 'counter', 'Responses of the FoodData Central API.',
+                   (('requests_total', _labels(endpoint=endpoint, status=status), n)
+                    for endpoint, metrics in endpoints for status, n in sorted(metrics.statuses.items())))
+            family('errors_total', 'counter', 'Requests that got no response.',
+                   (('errors_total', _labels(endpoint=endpoint, error=error), n)
+                    for endpoint, metrics in endpoints for error, n in sorted(metrics.errors.items())))
+            family('requests_in_flight', 'gauge', 'Requests waiting for a response.',
+                   (('requests_in_flight', _labels(endpoint=endpoint), metrics.in_flight)
+                    for endpoint, metrics in endpoints))
+            family('retries_total', 'counter', 'Requests sent again.',
+                   (('retries_total', _labels(endpoint=endpoint, reason=reason), n)
+                    for endpoint, metrics in endpoints for reason, n in sorted(metrics.retries.items())))
+            family('cache_lookups_total', 'counter', 'Lookups of the response cache.',
+                   (('cache_lookups_total', _labels(endpoint=endpoint, result=result), n)
+                    for endpoint, metrics in endpoints
+                    for result, n in (('hit', metrics.cache_hits), ('miss', metrics.cache_misses))
+                    if metrics.cache_hits or metrics.cache_misses))
+            family('coalesced_total', 'counter', 'Requests given the response of an identical request in flight.',
+                   (('coalesced_total', _labels(endpoint=endpoint), metrics.coalesced)
+                    for endpoint, metrics in endpoints if metrics.coalesced))
+            family('sent_bytes_total', 'counter', 'Bytes of the bodies of the requests.',
+                   (('sent_bytes_total', _labels(endpoint=endpoint), metrics.bytes_sent)
+                    for endpoint, metrics in endpoints))
+            family('received_bytes_total', 'counter', 'Bytes of the bodies of the responses.',
+                   (('received_bytes_total', _labels(endpoint=endpoint), metrics.bytes_received)
+                    for endpoint, metrics in endpoints))
+            samples = []
+            for endpoint, metrics in endpoints:
+                histogram = metrics.latency
+                for bound, count in zip(histogram.bounds + ('+Inf',), histogram.cumulative_counts()):
+                    samples.append(('request_duration_seconds_bucket', _labels(endpoint=endpoint, le=bound), count))
+                samples.append(('request_duration_seconds_sum', _labels(endpoint=endpoint), histogram.sum))
+                samples.append(('request_duration_seconds_count', _labels(endpoint=endpoint), histogram.count))
+            family('request_duration_seconds', 'histogram', 'Latency of the requests.', samples)
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,216 @@
+"""Local mirror of FoodData Central food records, kept fresh
+
+A ``FoodMirror`` keeps the detail payloads of foods, parsed with
+``detail.response.parse_food``, along with the ``ETag`` and
+``Last-Modified`` of their responses, and saves them to a JSON-lines
+file. ``refresh`` finds the records changed since they were fetched, and
+only fetches and parses those again:
+
+- records with an ``ETag`` or a ``Last-Modified`` are requested with
+  the conditional headers of these, and are not modified if the API
+  answers ``304 Not Modified``
+- the others are requested abridged, many at once from the Foods
+  endpoint, and are unchanged if their ``publicationDate`` (and
+  ``modifiedDate`` if the payload has one) are those of the record
+
+Examples:
+    >>> import tempfile
+    >>> from datatrans.benchmarks.stub import FixtureCatalog, StubServer
+    >>> from datatrans.fooddata.api import FoodDataClient
+    >>> with tempfile.TemporaryDirectory() as tmpdir, StubServer(FixtureCatalog()) as server:
+    ...     client = FoodDataClient('DEMO_KEY', api_url=server.url)
+    ...     mirror = FoodMirror(client, Path(tmpdir) / 'foods.jsonl')
+    ...     mirror.fetch([173410, 534358])
+    ...     mirror[173410].description
+    ...     mirror.refresh()
+    ...     mirror.save()
+    ...     len(FoodMirror(client, Path(tmpdir) / 'foods.jsonl'))
+    2
+    'Butter, salted'
+    RefreshReport(checked=2, not_modified=0, unchanged=2, changed=0, missing=0)
+    2
+"""
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+from datatrans import utils
+from datatrans.fooddata.api import FoodDataClient, conditional_headers
+from datatrans.fooddata.detail.food import parse_fooddata_date
+from datatrans.fooddata.detail.response import Food, parse_food
+
+if TYPE_CHECKING:
+    import requests
+
+__all__ = ['RefreshReport', 'FoodMirror']
+
+# keys of the dates of the abridged payloads, compared with the
+# attributes of the foods that have them
+_DATES = (('publicationDate', 'publication_date'), ('modifiedDate', 'modified_date'))
+
+
+class RefreshReport(NamedTuple):
+    """The records checked by ``FoodMirror.refresh``, by outcome.
+
+    Attributes:
+        checked: Records checked
+        not_modified: Records the API answered ``304 Not Modified`` for
+        unchanged: Records whose dates are unchanged
+        changed: Records fetched and parsed again
+        missing: Records no longer found, kept as they were
+    """
+    checked: int = 0
+    not_modified: int = 0
+    unchanged: int = 0
+    changed: int = 0
+    missing: int = 0
+
+    @property
+    def skipped(self) -> int:
+        """ Number of records neither fetched nor parsed again. """
+        return self.not_modified + self.unchanged
+
+
+class _Record:
+    __slots__ = ('food', 'content', 'etag', 'last_modified')
+
+    def __init__(self, food: Food, content: bytes, etag: Optional[str], last_modified: Optional[str]):
+        self.food = food
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class FoodMirror:
+    """Foods fetched with ``client``, saved to ``path``.
+
+    Args:
+        client: Client of the API
+        path: Optional. Location of the mirror, loaded if it exists
+        probe_size: Number of foods of each abridged request of
+            ``refresh`` (at most 20 for the API)
+    """
+
+    __slots__ = ('client', 'path', 'probe_size', '_records')
+
+    def __init__(self, client: FoodDataClient, path: Union[str, Path] = None, *, probe_size: int = 20):
+        self.client = client
+        self.path = Path(path) if path is not None else None
+        self.probe_size = probe_size
+        self._records: Dict[int, _Record] = {}
+        if self.path is not None and utils.find_file(self.path).exists():
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, fdc_id: int) -> bool:
+        return fdc_id in self._records
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._records)
+
+    def __getitem__(self, fdc_id: int) -> Food:
+        return self._records[fdc_id].food
+
+    def _update(self, fdc_id: int, response: 'requests.Response') -> None:
+        response.raise_for_status()
+        content = response.content
+        self._records[fdc_id] = _Record(parse_food(utils.loads(content)), content,
+                                        response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+    def fetch(self, fdc_ids: Iterable[int]) -> int:
+        """Fetches the foods ``fdc_ids`` not mirrored yet.
+
+        Returns:
+            The number of foods fetched
+
+        Raises:
+            requests.HTTPError: When a food could not be fetched
+        """
+        fetched = 0
+        for fdc_id in fdc_ids:
+            if fdc_id not in self._records:
+                self._update(fdc_id, self.client.food(fdc_id))
+                fetched += 1
+        return fetched
+
+    def refresh(self, fdc_ids: Iterable[int] = None) -> RefreshReport:
+        """Fetches and parses again the records of ``fdc_ids`` changed since they were fetched.
+
+        Args:
+            fdc_ids: Optional. Foods to check among those mirrored, all
+                by default
+
+        Returns:
+            The number of records checked, skipped and fetched again
+
+        Raises:
+            requests.HTTPError: When a request failed
+        """
+        fdc_ids = [fdc_id for fdc_id in (fdc_ids if fdc_ids is not None else list(self._records))
+                   if fdc_id in self._records]
+        counts = dict.fromkeys(RefreshReport._fields, 0)
+        counts['checked'] = len(fdc_ids)
+        dated: List[int] = []
+        for fdc_id in fdc_ids:
+            record = self._records[fdc_id]
+            if record.etag is None and record.last_modified is None:
+                dated.append(fdc_id)
+                continue
+            response = self.client.request('GET', 'food', '/' + str(fdc_id),
+                                           headers=conditional_headers(record.etag, record.last_modified))
+            if response.status_code == 304:
+                counts['not_modified'] += 1
+            elif response.status_code == 404:
+                counts['missing'] += 1
+            else:
+                self._update(fdc_id, response)
+                counts['changed'] += 1
+
+        for start in range(0, len(dated), self.probe_size):
+            batch = dated[start:start + self.probe_size]
+            # not from the cache of the client, which may be stale
+            response = self.client.foods(batch, format='abridged', revalidate=True)
+            response.raise_for_status()
+            probes = {probe['fdcId']: probe for probe in utils.loads(response.content)}
+            for fdc_id in batch:
+                probe = probes.get(fdc_id)
+                if probe is None:
+                    counts['missing'] += 1
+                elif self._changed(self._records[fdc_id].food, probe):
+                    self._update(fdc_id, self.client.food(fdc_id, revalidate=True))
+                    counts['changed'] += 1
+                else:
+                    counts['unchanged'] += 1
+        return RefreshReport(**counts)
+
+    @staticmethod
+    def _changed(food: Food, probe: dict) -> bool:
+        """ Returns whether the dates of the abridged payload ``probe`` differ from those of ``food``. """
+        for key, attr in _DATES:
+            if probe.get(key) and parse_fooddata_date(probe[key]) != getattr(food, attr, None):
+                return True
+        return False
+
+    def load(self, path: Union[str, Path] = None) -> None:
+        """ Loads the records saved to ``path``, defaults to that of the mirror, replacing those in memory. """
+        records = {}
+        with utils.open_file(path or self.path, 'rb') as file:
+            for line in file:
+                record = utils.loads(line)
+                content = utils.dumpb(record['payload'])
+                records[record['fdcId']] = _Record(parse_food(record['payload']), content,
+                                                   record.get('etag'), record.get('lastModified'))
+        self._records = records
+
+    def save(self, path: Union[str, Path] = None) -> None:
+        """ Saves the records to ``path``, defaults to that of the mirror, replacing the file at once. """
+        path = Path(path or self.path)
+        # named after path, so that its suffix gives the compression
+        partial_path = path.with_name('partial-' + path.name)
+        with utils.RecordWriter(partial_path) as writer:
+            for fdc_id, record in self._records.items():
+                writer.write_json({'fdcId': fdc_id, 'etag': record.etag, 'lastModified': record.last_modified,
+                                   'payload': utils.loads(record.content)})
+        os.replace(partial_path, path)
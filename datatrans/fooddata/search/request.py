@@ -76,7 +76,5 @@ class FoodSearchCriteria(utils.DataClass):
         if _dict_ is not None:
             super().__init__(_dict_=_dict_)
             return
-        for k, v in kwargs.items():
-            if k in self.__slots__:
-                kwargs[utils.snake_to_camel(k)] = kwargs.pop(k)
+        kwargs = {utils.snake_to_camel(k) if k in self.__slots__ else k: v for k, v in kwargs.items()}
         super().__init__(_dict_=kwargs)
@@ -1,11 +1,13 @@
 import datetime
-from typing import List
-
-import requests
+from typing import TYPE_CHECKING, List
 
 from datatrans import utils
 from datatrans.fooddata.search.request import FoodDataType, FoodSearchCriteria
 
+if TYPE_CHECKING:
+    # only annotates, so that parsing responses does not import requests
+    import requests
+
 __all__ = ['Food', 'FoodSearchResponse']
 
 
@@ -63,7 +65,7 @@ class FoodSearchResponse:
         'foods',
     )
 
-    def __init__(self, response: requests.Response):
+    def __init__(self, response: 'requests.Response'):
         """
 
         Args:
@@ -71,7 +73,7 @@ class FoodSearchResponse:
         """
         self.response = response
 
-        data = response.json()
+        data = utils.loads(response.content)
         self.foods: List[Food] = [Food(_dict_=_dict_) for _dict_ in data['foods']]
         self.food_search_criteria = FoodSearchCriteria(_dict_=data['foodSearchCriteria'])
         self.total_hits: int = data['totalHits']
@@ -1,4 +1,8 @@
-import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple, Union
 
 from datatrans import utils
 from datatrans.utils.classes import JSONEnum as Enum
@@ -8,6 +12,8 @@ from datatrans.fooddata.search import *
 
 DATA_DIR = utils.BASE_DIR / 'assets'
 
+logger = logging.getLogger(__name__)
+
 
 def print_food_category_instances_code():
     with (DATA_DIR / 'food-categories.csv').open('r') as csvfile:
@@ -17,16 +23,16 @@ def print_food_category_instances_code():
             print(f"{utils.to_constant(parts[2])} = FoodCategory(_dict_={{'id': {parts[0]}, 'code': '{parts[1]}', 'description': '{parts[2]}'}})")
 
 
-def overwrite_file(data):
-    file = DATA_DIR / 'ingredients.json'
-    with file.open('w') as f:
-        f.write(json.dumps(data, cls=utils.JSONEncoder))
+def overwrite_file(data, file=DATA_DIR / 'ingredients.json', **kwargs):
+    """ Writes ``data`` to ``file`` as a line of JSON, see ``utils.RecordWriter`` for ``kwargs``. """
+    with utils.RecordWriter(file, **kwargs) as writer:
+        writer.write_json(data)
 
 
-def append_file(data):
-    file = DATA_DIR / 'ingredients.json'
-    with file.open('a') as f:
-        f.write(json.dumps(data, cls=utils.JSONEncoder))
+def append_file(data, file=DATA_DIR / 'ingredients.json', **kwargs):
+    """ Appends ``data`` to ``file`` as a line of JSON, see ``utils.RecordWriter`` for ``kwargs``. """
+    with utils.RecordWriter(file, mode='a', **kwargs) as writer:
+        writer.write_json(data)
 
 
 def parse_description(description: str) -> str:
@@ -38,45 +44,463 @@ def parse_description(description: str) -> str:
     return description
 
 
-def main():
-    ingr = []
-    ignored_category = (
-        FoodCategoryInstance.RESTAURANT_FOODS.value,
-        FoodCategoryInstance.MEALS_ENTREES_AND_SIDE_DISHES.value,
-        FoodCategoryInstance.BABY_FOODS.value,
-        FoodCategoryInstance.SOUPS_SAUCES_AND_GRAVIES.value,
-        FoodCategoryInstance.FAST_FOODS.value,
-        FoodCategoryInstance.SNACKS.value,  # Could be used, but ignore for now
-        FoodCategoryInstance.FAST_FOODS.value,
-    )
-
-    for i in range(1, 2):
-        criteria = fooddata.search.FoodSearchCriteria(
-            general_search_input='',
-            included_data_types={FoodDataType.LEGACY: True},
-            page_number=i
-        )
-        search_res = fooddata.api.send_food_search_api_request(criteria)
-        search_res = fooddata.search.response.FoodSearchResponse(search_res)
-        for food in search_res.foods:
-            if food.data_type is not FoodDataType.LEGACY:
-                continue
-            detail_res = fooddata.api.send_food_detail_api_request(food.fdc_id)
-            detail_res = fooddata.detail.response.FoodDetailResponse(detail_res, data_type=FoodDataType.LEGACY)
-            food_: fooddata.detail.SrLegacyFood = detail_res.food
-            if food_.food_category in ignored_category:
-                continue
-            ingr.append(
-                {
-                    'fdc_id': food_.fdc_id,
-                    'common_names': food_.common_names,
-                    'description': food_.description,
-                }
-            )
-
-    overwrite_file(ingr)
+# food categories left out of the ingredients
+IGNORED_CATEGORIES = (
+    FoodCategoryInstance.RESTAURANT_FOODS.value,
+    FoodCategoryInstance.MEALS_ENTREES_AND_SIDE_DISHES.value,
+    FoodCategoryInstance.BABY_FOODS.value,
+    FoodCategoryInstance.SOUPS_SAUCES_AND_GRAVIES.value,
+    FoodCategoryInstance.FAST_FOODS.value,
+    FoodCategoryInstance.SNACKS.value,  # Could be used, but ignore for now
+)
+
+
+def to_ingredient(food: SrLegacyFood) -> Optional[dict]:
+    """ Returns the ingredient of ``food``, or None if its category is ignored. """
+    if food.food_category in IGNORED_CATEGORIES:
+        return None
+    return {
+        'fdc_id': food.fdc_id,
+        'common_names': food.common_names,
+        'description': food.description,
+    }
+
+
+def _search_data(criteria: Optional[FoodSearchCriteria]) -> dict:
+    """ Returns the JSON of ``criteria``, all SR Legacy foods by default, without its page number. """
+    if criteria is None:
+        criteria = FoodSearchCriteria(general_search_input='', included_data_types={FoodDataType.LEGACY: True})
+    return {k: v for k, v in utils.loads(utils.dumpb(criteria.dict)).items() if k != 'pageNumber'}
+
+
+class _Crawler:
+    """ Requests and parses the search pages and the details of their foods, timed by ``profiler`` if given. """
+
+    __slots__ = ('send_search', 'send_detail', 'search_response', 'detail_response', 'write')
+
+    def __init__(self, client: 'fooddata.api.FoodDataClient', profiler: 'utils.StageProfiler' = None):
+        self.send_search = client.search
+        self.send_detail = client.food
+        self.search_response = fooddata.search.response.FoodSearchResponse
+        self.detail_response = fooddata.detail.response.FoodDetailResponse
+        self.write = utils.RecordWriter.write_json
+        if profiler is not None:
+            self.send_search = profiler.wrap('request', self.send_search)
+            self.send_detail = profiler.wrap('request', self.send_detail)
+            self.search_response = profiler.wrap('parse', self.search_response)
+            self.detail_response = profiler.wrap('parse', self.detail_response)
+            self.write = profiler.wrap('write', self.write)
+
+    def search(self, search_data: dict, page: int) -> 'fooddata.search.response.FoodSearchResponse':
+        response = self.send_search(FoodSearchCriteria(_dict_=dict(search_data, pageNumber=page)))
+        response.raise_for_status()
+        return self.search_response(response)
+
+    def ingredient(self, food: 'fooddata.search.response.Food') -> Optional[dict]:
+        """ Returns the ingredient of the SR Legacy ``food``, None for other foods or ignored categories. """
+        if food.data_type is not FoodDataType.LEGACY:
+            return None
+        response = self.send_detail(food.fdc_id)
+        response.raise_for_status()
+        return to_ingredient(self.detail_response(response, data_type=FoodDataType.LEGACY).food)
+
+
+def _checkpoint_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + '.checkpoint.json')
+
+
+def _ids_path(checkpoint_path: Path) -> Path:
+    return checkpoint_path.with_suffix('.ids')
+
+
+def _append_ids(ids_path: Path, fdc_ids: Iterable[int]) -> None:
+    with ids_path.open('ab') as file:
+        file.write(''.join('{}\n'.format(fdc_id) for fdc_id in fdc_ids).encode())
+
+
+def _truncate(path: Path, size: int) -> None:
+    """ Truncates ``path`` to the ``size`` it had at the checkpoint. """
+    current = path.stat().st_size if path.exists() else 0
+    if current < size:
+        raise ValueError('\'{}\' is shorter than in its checkpoint'.format(path))
+    if current > size:
+        # drops what was written after the checkpoint, which is crawled again
+        os.truncate(path, size)
+
+
+def _read_checkpoint(checkpoint_path: Path, criteria: dict, output_path: Path) -> Tuple[dict, Set[int]]:
+    """ Returns the state of the crawl saved in ``checkpoint_path``, or of a new crawl, and the foods processed. """
+    ids_path = _ids_path(checkpoint_path)
+    if not checkpoint_path.exists():
+        if output_path.exists() and output_path.stat().st_size:
+            raise ValueError('\'{}\' exists but has no checkpoint'.format(output_path))
+        if ids_path.exists():
+            os.truncate(ids_path, 0)
+        return {'criteria': criteria, 'page': 0, 'records': 0, 'bytes': 0, 'idsBytes': 0, 'done': False}, set()
+    state = utils.loads(checkpoint_path.read_bytes())
+    if state['criteria'] != criteria:
+        raise ValueError('\'{}\' is the checkpoint of another crawl'.format(checkpoint_path))
+    _truncate(output_path, state['bytes'])
+    _truncate(ids_path, state.get('idsBytes', 0))
+    if 'fdcIds' in state:
+        # checkpoints of earlier versions hold the fdc_ids themselves
+        _append_ids(ids_path, state.pop('fdcIds'))
+    processed = set()
+    if ids_path.exists():
+        with ids_path.open('rb') as file:
+            processed.update(int(line) for line in file)
+    return state, processed
+
+
+def _write_checkpoint(checkpoint_path: Path, state: dict) -> None:
+    partial_path = checkpoint_path.with_name(checkpoint_path.name + '.partial')
+    partial_path.write_bytes(utils.dumpb(state))
+    os.replace(partial_path, checkpoint_path)
+
+
+def crawl_ingredients(output_path: Union[str, Path] = DATA_DIR / 'ingredients.jsonl', *,
+                      criteria: FoodSearchCriteria = None, max_pages: int = None, checkpoint_every: int = 100,
+                      checkpoint_path: Union[str, Path] = None, client: 'fooddata.api.FoodDataClient' = None,
+                      profiler: 'utils.StageProfiler' = None) -> int:
+    """Crawls the SR Legacy foods and appends their ingredients to ``output_path``, one per line.
+
+    The crawl goes through the pages of the search results, requesting
+    the details of each food. Every ``checkpoint_every`` foods, and at
+    the end of each page or when the crawl fails, the file is closed and
+    the progress saved in ``checkpoint_path``: the last completed page
+    and the size of ``output_path``, and of the file next to it (with
+    the '.ids' suffix) the fdc_id of the foods processed are appended
+    to. Calling this again with the same arguments resumes from the last
+    checkpoint, without requesting the foods processed before it again;
+    ingredients written after it, e.g. before the process was killed,
+    are removed from ``output_path``. Once every page is crawled, the
+    checkpoint is marked as done and calling this again does nothing.
+
+    Args:
+        output_path: Location of the JSON-lines output, compressed if
+            its suffix is that of a compression
+        criteria: Optional. Search criteria of the foods, defaults to
+            all SR Legacy foods. Its ``page_number`` is ignored.
+        max_pages: Optional. Number of pages to crawl at most, in total
+            across resumptions
+        checkpoint_every: Number of foods processed between checkpoints
+        checkpoint_path: Optional. Defaults to ``output_path`` with
+            '.checkpoint.json' appended
+        client: Optional. Client of the API, with its retries. Defaults
+            to a ``FoodDataClient`` configured from the settings.
+        profiler: Optional. Times the 'request', 'parse' (decoding and
+            ``DataClass`` construction) and 'write' stages
+
+    Returns:
+        The number of ingredients in ``output_path``
+
+    Raises:
+        ValueError: When the checkpoint is of other criteria, or does
+            not match ``output_path``
+        requests.HTTPError: When a request fails after its retries; the
+            crawl can be resumed
+
+    Examples:
+        A crawl interrupted by every error of the API, and by a kill
+        after writing half an ingredient, resumed until done, writes
+        the same ingredients as an uninterrupted crawl:
+
+        >>> import tempfile
+        >>> import requests
+        >>> from datatrans.benchmarks.stub import StubServer
+        >>> from datatrans.benchmarks.synthetic import FoodDataGenerator
+        >>> from datatrans.fooddata.api import FoodDataClient
+        >>> catalog = FoodDataGenerator(foods=400)
+        >>> with tempfile.TemporaryDirectory() as tmpdir, StubServer(catalog, page_size=10) as server, \\
+        ...         StubServer(catalog, page_size=10, error_rate=0.05) as faulty_server:
+        ...     reference_path, resumed_path = Path(tmpdir) / 'reference.jsonl', Path(tmpdir) / 'resumed.jsonl'
+        ...     with FoodDataClient('DEMO_KEY', api_url=server.url) as client:
+        ...         records = crawl_ingredients(reference_path, client=client)
+        ...     interruptions = 0
+        ...     with FoodDataClient('DEMO_KEY', api_url=faulty_server.url, retries=0) as client:
+        ...         while True:
+        ...             try:
+        ...                 resumed_records = crawl_ingredients(resumed_path, client=client, checkpoint_every=3)
+        ...                 break
+        ...             except requests.HTTPError:
+        ...                 interruptions += 1
+        ...                 with resumed_path.open('ab') as file:
+        ...                     _ = file.write(b'{"fdc_id": ')
+        ...     interruptions > 1, resumed_records == records > 0
+        ...     resumed_path.read_bytes() == reference_path.read_bytes()
+        (True, True)
+        True
+    """
+    output_path = Path(output_path)
+    checkpoint_path = Path(checkpoint_path) if checkpoint_path is not None else _checkpoint_path(output_path)
+    search_data = _search_data(criteria)
+    state, processed = _read_checkpoint(checkpoint_path, search_data, output_path)
+    if state['done']:
+        return state['records']
+    ids_path = _ids_path(checkpoint_path)
+    # processed since the last checkpoint
+    pending: List[int] = []
+
+    own_client = client is None
+    if own_client:
+        client = fooddata.api.FoodDataClient()
+    crawler = _Crawler(client, profiler)
+
+    writer: Optional[utils.RecordWriter] = None
+
+    def checkpoint(page: int, done: bool = False) -> None:
+        nonlocal writer
+        if writer is not None:
+            writer.close()
+            state['records'] += writer.records
+            writer = None
+        if pending:
+            _append_ids(ids_path, pending)
+            pending.clear()
+        size = output_path.stat().st_size if output_path.exists() else 0
+        ids_size = ids_path.stat().st_size if ids_path.exists() else 0
+        state.update(page=page, bytes=size, idsBytes=ids_size, done=done)
+        _write_checkpoint(checkpoint_path, state)
+
+    page = state['page'] + 1
+    since_checkpoint = 0
+    try:
+        while max_pages is None or page <= max_pages:
+            search_res = crawler.search(search_data, page)
+            for food in search_res.foods:
+                if food.fdc_id in processed:
+                    continue
+                ingredient = crawler.ingredient(food)
+                if ingredient is not None:
+                    if writer is None:
+                        writer = utils.RecordWriter(output_path, mode='a')
+                    crawler.write(writer, ingredient)
+                processed.add(food.fdc_id)
+                pending.append(food.fdc_id)
+                since_checkpoint += 1
+                if since_checkpoint >= checkpoint_every:
+                    checkpoint(page - 1)
+                    since_checkpoint = 0
+            if page >= search_res.total_pages:
+                checkpoint(page, done=True)
+                break
+            checkpoint(page)
+            since_checkpoint = 0
+            page += 1
+    except BaseException:
+        # so that the foods processed before the failure are not requested again
+        try:
+            checkpoint(page - 1)
+        except Exception:
+            # the failure of the crawl is the one to raise
+            logger.exception('could not checkpoint the crawl at page %d', page - 1)
+        raise
+    finally:
+        if own_client:
+            client.close()
+    return state['records']
+
+
+def plan_crawl(queue_path: Union[str, Path], *, criteria: FoodSearchCriteria = None, pages_per_task: int = 5,
+               max_pages: int = None, client: 'fooddata.api.FoodDataClient' = None) -> int:
+    """Splits the crawl into tasks of ``pages_per_task`` search pages, in the queue at ``queue_path``.
+
+    Run it once, then ``crawl_worker`` in as many processes as wanted,
+    on machines sharing the queue and output directory, then
+    ``merge_crawl``. Planning a queue already planned with the same
+    criteria does nothing.
+
+    Args:
+        queue_path: Location of the ``utils.workqueue.LeaseQueue``
+        criteria: Optional. Search criteria of the foods, defaults to
+            all SR Legacy foods
+        pages_per_task: Number of search pages per task
+        max_pages: Optional. Number of pages to crawl at most
+        client: Optional. Client of the API, to request the number of
+            pages. Defaults to a ``FoodDataClient`` configured from the
+            settings.
+
+    Returns:
+        The number of tasks of the queue
+
+    Raises:
+        ValueError: When the queue is of other criteria
+    """
+    from datatrans.utils.workqueue import LeaseQueue
+
+    search_data = _search_data(criteria)
+    with LeaseQueue(queue_path) as queue:
+        planned = queue.get_meta('criteria')
+        if planned is not None:
+            if planned != search_data:
+                raise ValueError('\'{}\' is the queue of another crawl'.format(queue_path))
+            return sum(queue.counts().values())
+        own_client = client is None
+        if own_client:
+            client = fooddata.api.FoodDataClient()
+        try:
+            total_pages = _Crawler(client).search(search_data, 1).total_pages
+        finally:
+            if own_client:
+                client.close()
+        if max_pages is not None:
+            total_pages = min(total_pages, max_pages)
+        ids = queue.put({'firstPage': first, 'lastPage': min(first + pages_per_task - 1, total_pages)}
+                        for first in range(1, total_pages + 1, pages_per_task))
+        queue.set_meta('criteria', search_data)
+    return len(ids)
+
+
+def _part_path(output_dir: Path, task_id: int) -> Path:
+    return output_dir / 'ingredients-{:05d}.jsonl'.format(task_id)
+
+
+def crawl_worker(queue_path: Union[str, Path], output_dir: Union[str, Path], *, owner: str = None,
+                 lease_seconds: float = 300.0, poll_seconds: float = 5.0, wait: bool = True,
+                 client: 'fooddata.api.FoodDataClient' = None, profiler: 'utils.StageProfiler' = None) -> int:
+    """Crawls the tasks of the queue planned by ``plan_crawl``, until none is left.
+
+    Each task is leased for ``lease_seconds``, renewed after each page,
+    and its ingredients written to its own file in ``output_dir``,
+    renamed into place once complete. The task of a worker that stopped
+    is claimed again once its lease expired; the tasks are idempotent,
+    so a worker that lost its lease leaves the task to the new one.
+
+    Args:
+        queue_path: Location of the queue
+        output_dir: Directory of the outputs of the tasks, shared by the
+            workers
+        owner: Optional. Name of the worker, defaults to
+            ``utils.workqueue.default_owner()``
+        lease_seconds: Duration of the leases, longer than a page takes
+        poll_seconds: Seconds between claims while the tasks left are
+            leased to other workers
+        wait: Whether to wait for the tasks leased to other workers to
+            be done, to claim them if their lease expires
+        client: Optional. Client of the API, with its retries. Defaults
+            to a ``FoodDataClient`` configured from the settings.
+        profiler: Optional. Times the stages of the crawl
+
+    Returns:
+        The number of tasks completed by this worker
+
+    Raises:
+        requests.HTTPError: When a request fails after its retries; the
+            task is released for another worker
+    """
+    from datatrans.utils.workqueue import LeaseLost, LeaseQueue, default_owner
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    owner = owner or default_owner()
+    own_client = client is None
+    if own_client:
+        client = fooddata.api.FoodDataClient()
+    crawler = _Crawler(client, profiler)
+    completed = 0
+    with LeaseQueue(queue_path, lease_seconds=lease_seconds) as queue:
+        search_data = queue.get_meta('criteria')
+        if search_data is None:
+            raise ValueError('\'{}\' is not planned'.format(queue_path))
+        try:
+            while True:
+                lease = queue.claim(owner)
+                if lease is None:
+                    if not wait or queue.done():
+                        break
+                    time.sleep(poll_seconds)
+                    continue
+                path = _part_path(output_dir, lease.id)
+                partial_path = path.with_name('{}.{}.partial'.format(
+                    path.name, ''.join(c if c.isalnum() else '-' for c in owner)))
+                processed = set()
+                try:
+                    with utils.RecordWriter(partial_path) as writer:
+                        for page in range(lease.payload['firstPage'], lease.payload['lastPage'] + 1):
+                            search_res = crawler.search(search_data, page)
+                            for food in search_res.foods:
+                                if food.fdc_id not in processed:
+                                    ingredient = crawler.ingredient(food)
+                                    if ingredient is not None:
+                                        crawler.write(writer, ingredient)
+                                    processed.add(food.fdc_id)
+                            lease = queue.renew(lease)
+                    os.replace(partial_path, path)
+                    queue.complete(lease, {'records': writer.records, 'foods': len(processed)})
+                    completed += 1
+                except LeaseLost:
+                    # the task is another worker's now
+                    partial_path.unlink(missing_ok=True)
+                except BaseException:
+                    # the failure of the task is the one to raise
+                    try:
+                        partial_path.unlink(missing_ok=True)
+                    except OSError:
+                        logger.exception('could not remove %s', partial_path)
+                    try:
+                        queue.release(lease)
+                    except Exception:
+                        logger.exception('could not release task %s', lease.id)
+                    raise
+        finally:
+            if own_client:
+                client.close()
+    return completed
+
+
+def merge_crawl(queue_path: Union[str, Path], output_dir: Union[str, Path],
+                output_path: Union[str, Path] = DATA_DIR / 'ingredients.jsonl') -> int:
+    """Concatenates the outputs of the tasks of a finished crawl to ``output_path``.
+
+    The ingredients are in the order of the pages, each food once, as
+    written by ``crawl_ingredients``.
+
+    Returns:
+        The number of ingredients written
+
+    Raises:
+        ValueError: When some tasks are not done
+    """
+    from datatrans.utils.workqueue import LeaseQueue
+
+    output_dir = Path(output_dir)
+    with LeaseQueue(queue_path) as queue:
+        if not queue.done():
+            raise ValueError('the crawl is not done: {}'.format(queue.counts()))
+        seen = set()
+        with utils.RecordWriter(output_path) as writer:
+            for task_id, _, _ in queue.results():
+                with _part_path(output_dir, task_id).open('rb') as file:
+                    for line in file:
+                        fdc_id = utils.loads(line)['fdc_id']
+                        # a food on 2 pages of different tasks, as the results shifted
+                        if fdc_id not in seen:
+                            seen.add(fdc_id)
+                            writer.write(line.rstrip(b'\n'))
+    return writer.records
+
+
+def main(profiler: 'utils.StageProfiler' = None):
+    """Crawls the SR Legacy ingredients to ``DATA_DIR / 'ingredients.jsonl'``, see ``crawl_ingredients``.
+
+    Args:
+        profiler: Optional. Times the stages of the crawl
+    """
+    crawl_ingredients(profiler=profiler)
 
 
 if __name__ == '__main__':
-    main()
-    pass
+    import sys
+
+    if sys.argv[1:2] == ['--plan']:
+        print('{} tasks'.format(plan_crawl(sys.argv[2])))
+    elif sys.argv[1:2] == ['--work']:
+        print('{} tasks completed'.format(crawl_worker(sys.argv[2], sys.argv[3])))
+    elif sys.argv[1:2] == ['--merge']:
+        print('{} ingredients'.format(merge_crawl(*sys.argv[2:5])))
+    elif sys.argv[1:] == ['--profile']:
+        with utils.StageProfiler() as stage_profiler:
+            main(stage_profiler)
+        print(stage_profiler.summary())
+    else:
+        main()
@@ -1,5 +1,5 @@
 from datatrans.structured_data.base import *
-from datatrans.structured_data.carousel import ItemList, ItemListOrderType, ListItem
+from datatrans.structured_data.carousel import ItemList, ItemListBuilder, ItemListOrderType, ListItem
 from datatrans.structured_data.lower import *
 from datatrans.structured_data.person import Person
 from datatrans.structured_data.recipe import NutritionInformation, Recipe
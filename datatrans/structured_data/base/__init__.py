@@ -1,3 +1,4 @@
 from .data_type import (URL, Boolean, Date, DateTime, Float, Integer, Number,
                         Text, Time)
 from .thing import Property, Thing
+from .serializer import dump, dumps
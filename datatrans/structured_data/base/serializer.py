@@ -0,0 +1,207 @@
+"""Precompiled JSON-LD serializers for ``Thing`` subclasses
+
+Every ``Thing`` subclass gets its own ``ThingSerializer`` when the class
+is created. The serializer holds the ``(JSON-LD key, slot)`` pair of
+each of the class's serialized properties (see ``ThingMeta``), so that
+objects are serialized by reading their slots in order, with no
+per-object key mapping.
+
+On top of that, each serializer compiles an encoding function for its
+class, which ``dumps`` and ``dump`` use to write JSON text directly,
+without going through ``json.dumps`` and its ``default`` hook for every
+nested object. Their output is the same as
+``json.dumps(obj, default=utils.json_encoder)`` with the same
+``separators`` and ``ensure_ascii``.
+"""
+from json.encoder import encode_basestring, encode_basestring_ascii
+from operator import attrgetter
+from typing import Callable, Dict, TextIO, Tuple
+
+from datatrans import utils
+
+__all__ = ['ThingSerializer', 'values_getter', 'dumps', 'dump']
+
+INFINITY = float('inf')
+
+
+def _floatstr(o: float) -> str:
+    """ Same as ``json`` for floats """
+    if o != o:
+        return 'NaN'
+    if o == INFINITY:
+        return 'Infinity'
+    if o == -INFINITY:
+        return '-Infinity'
+    return float.__repr__(o)
+
+
+class ThingSerializer:
+    """Serializer specialized for one ``Thing`` subclass.
+
+    Attributes:
+        cls (type): The ``Thing`` subclass
+        keys (Tuple[str, ...]): JSON-LD key of each serialized property
+        values (Callable[[object], tuple]): Returns the value of each
+            property of an object, None where unset
+    """
+
+    __slots__ = ('cls', 'keys', 'values')
+
+    def __init__(self, cls: type):
+        self.cls = cls
+        self.keys: Tuple[str, ...] = tuple(cls.__serialized_slots__)
+        self.values: Callable[[object], tuple] = values_getter(tuple(cls.__serialized_slots__.values()))
+
+    def properties(self, obj) -> dict:
+        """ Returns the JSON-LD properties of ``obj`` as a dict, see ``Thing.json_serial``. """
+        properties = {'@type': obj.type}
+        for key, value in zip(self.keys, self.values(obj)):
+            if value is not None:
+                properties[key] = value
+        return properties
+
+    def compile(self, encode: Callable[[object], str], encode_str: Callable[[str], str],
+                item_separator: str, key_separator: str) -> Callable[[object], str]:
+        """Returns a function encoding instances of ``cls`` to JSON text.
+
+        Args:
+            encode: Encodes the property values
+            encode_str: Encodes str values
+            item_separator: As in ``json.dumps``
+            key_separator: As in ``json.dumps``
+        """
+        # ``item_separator + "key" + key_separator`` of each property
+        prefixes = tuple(item_separator + encode_str(key) + key_separator for key in self.keys)
+        start = '{"@type"' + key_separator
+        values = self.values
+
+        def encode_thing(obj) -> str:
+            parts = [start + encode_str(obj.type)]
+            for prefix_, value in zip(prefixes, values(obj)):
+                if value is not None:
+                    if type(value) is str:
+                        parts.append(prefix_ + encode_str(value))
+                    else:
+                        parts.append(prefix_ + encode(value))
+            parts.append('}')
+            return ''.join(parts)
+
+        return encode_thing
+
+
+def values_getter(slots: Tuple[str, ...]) -> Callable[[object], tuple]:
+    """ Returns a function getting the values of ``slots`` of an object, None for empty slots. """
+    if not slots:
+        return lambda obj: ()
+    get = attrgetter(*slots)
+    if len(slots) == 1:
+        get = (lambda get_: lambda obj: (get_(obj),))(get)
+
+    def values(obj) -> tuple:
+        try:
+            return get(obj)
+        except AttributeError:
+            # constructors usually fill every slot, even with None
+            return tuple(getattr(obj, slot, None) for slot in slots)
+
+    return values
+
+
+def _make_encoder(separators: Tuple[str, str], ensure_ascii: bool) -> Callable[[object], str]:
+    """ Returns a function encoding any object to JSON text. """
+    item_separator, key_separator = separators
+    encode_str = encode_basestring_ascii if ensure_ascii else encode_basestring
+    thing_encoders: Dict[type, Callable[[object], str]] = {}
+
+    def encode_key(key) -> str:
+        if isinstance(key, str):
+            return encode_str(key)
+        if key is True:
+            return '"true"'
+        if key is False:
+            return '"false"'
+        if key is None:
+            return '"null"'
+        if isinstance(key, int):
+            return '"' + int.__repr__(key) + '"'
+        if isinstance(key, float):
+            return '"' + _floatstr(key) + '"'
+        raise TypeError(f'keys must be str, int, float, bool or None, '
+                        f'not {key.__class__.__name__}')
+
+    def encode(o) -> str:
+        type_ = type(o)
+        if type_ is str:
+            return encode_str(o)
+        encode_thing = thing_encoders.get(type_)
+        if encode_thing is not None:
+            return encode_thing(o)
+        if o is None:
+            return 'null'
+        if o is True:
+            return 'true'
+        if o is False:
+            return 'false'
+        if type_ is int:
+            return int.__repr__(o)
+        if type_ is float:
+            return _floatstr(o)
+        if hasattr(type_, '__serializer__'):
+            encode_thing = thing_encoders[type_] = type_.__serializer__.compile(
+                encode, encode_str, item_separator, key_separator)
+            return encode_thing(o)
+        if isinstance(o, str):
+            return encode_str(o)
+        if isinstance(o, int):
+            return int.__repr__(o)
+        if isinstance(o, float):
+            return _floatstr(o)
+        if isinstance(o, (list, tuple)):
+            if not o:
+                return '[]'
+            try:
+                # most lists in recipes are lists of str
+                return '[' + item_separator.join(map(encode_str, o)) + ']'
+            except TypeError:
+                return '[' + item_separator.join(map(encode, o)) + ']'
+        if isinstance(o, dict):
+            if not o:
+                return '{}'
+            return '{' + item_separator.join(encode_key(key) + key_separator + encode(value)
+                                             for key, value in o.items()) + '}'
+        return encode(utils.json_encoder(o))
+
+    return encode
+
+
+_ENCODERS: Dict[Tuple[Tuple[str, str], bool], Callable[[object], str]] = {}
+
+
+def dumps(obj, *, separators: Tuple[str, str] = None, ensure_ascii: bool = True) -> str:
+    """Returns ``obj`` as JSON(-LD) text.
+
+    Args:
+        obj: A ``Thing``, or anything ``json.dumps`` can serialize with
+            ``default=utils.json_encoder``
+        separators: Optional. ``(item_separator, key_separator)``, as in
+            ``json.dumps``
+        ensure_ascii: As in ``json.dumps``
+
+    Examples:
+        >>> from datatrans.structured_data import Person, Property
+        >>> dumps(Property(Person('Mary Stone'), Person('Jürgen')))
+        '[{"@type": "Person", "name": "Mary Stone"}, {"@type": "Person", "name": "J\\\\u00fcrgen"}]'
+        >>> dumps(Person('Jürgen'), separators=(',', ':'), ensure_ascii=False)
+        '{"@type":"Person","name":"Jürgen"}'
+    """
+    config = (tuple(separators or (', ', ': ')), ensure_ascii)
+    try:
+        encode = _ENCODERS[config]
+    except KeyError:
+        encode = _ENCODERS[config] = _make_encoder(*config)
+    return encode(obj)
+
+
+def dump(obj, fp: TextIO, *, separators: Tuple[str, str] = None, ensure_ascii: bool = True) -> None:
+    """ Writes ``obj`` as JSON(-LD) text to ``fp``, see ``dumps``. """
+    fp.write(dumps(obj, separators=separators, ensure_ascii=ensure_ascii))
@@ -1,13 +1,60 @@
 import abc
-import json
 from typing import List
 
 from datatrans import utils
+from datatrans.structured_data.base.serializer import ThingSerializer, dumps
 
 # TODO: Change this to a DataClass0
 
 
-class Thing(metaclass=abc.ABCMeta):
+def property_slot(key: str) -> str:
+    """Returns the name of the slot storing the property ``key``.
+
+    Examples:
+        >>> property_slot('recipeIngredient')
+        '_recipe_ingredient'
+    """
+    return '_' + utils.camel_to_snake(key)
+
+
+class ThingMeta(abc.ABCMeta):
+    """Metaclass of ``Thing``
+
+    Gives every class defining ``PROPERTIES`` a ``__slots__`` with one
+    slot per property (see ``property_slot``), so that ``Thing``s
+    carry no instance ``__dict__``, and a ``__property_slots__`` dict
+    mapping each property to its slot, in ``PROPERTIES`` order.
+
+    The properties are serialized in the order of the class's
+    ``SERIALIZED_PROPERTIES``, if it defines them along with
+    ``PROPERTIES``, else in ``PROPERTIES`` order; their slots are in
+    ``__serialized_slots__``.
+
+    Raises:
+        ValueError: When ``SERIALIZED_PROPERTIES`` are not among
+            ``PROPERTIES``
+    """
+
+    def __new__(mcs, name: str, bases: tuple, namespace: dict, **kwargs):
+        properties = namespace.get('PROPERTIES', NotImplemented)
+        if properties is not NotImplemented:
+            # each property is stored in its own slot, which stays
+            # empty (takes no memory beyond the slot) while unset
+            namespace['__property_slots__'] = {key: property_slot(key) for key in properties}
+            serialized = namespace.get('SERIALIZED_PROPERTIES', properties)
+            unknown = [key for key in serialized if key not in namespace['__property_slots__']]
+            if unknown:
+                raise ValueError('\'{}\' are not PROPERTIES of {}'.format('\', \''.join(unknown), name))
+            namespace['__serialized_slots__'] = {key: namespace['__property_slots__'][key] for key in serialized}
+            inherited = {slot for base in bases for cls in base.__mro__ for slot in getattr(cls, '__slots__', ())}
+            namespace['__slots__'] = tuple(slot for slot in namespace['__property_slots__'].values()
+                                           if slot not in inherited) + tuple(namespace.get('__slots__', ()))
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+
+class Thing(metaclass=ThingMeta):
+
+    __slots__ = ('_context',)
 
     PROPERTIES = NotImplemented
 
@@ -16,16 +63,13 @@ class Thing(metaclass=abc.ABCMeta):
         if cls.PROPERTIES is NotImplemented:
             raise NotImplementedError('class attribute \'PROPERTIES\' is not '
                                       'defined in {}'.format(cls.__name__))
+        cls.__serializer__ = ThingSerializer(cls)
 
     def json_serial(self):
-        properties = {'@type': self.type}
-        for k, v in self.__dict__.items():
-            if utils.snake_to_camel(k) in self.PROPERTIES and v is not None:
-                properties[utils.snake_to_camel(k)] = v
-        return properties
+        return self.__serializer__.properties(self)
 
     def __str__(self):
-        return json.dumps(self, default=utils.json_encoder)
+        return dumps(self)
 
     @property
     def type(self) -> str:
@@ -34,9 +34,10 @@ References:
     https://developers.google.com/search/docs/data-types/carousel
 """
 import enum
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Tuple
 
 from datatrans.structured_data.base import URL, Integer, Property, Thing
+from datatrans.structured_data.base.serializer import dumps
 
 
 class ItemListOrderType(enum.Enum):
@@ -65,8 +66,26 @@ class ItemList(Thing):
         itemListElement: ListItem
             List of items. All items must be of the same type.
             See ``ListItem`` for details.
+
+    The number and type of items are kept up to date as items are
+    appended, so ``append``, ``numberOfItems`` and
+    ``has_one_type_of_item`` take constant time.
+
+    Examples:
+        >>> from datatrans.structured_data.person import Person
+        >>> item_list = ItemList(Person('Mary'), Person('Bob'))
+        >>> item_list.has_one_type_of_item()
+        True
+        >>> item_list.append(5)
+        >>> item_list.numberOfItems, item_list.has_one_type_of_item()
+        (3, False)
     """
 
+    # type of the ``item`` of the first item that has one (None while
+    # there is none), whether every ``item`` is of that type, and
+    # whether the positions of the items are in ascending order
+    __slots__ = ('_item_type', '_one_type', '_in_order')
+
     PROPERTIES = (
         # required
         'itemListElement',
@@ -79,52 +98,143 @@ class ItemList(Thing):
                  itemListOrder: ItemListOrderType = ItemListOrderType.
                  ItemListOrderDescending, **kwargs):
         self._item_list_element: Property[ListItem] = Property()
-        for item in args:
-            if not isinstance(item, ListItem):
-                item = ListItem(item, position=self.numberOfItems + 1)
-            self._item_list_element.append(item)
-
         self._item_list_order: ItemListOrderType = itemListOrder
-
-        try:
-            if not self.has_one_type_of_item():
-                raise ValueError('More than 1 type of item')
-        except AttributeError:
-            pass
-
-        self._number_of_items = self.numberOfItems
+        self._number_of_items: Integer = 0
+        self._item_type: Optional[type] = None
+        self._one_type = True
+        self._in_order = True
+        for item in args:
+            self.append(item)
 
     def has_one_type_of_item(self) -> bool:
-        if hasattr(self, 'item'):
-            return len(set(listitem.item.__class__.__name__
-                           for listitem in self._item_list_element)) == 1
-        raise AttributeError(repr(self) + ' has no attribute \'item\'')
+        if self._item_type is None:
+            raise AttributeError(repr(self) + ' has no attribute \'item\'')
+        return self._one_type
 
     def sort(self) -> None:
         if self._item_list_order is not ItemListOrderType.ItemListUnordered:
+            reverse = {
+                ItemListOrderType.ItemListOrderAscending: True,
+                ItemListOrderType.ItemListOrderDescending: False,
+            }[self._item_list_order]
+            if self._in_order and not reverse:
+                # items appended with increasing positions
+                return
+
             def get_position(listitem: ListItem):
                 return listitem.position
 
-            self._item_list_element.sort(
-                key=get_position,
-                reverse={
-                    ItemListOrderType.ItemListOrderAscending: True,
-                    ItemListOrderType.ItemListOrderDescending: False,
-                }[self._item_list_order])
+            self._item_list_element.sort(key=get_position, reverse=reverse)
+            self._in_order = not reverse
         else:
             raise ValueError('cannot sort ItemListUnordered')
 
     def append(self, item: 'ListItem') -> None:
         if not isinstance(item, ListItem):
-            item = ListItem(item, position=self.numberOfItems + 1)
+            item = ListItem(item, position=self._number_of_items + 1)
+        if item.item is not None:
+            if self._item_type is None:
+                self._item_type = type(item.item)
+            elif type(item.item) is not self._item_type:
+                self._one_type = False
+        if self._number_of_items and item.position < self._item_list_element[-1].position:
+            self._in_order = False
         self._item_list_element.append(item)
+        self._number_of_items += 1
 
     @property
     def numberOfItems(self) -> Integer:
         return self._get_number_of_items()
 
     def _get_number_of_items(self) -> Integer:
-        return len(self._item_list_element)
+        return self._number_of_items
+
+
+class ItemListBuilder:
+    """Builds a carousel over a stream of items as ``ItemList`` pages.
+
+    Items are given positions as they are added, continuing from page to
+    page, and each page is handed over as soon as it is full, so that
+    only one page of items is held at a time.
+
+    Args:
+        page_size: Number of items per page
+        itemListOrder: ``itemListOrder`` of the pages
+        start: Position of the first item
+
+    Examples:
+        >>> builder = ItemListBuilder(page_size=2)
+        >>> pages = list(builder.pages(['http://example.com/coffee_cake.html', 'http://example.com/apple_pie.html',
+        ...                             'http://example.com/blueberry-pie.html']))
+        >>> [[item.position for item in page._item_list_element] for page in pages]
+        [[1, 2], [3]]
+        >>> builder.count
+        3
+    """
+
+    __slots__ = ('page_size', 'item_list_order', 'count', '_position', '_page')
+
+    def __init__(self, page_size: int = 100, *,
+                 itemListOrder: ItemListOrderType = ItemListOrderType.ItemListOrderDescending, start: int = 1):
+        if page_size <= 0:
+            raise ValueError('page_size should be positive')
+        self.page_size = page_size
+        self.item_list_order = itemListOrder
+        self.count = 0
+        self._position = start
+        self._page: Optional[ItemList] = None
+
+    def add(self, item) -> Optional[ItemList]:
+        """Adds ``item``, a ``Thing`` or the URL of its page.
+
+        Returns:
+            The page, if ``item`` completed it
+        """
+        list_item = ListItem(item, position=self._position)
+        if self._page is None:
+            self._page = ItemList(itemListOrder=self.item_list_order)
+        self._page.append(list_item)
+        self._position += 1
+        self.count += 1
+        if self._page.numberOfItems == self.page_size:
+            return self.finish()
+        return None
+
+    def finish(self) -> Optional[ItemList]:
+        """ Returns the current page, if it has any item, and starts a new one. """
+        page, self._page = self._page, None
+        return page
+
+    def pages(self, items: Iterable) -> Iterator[ItemList]:
+        """ Adds each of ``items``, yielding every page as it is completed, the last one included. """
+        for item in items:
+            page = self.add(item)
+            if page is not None:
+                yield page
+        page = self.finish()
+        if page is not None:
+            yield page
+
+
+def paginate(items: Iterable, page_size: int = 100, **kwargs) -> Iterator[ItemList]:
+    """ Yields ``items`` as ``ItemList`` pages of ``page_size``, see ``ItemListBuilder``. """
+    return ItemListBuilder(page_size, **kwargs).pages(items)
+
+
+def serialize_pages(items: Iterable, page_size: int = 100, *, separators: Tuple[str, str] = (',', ':'),
+                    ensure_ascii: bool = False, **kwargs) -> Iterator[str]:
+    """Yields the JSON-LD of each page of ``items``, see ``paginate``.
+
+    Each page is serialized and released before the next is built.
+
+    Examples:
+        >>> list(serialize_pages(['http://example.com/coffee_cake.html'], page_size=10))
+        ['{"@type":"ItemList","itemListElement":[{"@type":"ListItem","position":1,\
+"url":"http://example.com/coffee_cake.html"}],"itemListOrder":"https://schema.org/ItemListOrderDescending",\
+"numberOfItems":1}']
+    """
+    for page in paginate(items, page_size, **kwargs):
+        yield dumps(page, separators=separators, ensure_ascii=ensure_ascii)
 
 
 class ListItem(Thing):
@@ -168,6 +278,12 @@ class ListItem(Thing):
             text. Example: https://example.org/recipes/pies#apple_pie.
         position: Integer
             The item's position in the carousel. This is a 1-based number.
+
+    Examples:
+        >>> list_item = ListItem('http://example.com/coffee_cake.html', position=1)
+        >>> list_item.position = 2
+        >>> print(list_item)
+        {"@type": "ListItem", "position": 2, "url": "http://example.com/coffee_cake.html"}
     """
 
     PROPERTIES = (
@@ -180,11 +296,37 @@ class ListItem(Thing):
     )
 
     def __init__(self, arg, *, position: Integer):
-        self.position = position
+        self._position: Integer = position
         if URL.is_url(arg):
-            self.url: Optional[URL] = URL(arg)
+            self._item: Optional[Thing] = None
+            self._url: Optional[URL] = URL(arg)
         else:
-            self.item: Optional[Thing] = arg
+            self._item = arg
+            self._url = None
+
+    @property
+    def position(self) -> Integer:
+        return self._position
+
+    @position.setter
+    def position(self, value: Integer):
+        self._position = value
+
+    @property
+    def item(self) -> Optional[Thing]:
+        return self._item
+
+    @item.setter
+    def item(self, value: Optional[Thing]):
+        self._item = value
+
+    @property
+    def url(self) -> Optional[URL]:
+        return self._url
+
+    @url.setter
+    def url(self, value: Optional[URL]):
+        self._url = value
 
 
 if __name__ == '__main__':
@@ -19,12 +19,18 @@ class InteractionCounter(Thing):
         # optional
         'interactionService',
     )
+    # in the order the constructor sets them
+    SERIALIZED_PROPERTIES = (
+        'interactionService',
+        'interactionType',
+        'userInteractionCount',
+    )
 
     def __init__(self, *, interactionType: Action,
                  userInteractionCount: Integer, **kwargs):
         self._interaction_service = kwargs.pop('interactionService', None)
         self._interaction_type = interactionType
-        self.user_interaction_count = userInteractionCount
+        self._user_interaction_count = userInteractionCount
 
 
 if __name__ == '__main__':
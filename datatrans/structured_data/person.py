@@ -8,7 +8,7 @@ from datatrans.structured_data.base import Text, Thing
 
 class Person(Thing):
     PROPERTIES = (
-        'name'
+        'name',
     )
 
     def __init__(self, name: Text):
@@ -3,7 +3,6 @@
 References:
     https://developers.google.com/search/docs/data-types/recipe
 """
-import warnings
 from typing import Iterable, Optional, Union
 
 from datatrans.structured_data.base import URL, Date, Number, Property, Text, Thing
@@ -69,6 +68,8 @@ class NutritionInformation(Thing):
         if isinstance(calories, Number):
             calories = Energy(calories, EnergyUnit.CALORIE)
         self._calories: Energy = calories
+        for key in self.PROPERTIES[1:]:
+            setattr(self, self.__property_slots__[key], kwargs.pop(key, None))
 
 
 class Recipe(Thing):
@@ -229,6 +230,27 @@ class Recipe(Thing):
         # optional
         'cookingMethod',
     )
+    # in the order the constructor sets them
+    SERIALIZED_PROPERTIES = (
+        'image',
+        'name',
+        'aggregateRating',
+        'author',
+        'cookTime',
+        'datePublished',
+        'description',
+        'keywords',
+        'nutrition',
+        'prepTime',
+        'recipeCategory',
+        'recipeCuisine',
+        'recipeIngredient',
+        'recipeInstructions',
+        'recipeYield',
+        'totalTime',
+        'video',
+        'cookingMethod',
+    )
 
     def __init__(
             self,
@@ -251,21 +273,19 @@ class Recipe(Thing):
             totalTime: Optional[Duration] = None,
             video: Optional[VideoObject] = None,
             **kwargs):
+        # with ``suppress``, missing required properties are left to
+        # ``structured_data.validation`` to report
         suppress = kwargs.pop('suppress', False)
         if image is None:
-            self._image = None
-            if suppress:
-                warnings.warn('Warning: required property \'image\' unfilled')
-            else:
+            if not suppress:
                 raise ValueError('required property \'image\' unfilled')
+            self._image = None
         else:
             self._image: Property[URL] = Property(*image, class_=URL)
         if name is None:
-            self._name = None
-            if suppress:
-                warnings.warn('Warning: required property \'name\' unfilled')
-            else:
+            if not suppress:
                 raise ValueError('required property \'name\' unfilled')
+            self._name = None
         else:
             self._name: Text = name
         self._aggregate_rating = aggregateRating
@@ -63,13 +63,14 @@ class AggregateRating(Thing):
     """
     PROPERTIES = (
         # required
-        'ratingValue'
+        'itemReviewed',
+        'ratingValue',
         # one of the following
-        'ratingCount'
-        'reviewCount'
+        'ratingCount',
+        'reviewCount',
         # recommended
-        'bestRating'
-        'worstRating'
+        'bestRating',
+        'worstRating',
     )
 
     def __init__(self, *, itemReviewed: Thing = None, ratingValue: Number,
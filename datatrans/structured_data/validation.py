@@ -0,0 +1,428 @@
+"""Bulk validation of structured data against Google's requirements
+
+The required, recommended and type constraints of each ``Thing``
+subclass are declared once, as a ``Spec`` in ``SPECS``. A ``Validator``
+compiles each spec into a checker for its class the first time an
+object of the class is validated, then checks objects (and the
+``Thing``s nested in them) in one pass over their properties.
+
+Problems are returned as ``(IssueCode, 'Type.property')`` pairs, which
+``ValidationReport`` counts by code and property over many records
+instead of emitting one warning each.
+
+References:
+    https://developers.google.com/search/docs/data-types/recipe
+    https://developers.google.com/search/docs/data-types/carousel
+    https://developers.google.com/search/docs/data-types/video
+"""
+import datetime
+import enum
+from collections import Counter
+from itertools import repeat
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from datatrans.structured_data.base import URL, Number, Text, Thing
+from datatrans.structured_data.base.serializer import values_getter
+from datatrans.structured_data.carousel import ItemList, ListItem
+from datatrans.structured_data.lower.action import Action
+from datatrans.structured_data.lower.interaction_counter import InteractionCounter
+from datatrans.structured_data.lower.quantity import Energy, Mass
+from datatrans.structured_data.person import Person
+from datatrans.structured_data.recipe import NutritionInformation, Recipe
+from datatrans.structured_data.review import AggregateRating
+from datatrans.structured_data.video import VideoObject
+
+__all__ = ['IssueCode', 'Severity', 'Issue', 'Spec', 'SPECS', 'Validator', 'ValidationReport', 'validate']
+
+Problem = Tuple['IssueCode', str]
+
+
+class Severity(enum.Enum):
+    ERROR = 'error'
+    WARNING = 'warning'
+
+
+class IssueCode(enum.Enum):
+    MISSING_REQUIRED = 'missing-required'
+    MISSING_ONE_OF = 'missing-one-of'
+    INVALID_TYPE = 'invalid-type'
+    FAILED_CHECK = 'failed-check'
+    MISSING_RECOMMENDED = 'missing-recommended'
+    INCOMPLETE_PAIR = 'incomplete-pair'
+
+    @property
+    def severity(self) -> Severity:
+        if self in (IssueCode.MISSING_RECOMMENDED, IssueCode.INCOMPLETE_PAIR):
+            return Severity.WARNING
+        return Severity.ERROR
+
+
+class Issue(NamedTuple):
+    """A problem found in a record.
+
+    Attributes:
+        record: Position of the record (e.g. its line number), if known
+        code: What the problem is
+        path: ``'Type.property'`` the problem is about; properties of a
+            group are joined with ``|`` (one of) or ``+`` (pair)
+    """
+    record: Optional[int]
+    code: IssueCode
+    path: str
+
+    def __str__(self):
+        where = '' if self.record is None else 'record #{}: '.format(self.record)
+        return '{}{} {} \'{}\''.format(where, self.code.severity.value, self.code.value, self.path)
+
+
+class Spec:
+    """Constraints on the properties of a ``Thing`` subclass.
+
+    Attributes:
+        required (Tuple[str, ...]): Properties that must be filled
+        recommended (Tuple[str, ...]): Properties that should be filled
+        one_of (Tuple[Tuple[str, ...], ...]): Groups of properties of
+            which at least one must be filled
+        pairs (Tuple[Tuple[str, str], ...]): Properties that should be
+            used in combination: both or neither
+        types (Dict[str, tuple]): Accepted types of each property. Every
+            element of a list value must be of one of them.
+        checks (Tuple[Tuple[str, Callable[[Thing], bool]], ...]):
+            ``(property, predicate)`` of further checks, a predicate
+            returns False when the object is invalid
+    """
+
+    __slots__ = ('required', 'recommended', 'one_of', 'pairs', 'types', 'checks')
+
+    def __init__(self, *, required: Sequence[str] = (), recommended: Sequence[str] = (),
+                 one_of: Sequence[Sequence[str]] = (), pairs: Sequence[Tuple[str, str]] = (),
+                 types: Dict[str, tuple] = None, checks: Sequence[Tuple[str, Callable[[Thing], bool]]] = ()):
+        self.required = tuple(required)
+        self.recommended = tuple(recommended)
+        self.one_of = tuple(map(tuple, one_of))
+        self.pairs = tuple(map(tuple, pairs))
+        self.types = dict(types or {})
+        self.checks = tuple(checks)
+
+    def properties(self) -> set:
+        """ Returns every property the spec refers to. """
+        return {*self.required, *self.recommended, *(key for group in self.one_of for key in group),
+                *(key for pair in self.pairs for key in pair), *self.types, *(key for key, _ in self.checks)}
+
+
+def _has_one_type_of_item(item_list: ItemList) -> bool:
+    """ Returns True if all items of ``item_list`` are of the same type, see ``ItemList.has_one_type_of_item``. """
+    types = {type(list_item.item) for list_item in item_list._item_list_element if list_item.item is not None}
+    return len(types) <= 1
+
+
+_DATE = (datetime.date, Text)
+_DURATION = (datetime.timedelta, Text)
+_MASS = (Mass, Text)
+
+SPECS: Dict[type, Spec] = {
+    Recipe: Spec(
+        required=('image', 'name'),
+        recommended=('aggregateRating', 'author', 'cookTime', 'datePublished', 'description', 'keywords',
+                     'nutrition', 'prepTime', 'recipeCategory', 'recipeCuisine', 'recipeIngredient',
+                     'recipeInstructions', 'recipeYield', 'totalTime', 'video'),
+        pairs=(('prepTime', 'cookTime'),),
+        types={
+            'image': (URL,), 'name': (Text,), 'aggregateRating': (AggregateRating,), 'author': (Person,),
+            'cookTime': _DURATION, 'datePublished': _DATE, 'description': (Text,), 'keywords': (Text,),
+            'nutrition': (NutritionInformation,), 'prepTime': _DURATION, 'recipeCategory': (Text,),
+            'recipeCuisine': (Text,), 'recipeIngredient': (Text,), 'recipeInstructions': (Text,),
+            'recipeYield': (Text, Number), 'totalTime': _DURATION, 'video': (VideoObject,),
+            'cookingMethod': (Text,),
+        },
+    ),
+    NutritionInformation: Spec(
+        required=('calories',),
+        types={
+            'calories': (Energy, Number), 'servingSize': (Mass, Text), 'carbohydrateContent': _MASS,
+            'cholesterolContent': _MASS, 'fatContent': _MASS, 'fiberContent': _MASS, 'proteinContent': _MASS,
+            'saturatedFatContent': _MASS, 'sodiumContent': _MASS, 'sugarContent': _MASS,
+            'transFatContent': _MASS, 'unsaturatedFatContent': _MASS,
+        },
+    ),
+    # ``itemReviewed`` is omitted when the rating is embedded in the reviewed item
+    AggregateRating: Spec(
+        required=('ratingValue',),
+        recommended=('bestRating', 'worstRating'),
+        one_of=(('ratingCount', 'reviewCount'),),
+        types={
+            'itemReviewed': (Thing,), 'ratingValue': (Number, Text), 'ratingCount': (Number,),
+            'reviewCount': (Number,), 'bestRating': (Number,), 'worstRating': (Number,),
+        },
+    ),
+    Person: Spec(
+        required=('name',),
+        types={'name': (Text,)},
+    ),
+    VideoObject: Spec(
+        required=('name', 'description', 'thumbnailUrl', 'uploadDate'),
+        recommended=('contentUrl', 'duration', 'embedUrl', 'expires', 'interactionStatistic'),
+        types={
+            'name': (Text,), 'description': (Text,), 'thumbnailUrl': (URL,), 'uploadDate': _DATE,
+            'contentUrl': (Text,), 'duration': _DURATION, 'embedUrl': (Text,), 'expires': _DATE,
+            'interactionStatistic': (InteractionCounter,), 'author': (Person,),
+        },
+    ),
+    InteractionCounter: Spec(
+        required=('interactionType', 'userInteractionCount'),
+        types={'interactionType': (Action,), 'userInteractionCount': (int,)},
+    ),
+    ItemList: Spec(
+        required=('itemListElement',),
+        types={'itemListElement': (ListItem,)},
+        checks=(('itemListElement', _has_one_type_of_item),),
+    ),
+    ListItem: Spec(
+        required=('position',),
+        one_of=(('item', 'url'),),
+        types={'position': (int,), 'item': (Thing,), 'url': (URL,)},
+    ),
+}
+
+
+def _is_missing(value) -> bool:
+    return value is None or (not value and isinstance(value, (str, list)))
+
+
+class Validator:
+    """Checks ``Thing``s against their ``Spec``.
+
+    Specs are compiled per class on first use, so changes to ``specs``
+    after that are not seen by the validator.
+
+    Args:
+        specs: Optional. The spec of each class, defaults to ``SPECS``.
+            Objects of classes without a spec are not checked, but
+            objects nested in them are not reached either.
+        recommended: If False, recommended properties and pairs are
+            not checked
+
+    Examples:
+        >>> validator = Validator()
+        >>> recipe = Recipe(name='Coffee Cake', suppress=True,
+        ...                 aggregateRating=AggregateRating(ratingValue='5', ratingCount=18))
+        >>> [str(issue) for issue in validator.validate(recipe) if issue.code.severity is Severity.ERROR]
+        ["error missing-required 'Recipe.image'"]
+        >>> Validator(recommended=False).check(Recipe(name='Cake', image=['https://example.com/cake.jpg'], author=1))
+        [(<IssueCode.INVALID_TYPE: 'invalid-type'>, 'Recipe.author')]
+    """
+
+    def __init__(self, specs: Dict[type, Spec] = None, *, recommended: bool = True):
+        self.specs = SPECS if specs is None else specs
+        self.recommended = recommended
+        self._checkers: Dict[type, Optional[Callable[[Thing, list], None]]] = {}
+
+    def _checker(self, cls: type) -> Optional[Callable[[Thing, list], None]]:
+        try:
+            return self._checkers[cls]
+        except KeyError:
+            checker = self._checkers[cls] = self._compile(cls)
+            return checker
+
+    def _compile(self, cls: type) -> Optional[Callable[[Thing, list], None]]:
+        """ Returns a function appending the problems of an object of ``cls`` to a list. """
+        spec = self.specs.get(cls)
+        if spec is None:
+            return None
+        # every property is checked, including those left out of the JSON-LD
+        index = {key: i for i, key in enumerate(cls.__property_slots__)}
+        for key in spec.properties():
+            if key not in index:
+                raise ValueError('\'{}\' is not a property of {}'.format(key, cls.__name__))
+        values = values_getter(tuple(cls.__property_slots__.values()))
+        name = cls.__name__
+
+        def problem(code: IssueCode, *keys: str, separator: str = '|') -> Problem:
+            return code, '{}.{}'.format(name, separator.join(keys))
+
+        # required and recommended properties are checked in one loop
+        missing = tuple((index[key], problem(IssueCode.MISSING_REQUIRED, key)) for key in spec.required)
+        one_of = tuple((tuple(index[key] for key in group), problem(IssueCode.MISSING_ONE_OF, *group))
+                       for group in spec.one_of)
+        types = tuple((index[key], types_, problem(IssueCode.INVALID_TYPE, key))
+                      for key, types_ in spec.types.items())
+        checks = tuple((predicate, problem(IssueCode.FAILED_CHECK, key)) for key, predicate in spec.checks)
+        if self.recommended:
+            missing += tuple((index[key], problem(IssueCode.MISSING_RECOMMENDED, key))
+                             for key in spec.recommended)
+            pairs = tuple((index[a], index[b], problem(IssueCode.INCOMPLETE_PAIR, a, b, separator='+'))
+                          for a, b in spec.pairs)
+        else:
+            pairs = ()
+        # only properties that may hold ``Thing``s are walked into
+        nested = tuple(index[key] for key, types_ in spec.types.items()
+                       if any(isinstance(type_, type) and issubclass(type_, Thing) for type_ in types_))
+        checker_of = self._checker
+
+        def check(obj: Thing, problems: list) -> None:
+            vals = values(obj)
+            for i, problem_ in missing:
+                value = vals[i]
+                if value is None or (not value and isinstance(value, (str, list))):
+                    problems.append(problem_)
+            for indexes, problem_ in one_of:
+                if all(_is_missing(vals[i]) for i in indexes):
+                    problems.append(problem_)
+            for a, b, problem_ in pairs:
+                if _is_missing(vals[a]) is not _is_missing(vals[b]):
+                    problems.append(problem_)
+            for i, types_, problem_ in types:
+                value = vals[i]
+                if value is None:
+                    continue
+                if isinstance(value, list):
+                    if not all(map(isinstance, value, repeat(types_))):
+                        problems.append(problem_)
+                elif not isinstance(value, types_):
+                    problems.append(problem_)
+            for predicate, problem_ in checks:
+                if not predicate(obj):
+                    problems.append(problem_)
+            for i in nested:
+                value = vals[i]
+                if value is None:
+                    continue
+                for item in (value if isinstance(value, list) else (value,)):
+                    checker = checker_of(type(item))
+                    if checker is not None:
+                        checker(item, problems)
+
+        return check
+
+    def check(self, obj: Thing) -> List[Problem]:
+        """ Returns the ``(IssueCode, path)`` of each problem of ``obj`` and the ``Thing``s in it. """
+        problems = []
+        checker = self._checker(type(obj))
+        if checker is not None:
+            checker(obj, problems)
+        return problems
+
+    def validate(self, obj: Thing, record: int = None) -> List[Issue]:
+        """ Returns the issues of ``obj``, see ``check``. """
+        return [Issue(record, code, path) for code, path in self.check(obj)]
+
+    def validate_all(self, objs: Iterable[Thing], report: 'ValidationReport' = None,
+                     start: int = 1) -> 'ValidationReport':
+        """Validates each of ``objs``.
+
+        Args:
+            objs: Objects to validate, numbered from ``start``
+            report: Optional. Report to add the issues to
+            start: Number of the first object
+        """
+        report = ValidationReport() if report is None else report
+        add = report.add
+        check = self.check
+        for record, obj in enumerate(objs, start=start):
+            add(record, check(obj))
+        return report
+
+
+class ValidationReport:
+    """Issues found over many records.
+
+    Attributes:
+        records (int): Number of records validated
+        invalid_records (int): Number of records with at least one error
+        counts (Counter): Number of each ``(IssueCode, path)``
+        issues (List[Issue]): The first ``max_issues`` issues
+        max_issues (int): Number of issues kept in ``issues``, so that
+            memory stays bounded however many records are validated
+    """
+
+    __slots__ = ('records', 'invalid_records', 'counts', 'issues', 'max_issues')
+
+    def __init__(self, max_issues: int = 1000):
+        self.records = 0
+        self.invalid_records = 0
+        self.counts: Counter = Counter()
+        self.issues: List[Issue] = []
+        self.max_issues = max_issues
+
+    def add(self, record: Optional[int], problems: List[Problem]) -> None:
+        """ Adds the ``problems`` of one record, as returned by ``Validator.check``. """
+        self.records += 1
+        if not problems:
+            return
+        self.counts.update(problems)
+        if any(code.severity is Severity.ERROR for code, _ in problems):
+            self.invalid_records += 1
+        room = self.max_issues - len(self.issues)
+        if room > 0:
+            self.issues.extend(Issue(record, code, path) for code, path in problems[:room])
+
+    def update(self, other: 'ValidationReport') -> None:
+        """ Adds the records of ``other``, e.g. the report of another shard. """
+        self.records += other.records
+        self.invalid_records += other.invalid_records
+        self.counts.update(other.counts)
+        self.issues.extend(other.issues[:max(self.max_issues - len(self.issues), 0)])
+
+    def count(self, code: IssueCode = None, severity: Severity = None) -> int:
+        """ Returns the number of issues, optionally only of ``code`` or ``severity``. """
+        return sum(n for (code_, _), n in self.counts.items()
+                   if (code is None or code_ is code) and (severity is None or code_.severity is severity))
+
+    def as_dict(self) -> dict:
+        """ Returns the report as a JSON serializable dict. """
+        by_code = Counter()
+        for (code, _), n in self.counts.items():
+            by_code[code.value] += n
+        return {
+            'records': self.records,
+            'invalidRecords': self.invalid_records,
+            'issues': dict(by_code),
+            'byPath': [{'code': code.value, 'severity': code.severity.value, 'path': path, 'count': n}
+                       for (code, path), n in self.counts.most_common()],
+        }
+
+    def summary(self) -> str:
+        """ Returns the counts of the report as text, most common first. """
+        lines = ['{} records, {} invalid ({} errors, {} warnings)'.format(
+            self.records, self.invalid_records, self.count(severity=Severity.ERROR),
+            self.count(severity=Severity.WARNING))]
+        lines.extend('{:>10}  {:<7} {:<19} {}'.format(n, code.severity.value, code.value, path)
+                     for (code, path), n in self.counts.most_common())
+        return '\n'.join(lines)
+
+
+_validator: Optional[Validator] = None
+
+
+def validate(obj: Thing, record: int = None) -> List[Issue]:
+    """ Returns the issues of ``obj`` under ``SPECS``, see ``Validator.validate``. """
+    global _validator
+    if _validator is None:
+        _validator = Validator()
+    return _validator.validate(obj, record)
+
+
+if __name__ == '__main__':
+    import time
+
+    from datatrans.structured_data import Duration, Property
+
+    n = 200000
+    recipes = [Recipe(
+        name='Coffee Cake {}'.format(i),
+        image=['https://example.com/photos/1x1/photo.jpg'] if i % 10 else None,
+        author=Person('Mary Stone'),
+        description='This coffee cake is awesome and perfect for parties.',
+        prepTime=Duration(minutes=20),
+        cookTime=Duration(minutes=30) if i % 4 else None,
+        recipeIngredient=Property('2 cups of flour', '¾ cup white sugar', '2 teaspoons baking powder'),
+        recipeInstructions=Property('Preheat the oven to 350 degrees F.', 'Mix in the butter, eggs, and milk.'),
+        aggregateRating=AggregateRating(ratingValue=4.5, ratingCount=18 + i),
+        suppress=True,
+    ) for i in range(n)]
+
+    start = time.perf_counter()
+    report = Validator().validate_all(recipes)
+    elapsed = time.perf_counter() - start
+    print(report.summary())
+    print('{} recipes in {:.2f}s ({:.0f} recipes/s)'.format(n, elapsed, n / elapsed))
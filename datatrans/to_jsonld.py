@@ -1,12 +1,26 @@
+import contextlib
 import enum
-import json
+import functools
+import hashlib
+import itertools
+import os
+import shutil
 import warnings
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import datatrans.structured_data as schema
 import datatrans.utils
-import datatrans.utils.functions
 import datatrans.utils.structured_data
+from datatrans.structured_data.validation import ValidationReport, Validator
+
+if TYPE_CHECKING:
+    # imports numpy, so only imported by those deduplicating
+    from datatrans.dedup import Deduplicator
+
+__all__ = ['DataSet', 'RecipeAdapter', 'ADAPTERS', 'register_adapter', 'get_adapter', 'read_records', 'to_recipe',
+           'iter_recipes', 'validated', 'deduplicated', 'serialize', 'write_lines', 'convert', 'shard_file', 'convert_parallel',
+           'record_hash', 'convert_incremental', 'convert_all']
 
 
 @enum.unique
@@ -17,121 +31,729 @@ class DataSet(enum.Enum):
     EPICURIOUS = datatrans.utils.BASE_DIR / 'assets/epicurious-recipes.json'
 
 
+def read_records(path: Union[str, Path]) -> Iterator[dict]:
+    """ Yields each line of a JSON-lines file, plain or compressed, as a dict, one at a time. """
+    with datatrans.utils.open_file(path, 'rb') as jsonfile:
+        for line in jsonfile:
+            yield datatrans.utils.loads(line)
+
+
+class RecipeAdapter:
+    """Maps the records of one recipe source to ``schema.Recipe``.
+
+    Attributes:
+        name (str): Name of the source
+        input_path (Path): Default location of the source's JSON-lines file
+        output_path (Path): Default location of the converted JSON-LD
+        map_record (Callable[[dict, Optional[int]], dict]): Returns the
+            ``schema.Recipe`` keyword arguments of a decoded line, given
+            the line and its line number
+    """
+
+    __slots__ = ('name', 'input_path', 'output_path', 'map_record')
+
+    def __init__(self, name: str, input_path: Union[str, Path], map_record: Callable[[dict, Optional[int]], dict],
+                 output_path: Union[str, Path] = None):
+        self.name = name
+        self.input_path = Path(input_path)
+        self.output_path = Path(output_path) if output_path is not None else self.input_path.with_suffix('.json-ld')
+        self.map_record = map_record
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(self.__class__.__name__, self.name, str(self.input_path))
+
+    def to_recipe(self, data: dict, line_number: int = None) -> schema.Recipe:
+        return schema.Recipe(
+            **self.map_record(data, line_number),
+            suppress=True
+        )
+
+
+ADAPTERS: Dict[str, RecipeAdapter] = {}
+
+
+def register_adapter(source: Union[DataSet, str], input_path: Union[str, Path] = None,
+                     output_path: Union[str, Path] = None) -> Callable:
+    """Decorator registering a record mapping function as the adapter of ``source``.
+
+    Args:
+        source: A ``DataSet``, or the name of a new source
+        input_path: Location of the source. Required for new sources,
+            defaults to the value of ``DataSet`` members.
+        output_path: Optional. Defaults to ``input_path`` with a
+            ``.json-ld`` suffix
+
+    Examples:
+        >>> @register_adapter('example', input_path='example-recipes.json')
+        ... def map_example(data, line_number=None):
+        ...     return {'name': data['title']}
+        >>> get_adapter('example')
+        RecipeAdapter('example', 'example-recipes.json')
+        >>> get_adapter('example').output_path.name
+        'example-recipes.json-ld'
+        >>> get_adapter(DataSet.COOKSTR).output_path.name
+        'cookstr-recipes.json-ld'
+    """
+    if isinstance(source, DataSet):
+        input_path = input_path or source.value
+        source = source.name
+    elif input_path is None:
+        raise ValueError('input_path is required for \'{}\''.format(source))
+
+    def decorator(map_record: Callable[[dict, Optional[int]], dict]) -> Callable[[dict, Optional[int]], dict]:
+        ADAPTERS[source.lower()] = RecipeAdapter(source.lower(), input_path, map_record, output_path)
+        return map_record
+    return decorator
+
+
+def get_adapter(source: Union[DataSet, str, RecipeAdapter]) -> RecipeAdapter:
+    """ Returns the registered adapter of ``source``. """
+    if isinstance(source, RecipeAdapter):
+        return source
+    name = source.name if isinstance(source, DataSet) else source
+    try:
+        return ADAPTERS[name.lower()]
+    except KeyError as e:
+        raise ValueError('no adapter registered for \'{}\''.format(name)) from e.__context__
+
+
+@register_adapter(DataSet.EPICURIOUS)
+def map_epicurious(data: dict, line_number: int = None) -> dict:
+    """ Maps a line of ``DataSet.EPICURIOUS``. """
+    d = {
+        'datePublished': schema.DateTime.fromisoformat(data['pubDate']),
+        'name': data['hed'],
+        'recipeInstructions': schema.Property(*data['prepSteps']),
+        'aggregateRating': schema.AggregateRating(
+            ratingValue=data['aggregateRating'],
+            reviewCount=data['reviewsCount']
+        )
+    }
+
+    if data['reviewsCount'] != 0:
+        d['aggregateRating'] = schema.AggregateRating(
+            ratingValue=data['aggregateRating'],
+            reviewCount=data['reviewsCount']
+        )
+
+    if data['author']:
+        d['author'] = schema.Property(*[schema.Person(author['name'])
+                                        for author in data['author']])
+
+    try:
+        d['recipeIngredient'] = schema.Property(*data['ingredients'])
+    except KeyError as e:
+        warnings.warn('KeyError: {} in line#{}'.format(e, line_number))
+        try:
+            if data['tag']['category'] == 'ingredient':
+                d['recipeIngredient'] = data['tag']['name']
+        except KeyError as e:
+            warnings.warn('KeyError: {} in line#{}'.format(e, line_number))
+
+    try:
+        if data['tag']['category'] == 'cuisine':
+            d['recipeCuisine'] = data['tag']['name']
+    except KeyError as e:
+        warnings.warn('KeyError: {} in line#{}'.format(e, line_number))
+    return d
+
+
+@register_adapter(DataSet.ALLRECIPES)
+def map_allrecipes(data: dict, line_number: int = None) -> dict:
+    """ Maps a line of ``DataSet.ALLRECIPES``. """
+    d = {
+        'author': schema.Person(data['author']),
+        'description': data['description'],
+        'recipeIngredient': schema.Property(*data['ingredients']),
+        'recipeInstructions': schema.Property(*data['instructions']),
+        'name': data['title']
+    }
+    if data['prep_time_minutes'] != 0 or data['cook_time_minutes'] != 0:
+        d['prepTime'] = schema.Duration(minutes=data['prep_time_minutes'])
+        d['cookTime'] = schema.Duration(minutes=data['cook_time_minutes'])
+    if data['total_time_minutes'] != 0:
+        d['totalTime'] = schema.Duration(minutes=data['total_time_minutes'])
+    if data['review_count']:
+        d['aggregateRating'] = schema.AggregateRating(
+            ratingValue=data['rating_stars'],
+            reviewCount=data['review_count']
+        )
+    return d
+
+
+@register_adapter(DataSet.BBCCOUK)
+def map_bbccouk(data: dict, line_number: int = None) -> dict:
+    """ Maps a line of ``DataSet.BBCCOUK``. """
+    d = {
+        'author': schema.Person(data['chef']),
+        'recipeIngredient': schema.Property(*data['ingredients']),
+        'recipeInstructions': schema.Property(*data['instructions']),
+        'name': data['title']
+
+    }
+    if data['description']:
+        d['description'] = data['description']
+    if data['preparation_time_minutes'] != 0 or data['cooking_time_minutes'] != 0:
+        d['prepTime'] = schema.Duration(minutes=data['preparation_time_minutes'])
+        d['cookTime'] = schema.Duration(minutes=data['cooking_time_minutes'])
+    if data['total_time_minutes'] != 0:
+        d['totalTime'] = schema.Duration(minutes=data['total_time_minutes'])
+
+    # TODO: Also include serving size 'serve' into the data
+    return d
+
+
+@register_adapter(DataSet.COOKSTR)
+def map_cookstr(data: dict, line_number: int = None) -> dict:
+    """ Maps a line of ``DataSet.COOKSTR``. """
+    d = {
+        'cookingMethod': data['cooking_method'],
+        'datePublished': data['date_modified'],
+        'recipeIngredient': schema.Property(*data['ingredients']),
+        'recipeInstructions': schema.Property(*data['instructions']),
+        'name': data['title']
+    }
+    if data['chef']:
+        d['author'] = schema.Person(data['chef'])
+    if data['description']:
+        d['description'] = data['description']
+    if data['rating_count']:
+        d['aggregateRating'] = schema.AggregateRating(
+            ratingValue=data['rating_value'],
+            ratingCount=data['rating_count']
+        )
+    return d
+
+
+def to_recipe(data: dict, source: Union[DataSet, str, RecipeAdapter], line_number: int = None) -> schema.Recipe:
+    """Maps a record of ``source`` to a ``schema.Recipe``.
+
+    Prefer ``get_adapter(source).to_recipe`` when mapping many records.
+
+    Args:
+        data: A decoded line of the source
+        source: The source ``data`` comes from
+        line_number: Optional. Position of ``data`` for warnings
+    """
+    return get_adapter(source).to_recipe(data, line_number)
+
+
+def iter_recipes(source: Union[DataSet, str, RecipeAdapter],
+                 path: Union[str, Path] = None, *,
+                 profiler: 'datatrans.utils.StageProfiler' = None) -> Iterator[schema.Recipe]:
+    """Yields the recipes of ``source`` as they are read.
+
+    Args:
+        source: The source to convert
+        path: Optional. Where to read ``source`` from, if not from its
+            default location
+        profiler: Optional. Times the 'decode' (reading and decoding
+            of the lines), 'map' (``map_record``) and 'construct'
+            (``schema.Recipe``) stages
+    """
+    adapter = get_adapter(source)
+    records = read_records(path or adapter.input_path)
+    if profiler is not None:
+        records = profiler.iterate('decode', records)
+        adapter = RecipeAdapter(adapter.name, adapter.input_path, profiler.wrap('map', adapter.map_record),
+                                adapter.output_path)
+        to_recipe_ = profiler.wrap('construct', adapter.to_recipe)
+    else:
+        to_recipe_ = adapter.to_recipe
+    for line_number, data in enumerate(records, start=1):
+        yield to_recipe_(data, line_number)
+
+
+def validated(recipes: Iterable[schema.Recipe], report: ValidationReport, *, start: int = 1,
+              validator: Validator = None) -> Iterator[schema.Recipe]:
+    """Yields each of ``recipes`` after adding its issues to ``report``.
+
+    Args:
+        recipes: Recipes numbered from ``start``, e.g. by line number
+        report: Report to add the issues to
+        start: Number of the first recipe
+        validator: Optional. Defaults to a ``Validator`` of ``SPECS``
+    """
+    check = (validator or Validator()).check
+    add = report.add
+    for record, recipe in enumerate(recipes, start=start):
+        add(record, check(recipe))
+        yield recipe
+
+
+def deduplicated(recipes: Iterable[schema.Recipe], deduplicator: 'Deduplicator', source: str, *,
+                 start: int = 1, batch_size: int = 1024) -> Iterator[schema.Recipe]:
+    """Yields the recipes of ``recipes`` that are not near-duplicates of one seen before.
+
+    Recipes are compared on their ``name`` and ``recipeIngredient``, see
+    ``dedup.Deduplicator``. Duplicates are recorded in the clusters of
+    ``deduplicator`` under the key ``(source, number)``, so that one
+    deduplicator can be shared across sources.
+
+    Args:
+        recipes: Recipes numbered from ``start``, e.g. by line number
+        deduplicator: Holds the recipes seen before
+        source: Name of the source of ``recipes``
+        start: Number of the first recipe
+        batch_size: Number of recipes whose signatures are computed at
+            a time
+    """
+    batch: Dict[int, schema.Recipe] = {}
+
+    def keyed(recipes_: Iterable[schema.Recipe]):
+        for number, recipe in enumerate(recipes_, start=start):
+            batch[number] = recipe
+            properties = recipe.json_serial()
+            yield (source, number), properties.get('name'), properties.get('recipeIngredient')
+
+    for (_, number), representative in deduplicator.add_all(keyed(recipes), batch_size=batch_size):
+        recipe = batch.pop(number)
+        if representative is None:
+            yield recipe
+
+
+def serialize(recipe: schema.Recipe) -> str:
+    """ Returns ``recipe`` as a line of minified JSON-LD. """
+    return datatrans.utils.dumps(recipe)
+
+
+def write_lines(lines: Iterable[str], path: Union[str, Path], *, flush_every: int = 1000,
+                compression: str = None, max_records: int = None, max_bytes: int = None) -> int:
+    """Writes each of ``lines`` to ``path`` as it comes, see ``utils.RecordWriter``.
+
+    The file is flushed after the first line, then every ``flush_every``
+    lines, so records are on disk while the rest are being converted
+    (compressed output is only complete once closed).
+
+    Args:
+        lines: Lines without their newline
+        path: Location of the output
+        flush_every: Number of lines written between flushes
+        compression: Optional. 'gzip' or 'zstd', defaults to the
+            compression matching the suffix of ``path``
+        max_records: Optional. Maximum number of lines per shard
+        max_bytes: Optional. Maximum number of bytes per shard
+
+    Returns:
+        The number of lines written
+    """
+    with datatrans.utils.RecordWriter(path, compression=compression, max_records=max_records,
+                                      max_bytes=max_bytes) as writer:
+        write = writer.write
+        for line in lines:
+            write(line)
+            if writer.records == 1 or writer.records % flush_every == 0:
+                writer.flush()
+        return writer.records
+
+
+def convert(source: Union[DataSet, str, RecipeAdapter], output_path: Union[str, Path] = None, *,
+            input_path: Union[str, Path] = None, flush_every: int = 1000, report: ValidationReport = None,
+            compression: str = None, max_records: int = None, max_bytes: int = None,
+            dedup: 'Deduplicator' = None, profiler: 'datatrans.utils.StageProfiler' = None) -> int:
+    """Converts ``source`` to JSON-LD, one recipe per line.
+
+    Only one recipe is held in memory at a time. The input may be
+    compressed, and the output can be compressed and sharded, see
+    ``write_lines``.
+
+    Args:
+        source: The source to convert
+        output_path: Optional. Where to write the JSON-LD, if not to the
+            adapter's ``output_path``
+        input_path: Optional. Where to read ``source`` from, if not
+            from its default location
+        flush_every: Number of recipes written between flushes
+        report: Optional. If given, every recipe is validated and its
+            issues are added to ``report``, by line number
+        compression: Optional. 'gzip' or 'zstd', defaults to the
+            compression matching the suffix of ``output_path``
+        max_records: Optional. Maximum number of recipes per shard
+        max_bytes: Optional. Maximum number of bytes per shard
+        dedup: Optional. If given, recipes that are near-duplicates of
+            one seen before by ``dedup`` are left out, see
+            ``deduplicated``
+        profiler: Optional. Times the stages of the conversion, see
+            ``iter_recipes``, and the 'validate', 'dedup', 'encode' and
+            'write' stages
+
+    Returns:
+        The number of recipes written
+    """
+    adapter = get_adapter(source)
+    recipes = iter_recipes(adapter, input_path, profiler=profiler)
+    if report is not None:
+        recipes = validated(recipes, report)
+        if profiler is not None:
+            recipes = profiler.iterate('validate', recipes)
+    if dedup is not None:
+        recipes = deduplicated(recipes, dedup, adapter.name)
+        if profiler is not None:
+            recipes = profiler.iterate('dedup', recipes)
+    serialize_ = serialize if profiler is None else profiler.wrap('encode', serialize)
+    write_lines_ = write_lines if profiler is None else functools.partial(profiler.time, 'write', write_lines,
+                                                                          records=None)
+    return write_lines_(map(serialize_, recipes), output_path or adapter.output_path, flush_every=flush_every,
+                        compression=compression, max_records=max_records, max_bytes=max_bytes)
+
+
+def shard_file(path: Union[str, Path], chunk_size: int) -> List[Tuple[int, int, int]]:
+    """Splits a JSON-lines file into byte ranges of about ``chunk_size``.
+
+    Every range starts at the beginning of a line and ends after a
+    newline (or at the end of the file).
+
+    Returns:
+        A list of ``(start, end, first_line_number)``
+    """
+    if chunk_size <= 0:
+        raise ValueError('chunk_size should be positive')
+    shards = []
+    start = 0
+    line_number = 1
+    with Path(path).open('rb') as jsonfile:
+        size = os.fstat(jsonfile.fileno()).st_size
+        while start < size:
+            jsonfile.seek(start + chunk_size - 1)
+            jsonfile.readline()
+            end = min(jsonfile.tell(), size)
+            shards.append((start, end, line_number))
+            jsonfile.seek(start)
+            remaining = end - start
+            while remaining:
+                block = jsonfile.read(min(remaining, 1 << 20))
+                line_number += block.count(b'\n')
+                remaining -= len(block)
+            start = end
+    return shards
+
+
+def _convert_shard(adapter: RecipeAdapter, input_path: Path, shard: Tuple[int, int, int], output_path: Path,
+                   validate: bool = False, compression: str = None) -> Tuple[int, Optional[ValidationReport]]:
+    """ Converts the lines of ``input_path`` in the byte range of ``shard``. """
+    start, end, first_line_number = shard
+    to_recipe_ = adapter.to_recipe
+
+    def recipes() -> Iterator[schema.Recipe]:
+        with input_path.open('rb') as jsonfile:
+            jsonfile.seek(start)
+            line_number = first_line_number
+            while jsonfile.tell() < end:
+                line = jsonfile.readline()
+                yield to_recipe_(datatrans.utils.loads(line), line_number)
+                line_number += 1
+
+    if not validate:
+        return write_lines(map(serialize, recipes()), output_path, compression=compression), None
+    report = ValidationReport()
+    return write_lines(map(serialize, validated(recipes(), report, start=first_line_number)), output_path,
+                       compression=compression), report
+
+
+def convert_parallel(source: Union[DataSet, str, RecipeAdapter], output_path: Union[str, Path] = None, *,
+                     input_path: Union[str, Path] = None, workers: int = None,
+                     chunk_size: int = 16 << 20, merge: bool = True, report: ValidationReport = None,
+                     compression: str = None) -> int:
+    """Converts ``source`` to JSON-LD with a pool of processes.
+
+    The input is split into shards of about ``chunk_size`` bytes on line
+    boundaries (see ``shard_file``) and each shard is converted by a
+    worker process into its own file, named after ``output_path`` as
+    the shards of ``utils.RecordWriter`` are (see ``utils.shard_path``).
+
+    Args:
+        source: The source to convert
+        output_path: Optional. Where to write the JSON-LD, if not to the
+            adapter's ``output_path``
+        input_path: Optional. Where to read ``source`` from, if not
+            from its default location
+        workers: Optional. Number of processes, defaults to the number
+            of CPUs
+        chunk_size: Approximate size of a shard in bytes
+        merge: If True, the shards are concatenated in input order into
+            ``output_path`` and removed. Otherwise they are kept as is.
+        report: Optional. If given, every recipe is validated and the
+            issues of all shards are added to ``report``
+        compression: Optional. 'gzip' or 'zstd', defaults to the
+            compression matching the suffix of ``output_path``. Shards
+            are compressed by the workers; compressed shards concatenate
+            into a valid compressed file.
+
+    Raises:
+        ValueError: When the input is compressed, as it cannot be split
+
+    Returns:
+        The number of recipes written
+    """
+    adapter = get_adapter(source)
+    input_path = datatrans.utils.find_file(input_path or adapter.input_path)
+    if datatrans.utils.detect_compression(input_path) is not None:
+        raise ValueError('cannot split compressed input \'{}\''.format(input_path))
+    output_path = Path(output_path or adapter.output_path)
+    shards = shard_file(input_path, chunk_size)
+    shard_paths = [datatrans.utils.shard_path(output_path, i) for i in range(len(shards))]
+
+    import concurrent.futures  # only imported by the processes converting in parallel
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_convert_shard, [adapter] * len(shards), [input_path] * len(shards),
+                               shards, shard_paths, [report is not None] * len(shards),
+                               [compression] * len(shards))
+        total = 0
+        jsonfile = output_path.open('wb') if merge else None
+        try:
+            # ``map`` yields in submission order, so shards are appended
+            # as soon as they and every shard before them are done
+            for (count, shard_report), shard_path in zip(results, shard_paths):
+                if merge:
+                    with shard_path.open('rb') as shardfile:
+                        shutil.copyfileobj(shardfile, jsonfile)
+                    shard_path.unlink()
+                if shard_report is not None:
+                    report.update(shard_report)
+                total += count
+        finally:
+            if jsonfile is not None:
+                jsonfile.close()
+        return total
+
+
+def record_hash(line: bytes) -> str:
+    """Returns the content hash of a line of a JSON-lines file.
+
+    Examples:
+        >>> record_hash(b'{"title": "Coffee Cake"}\\n') == record_hash(b'{"title": "Coffee Cake"}\\r\\n')
+        True
+    """
+    return hashlib.blake2b(line.rstrip(b'\r\n'), digest_size=16).hexdigest()
+
+
+def _with_suffix(path: Path, suffix: str) -> Path:
+    return path.with_name(path.name + suffix)
+
+
+def _adapter_version(adapter: RecipeAdapter) -> str:
+    """ Returns a hash of the adapter's mapping function, so that output is not reused across changes to it. """
+    import inspect
+
+    try:
+        source = inspect.getsource(adapter.map_record).encode('utf-8')
+    except (OSError, TypeError):
+        source = adapter.map_record.__code__.co_code
+    return hashlib.blake2b(source, digest_size=8).hexdigest()
+
+
+def _read_manifest(manifest_path: Path, header: dict, output_path: Path) -> Dict[str, Tuple[int, int]]:
+    """Returns the ``(offset, length)`` in ``output_path`` of the output of each record hash.
+
+    The manifest is only used if it was written for the same ``header``
+    and completed for the current ``output_path``; otherwise nothing
+    can be reused and an empty dict is returned.
+    """
+    try:
+        with manifest_path.open('rb') as manifest:
+            lines = manifest.read().splitlines()
+        stat = output_path.stat()
+    except FileNotFoundError:
+        return {}
+    if len(lines) < 2 or datatrans.utils.loads(lines[0]) != header:
+        return {}
+    trailer = datatrans.utils.loads(lines[-1])
+    if not isinstance(trailer, dict) or trailer.get('size') != stat.st_size \
+            or trailer.get('mtime') != stat.st_mtime_ns:
+        return {}
+    return {digest: (offset, length) for digest, offset, length in map(datatrans.utils.loads, lines[1:-1])}
+
+
+def _read_partial_manifest(manifest_path: Path, header: dict,
+                           output_size: int) -> Tuple[List[Tuple[str, int, int]], int]:
+    """Returns the records of an interrupted run that are completely written.
+
+    Returns:
+        The ``(hash, output_end, manifest_end)`` of each record, in
+        order, and the end of the header in the manifest (0 if the
+        manifest cannot be resumed)
+    """
+    entries = []
+    try:
+        manifest = manifest_path.open('rb')
+    except FileNotFoundError:
+        return entries, 0
+    with manifest:
+        line = manifest.readline()
+        try:
+            if not line.endswith(b'\n') or datatrans.utils.loads(line) != header:
+                return entries, 0
+            header_end = manifest.tell()
+            end = 0
+            for line in manifest:
+                if not line.endswith(b'\n'):
+                    break
+                digest, offset, length = datatrans.utils.loads(line)
+                # only records whose output reached the disk count
+                if offset != end or offset + length > output_size:
+                    break
+                end = offset + length
+                entries.append((digest, end, manifest.tell()))
+        except ValueError:
+            pass
+    return entries, header_end
+
+
+def convert_incremental(source: Union[DataSet, str, RecipeAdapter], output_path: Union[str, Path] = None, *,
+                        input_path: Union[str, Path] = None, flush_every: int = 1000) -> Dict[str, int]:
+    """Converts ``source`` to JSON-LD, reusing the output of unchanged records.
+
+    A manifest, named after ``output_path`` with ``.manifest``
+    appended, records the content hash (see ``record_hash``) of each
+    input line and where its JSON-LD is in ``output_path``. On the next
+    run, the output of lines whose hash is in the manifest is copied
+    from the previous ``output_path``; only new or changed lines are
+    converted. Changes to the adapter's mapping function invalidate the
+    manifest.
+
+    The new output and manifest are written to ``.partial`` files, which
+    replace the previous ones at the end. The partial manifest is
+    appended to after each record and flushed with the output, so that
+    an interrupted run resumes after the last record written.
+
+    Args:
+        source: The source to convert
+        output_path: Optional. Where to write the JSON-LD, if not to the
+            adapter's ``output_path``. It cannot be compressed, as the
+            output of records is read back from it by offset.
+        input_path: Optional. Where to read ``source`` from, if not
+            from its default location
+        flush_every: Number of records written between flushes
+
+    Raises:
+        ValueError: When ``output_path`` is a compressed file name
+
+    Returns:
+        The number of ``records`` written, of which ``resumed`` from an
+        interrupted run, ``reused`` from the previous output and
+        ``converted``
+    """
+    adapter = get_adapter(source)
+    input_path = Path(input_path or adapter.input_path)
+    output_path = Path(output_path or adapter.output_path)
+    if output_path.name.endswith(tuple(datatrans.utils.COMPRESSIONS.values())):
+        raise ValueError('incremental output cannot be compressed: \'{}\''.format(output_path))
+    manifest_path = _with_suffix(output_path, '.manifest')
+    partial_output_path = _with_suffix(output_path, '.partial')
+    partial_manifest_path = _with_suffix(manifest_path, '.partial')
+    header = {'source': adapter.name, 'version': _adapter_version(adapter)}
+    header_line = datatrans.utils.dumpb(header) + b'\n'
+
+    previous = _read_manifest(manifest_path, header, output_path)
+    try:
+        partial_size = partial_output_path.stat().st_size
+    except FileNotFoundError:
+        partial_size = 0
+    entries, header_end = _read_partial_manifest(partial_manifest_path, header, partial_size)
+
+    stats = {'records': 0, 'resumed': 0, 'reused': 0, 'converted': 0}
+    to_recipe_ = adapter.to_recipe
+    with contextlib.ExitStack() as stack:
+        infile = stack.enter_context(datatrans.utils.open_file(input_path, 'rb'))
+        lines = enumerate(infile, start=1)
+
+        # skip the lines written by an interrupted run, as long as they
+        # are unchanged
+        pending = []
+        for line_number, line in lines:
+            if stats['resumed'] == len(entries) or record_hash(line) != entries[stats['resumed']][0]:
+                pending.append((line_number, line))
+                break
+            stats['resumed'] += 1
+        resumed = stats['records'] = stats['resumed']
+        offset, manifest_end = entries[resumed - 1][1:] if resumed else (0, header_end)
+
+        outfile = stack.enter_context(partial_output_path.open('ab'))
+        outfile.truncate(offset)
+        manifest = stack.enter_context(partial_manifest_path.open('ab'))
+        manifest.truncate(manifest_end)
+        if not manifest_end:
+            manifest.write(header_line)
+        old = stack.enter_context(output_path.open('rb')) if previous else None
+
+        for line_number, line in itertools.chain(pending, lines):
+            digest = record_hash(line)
+            location = previous.get(digest)
+            if location is not None:
+                old.seek(location[0])
+                data = old.read(location[1])
+                stats['reused'] += 1
+            else:
+                data = (serialize(to_recipe_(datatrans.utils.loads(line), line_number)) + '\n').encode('utf-8')
+                stats['converted'] += 1
+            outfile.write(data)
+            manifest.write(datatrans.utils.dumpb([digest, offset, len(data)]) + b'\n')
+            offset += len(data)
+            stats['records'] += 1
+            if stats['records'] % flush_every == 0:
+                # the output first, so the manifest never gets ahead of it
+                outfile.flush()
+                manifest.flush()
+
+        outfile.flush()
+        os.fsync(outfile.fileno())
+        outfile.close()
+        stat = partial_output_path.stat()
+        manifest.write(datatrans.utils.dumpb({'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                                              'records': stats['records']}) + b'\n')
+        manifest.flush()
+        os.fsync(manifest.fileno())
+        manifest.close()
+
+    # a crash between the two leaves a manifest whose trailer does not
+    # match the output, which is then ignored
+    os.replace(partial_output_path, output_path)
+    os.replace(partial_manifest_path, manifest_path)
+    return stats
+
+
+def convert_all(sources: Iterable[Union[DataSet, str, RecipeAdapter]] = tuple(DataSet), *,
+                parallel: bool = False, **kwargs) -> Dict[str, int]:
+    """Converts each of ``sources`` to its adapter's ``output_path``.
+
+    Args:
+        sources: Sources to convert, all data sets by default
+        parallel: If True, use ``convert_parallel`` instead of ``convert``
+        **kwargs: Passed on to ``convert`` or ``convert_parallel``. A
+            ``dedup`` ``Deduplicator`` (only with ``convert``) is shared
+            by all sources, so recipes already converted from an earlier
+            source are left out of the later ones.
+
+    Returns:
+        The number of recipes written per source name
+    """
+    convert_ = convert_parallel if parallel else convert
+    return {adapter.name: convert_(adapter, **kwargs) for adapter in map(get_adapter, sources)}
+
+
 if __name__ == '__main__':
-    data_set = DataSet.COOKSTR
+    import sys
 
-    with Path(data_set._value_).open('r', encoding='utf-8') as jsonfile:
-        counter = 1
-        recipes = []
-        for line in jsonfile:
-            data = json.loads(line)
-
-            if data_set is DataSet.EPICURIOUS:
-                d = {
-                    'datePublished': schema.DateTime.fromisoformat(data['pubDate']),
-                    'name': data['hed'],
-                    'recipeInstructions': schema.Property(*data['prepSteps']),
-                    'aggregateRating': schema.AggregateRating(
-                        ratingValue=data['aggregateRating'],
-                        reviewCount=data['reviewsCount']
-                    )
-                }
-
-                if data['reviewsCount'] != 0:
-                    d['aggregateRating'] = schema.AggregateRating(
-                        ratingValue=data['aggregateRating'],
-                        reviewCount=data['reviewsCount']
-                    )
-
-                if data['author']:
-                    d['author'] = schema.Property(*[schema.Person(author['name'])
-                                                    for author in data['author']])
-
-                try:
-                    d['recipeIngredient'] = schema.Property(*data['ingredients'])
-                except KeyError as e:
-                    warnings.warn('KeyError: {} in line#{}'.format(e, counter))
-                    try:
-                        if data['tag']['category'] == 'ingredient':
-                            d['recipeIngredient'] = data['tag']['name']
-                    except KeyError as e:
-                        warnings.warn('KeyError: {} in line#{}'.format(e, counter))
-
-                try:
-                    if data['tag']['category'] == 'cuisine':
-                        d['recipeCuisine'] = data['tag']['name']
-                except KeyError as e:
-                    warnings.warn('KeyError: {} in line#{}'.format(e, counter))
-            ###########
-            elif data_set is DataSet.ALLRECIPES:
-                d = {
-                    'author': schema.Person(data['author']),
-                    'description': data['description'],
-                    'recipeIngredient': schema.Property(*data['ingredients']),
-                    'recipeInstructions': schema.Property(*data['instructions']),
-                    'name': data['title']
-                }
-                if data['prep_time_minutes'] != 0 or data['cook_time_minutes'] != 0:
-                    d['prepTime'] = schema.Duration(minutes=data['prep_time_minutes'])
-                    d['cookTime'] = schema.Duration(minutes=data['cook_time_minutes'])
-                if data['total_time_minutes'] != 0:
-                    d['totalTime'] = schema.Duration(minutes=data['total_time_minutes'])
-                if data['review_count']:
-                    d['aggregateRating'] = schema.AggregateRating(
-                        ratingValue=data['rating_stars'],
-                        reviewCount=data['review_count']
-                    )
-            ###########
-            elif data_set is DataSet.BBCCOUK:
-                d = {
-                    'author': schema.Person(data['chef']),
-                    'recipeIngredient': schema.Property(*data['ingredients']),
-                    'recipeInstructions': schema.Property(*data['instructions']),
-                    'name': data['title']
-
-                }
-                if data['description']:
-                    d['description'] = data['description']
-                if data['preparation_time_minutes'] != 0 or data['cooking_time_minutes'] != 0:
-                    d['prepTime'] = schema.Duration(minutes=data['preparation_time_minutes'])
-                    d['cookTime'] = schema.Duration(minutes=data['cooking_time_minutes'])
-                if data['total_time_minutes'] != 0:
-                    d['totalTime'] = schema.Duration(minutes=data['total_time_minutes'])
-
-                # TODO: Also include serving size 'serve' into the data
-
-            ###########
-            elif data_set is DataSet.COOKSTR:
-                d = {
-                    'cookingMethod': data['cooking_method'],
-                    'datePublished': data['date_modified'],
-                    'recipeIngredient': schema.Property(*data['ingredients']),
-                    'recipeInstructions': schema.Property(*data['instructions']),
-                    'name': data['title']
-                }
-                if data['chef']:
-                    d['author'] = schema.Person(data['chef'])
-                if data['description']:
-                    d['description'] = data['description']
-                if data['rating_count']:
-                    d['aggregateRating'] = schema.AggregateRating(
-                        ratingValue=data['rating_value'],
-                        ratingCount=data['rating_count']
-                    )
-
-            recipe = schema.Recipe(
-                **d,
-                suppress=True
-            )
-
-            recipes.append(recipe)
-            counter += 1
-            # if counter > 10:
-            #     break
-
-    with open(datatrans.utils.BASE_DIR / 'assets/cookstr-recipes.json-ld', 'w') as jsonfile:
-        for recipe in recipes:
-            jsonfile.write(json.dumps(recipe, default=datatrans.utils.functions.json_encoder))
-            jsonfile.write('\n')
-
-    # print(json.dumps(recipes, default=schema.utils.default))
+    if sys.argv[1:2] == ['--incremental']:
+        for adapter in map(get_adapter, sys.argv[2:] or tuple(DataSet)):
+            print('{}: {}'.format(adapter.name, convert_incremental(adapter)))
+    elif sys.argv[1:2] == ['--dedup']:
+        from datatrans.dedup import Deduplicator
+
+        deduplicator = Deduplicator()
+        print(convert_all(sys.argv[2:] or tuple(DataSet), dedup=deduplicator))
+        report = deduplicator.report()
+        print('{records} recipes, {duplicates} duplicates in {} clusters'.format(len(report['clusters']), **report))
+    elif sys.argv[1:2] == ['--profile']:
+        for adapter in map(get_adapter, sys.argv[2:] or tuple(DataSet)):
+            with datatrans.utils.StageProfiler() as profiler:
+                convert(adapter, report=ValidationReport(), profiler=profiler)
+            print('{}:\n{}\n'.format(adapter.name, profiler.summary()))
+    elif sys.argv[1:2] == ['--validate']:
+        for adapter in map(get_adapter, sys.argv[2:] or tuple(DataSet)):
+            report = ValidationReport()
+            convert(adapter, report=report)
+            print('{}: {}'.format(adapter.name, report.summary()))
+    else:
+        convert_all(sys.argv[1:] or tuple(DataSet))
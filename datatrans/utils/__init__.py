@@ -4,5 +4,38 @@ BASE_DIR = Path(__file__).parent.parent.parent
 
 from .classes import *
 from .functions import *
-import datatrans.utils.fooddata as fooddata
-import datatrans.utils.structured_data as schema
+from .jsonbackend import *
+
+# helpers imported when first used (PEP 562), not with the package
+_LAZY_SUBMODULES = {
+    'fooddata': 'fooddata',
+    'schema': 'structured_data',
+}
+# names of the submodules most callers do not use, imported with the
+# first of them used
+_LAZY_NAMES = {
+    'StageProfiler': 'profiling',
+    'COMPRESSIONS': 'records',
+    'detect_compression': 'records',
+    'find_file': 'records',
+    'open_file': 'records',
+    'shard_path': 'records',
+    'RecordWriter': 'records',
+    'SingleFlight': 'singleflight',
+    'SNAPSHOT_VERSION': 'snapshot',
+    'write_snapshot': 'snapshot',
+    'Snapshot': 'snapshot',
+}
+
+
+def __getattr__(name: str):
+    import importlib
+    if name in _LAZY_NAMES:
+        value = globals()[name] = getattr(importlib.import_module('.' + _LAZY_NAMES[name], __name__), name)
+        return value
+    try:
+        submodule = _LAZY_SUBMODULES[name]
+    except KeyError:
+        raise AttributeError('module \'{}\' has no attribute \'{}\''.format(__name__, name)) from None
+    module = globals()[name] = importlib.import_module('.' + submodule, __name__)
+    return module
@@ -1,10 +1,9 @@
 from operator import itemgetter
 from typing import Iterable
 import warnings
-import json
 
 from datatrans.utils.functions import snake_to_camel
-from datatrans.utils.classes.encoder import JSONEncoder
+from datatrans.utils.jsonbackend import dumps
 
 __all__ = ['DataClass']
 
@@ -55,6 +54,8 @@ class DataClassMeta(type):
             namespace['__types__'] = tuple(map(itemgetter(1), namespace['__attr__']))
             namespace['__inits__'] = tuple(map(one_itemgetter(2, 1), namespace['__attr__']))
             namespace['__params__'] = tuple(map(none_or_itemgetter(3), namespace['__attr__']))
+            # camelCase keys of the fields, converted once per class rather than per instance
+            namespace['__keys__'] = tuple(map(snake_to_camel, namespace['__slots__']))
         except IndexError as e:
             raise AttributeError('class {} is missing some type specification '
                                  'in __attr__'.format(name)) from e.__context__
@@ -101,16 +102,17 @@ class DataClass(metaclass=DataClassMeta):
 
         for i in range(len(self.__slots__)):
             attr = self.__slots__[i]
+            key = self.__keys__[i]
             type_ = self.__types__[i]
             init = self.__inits__[i]
             params = self.__params__[i]
             try:
-                if _dict_[snake_to_camel(attr)] is not None:
+                if _dict_[key] is not None:
                     # so that TypeError isn't raised and falsely suppressed
                     if params is None:
-                        setattr(self, attr, init(_dict_.pop(snake_to_camel(attr))))
+                        setattr(self, attr, init(_dict_.pop(key)))
                     else:
-                        setattr(self, attr, init(_dict_.pop(snake_to_camel(attr)), **params))
+                        setattr(self, attr, init(_dict_.pop(key), **params))
                 else:
                     setattr(self, attr, None)
             except KeyError:
@@ -126,8 +128,8 @@ class DataClass(metaclass=DataClassMeta):
     @property
     def dict(self) -> dict:
         """ Returns a dict of the data with fields in camelCase. """
-        return {snake_to_camel(field): getattr(self, field)
-                for field in self.__slots__
+        return {key: getattr(self, field)
+                for key, field in zip(self.__keys__, self.__slots__)
                 if getattr(self, field) is not None}
 
     def items(self) -> Iterable:
@@ -137,4 +139,4 @@ class DataClass(metaclass=DataClassMeta):
         return self.dict
 
     def __repr__(self):
-        return json.dumps(self.dict, cls=JSONEncoder)
+        return dumps(self.dict)
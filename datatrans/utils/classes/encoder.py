@@ -1,3 +1,4 @@
+import datetime
 import json
 
 
@@ -5,6 +6,8 @@ class JSONEncoder(json.JSONEncoder):
     def default(self, o):
         if hasattr(o, 'json_serial'):
             return o.json_serial()
+        elif isinstance(o, (datetime.date, datetime.time)):
+            return o.isoformat()
         else:
             raise TypeError(f'Object of type {o.__class__.__name__} '
                             f'is not JSON serializable')
@@ -1,11 +1,16 @@
+import datetime
+
 __all__ = ['json_encoder']
 
 def json_encoder(o):
     """
     Add JSON serialization capabilities to objects in this library.
+    Dates and times without ``json_serial`` are written in ISO 8601 format.
     """
     if hasattr(o, 'json_serial'):
         return o.json_serial()
+    elif isinstance(o, (datetime.date, datetime.time)):
+        return o.isoformat()
     else:
         raise TypeError(f'Object of type {o.__class__.__name__} '
                         f'is not JSON serializable')
@@ -0,0 +1,135 @@
+"""Pluggable JSON backend
+
+All bulk JSON encoding and decoding in this library goes through
+``dumps``, ``dumpb`` and ``loads``. They use ``orjson`` when it is
+installed and the standard library ``json`` module otherwise. Set the
+``DATATRANS_JSON_BACKEND`` environment variable (or call
+``set_json_backend``) to choose one explicitly.
+
+Both backends produce the same output: minified JSON encoded in UTF-8
+(non-ASCII characters are not escaped), with objects of this library
+serialized through ``json_serial`` (see ``utils.json_encoder``).
+The exceptions are floats that Python writes in exponent notation
+(e.g. ``1e+16``, which ``orjson`` writes as ``1e16``) and NaN and
+infinity (written as ``null`` by ``orjson``), which do not occur in
+FoodData Central or recipe data.
+"""
+import json
+import os
+from typing import Dict, Union
+
+from datatrans.utils.functions.functions import json_encoder
+
+__all__ = ['JSONBackend', 'get_json_backend', 'set_json_backend', 'dumps', 'dumpb', 'loads']
+
+SEPARATORS = (',', ':')
+
+
+class JSONBackend:
+    """ Standard library ``json`` backend. """
+
+    name = 'json'
+
+    def __init__(self):
+        self._thing_dumps = None
+
+    def dumps(self, obj) -> str:
+        if hasattr(type(obj), '__serializer__'):
+            # ``Thing``s have their own, faster, encoders
+            if self._thing_dumps is None:
+                from datatrans.structured_data.base.serializer import dumps as thing_dumps
+                self._thing_dumps = thing_dumps
+            return self._thing_dumps(obj, separators=SEPARATORS, ensure_ascii=False)
+        return json.dumps(obj, default=json_encoder, separators=SEPARATORS, ensure_ascii=False)
+
+    def dumpb(self, obj) -> bytes:
+        return self.dumps(obj).encode('utf-8')
+
+    def loads(self, s: Union[str, bytes, bytearray]):
+        return json.loads(s)
+
+
+class OrjsonBackend(JSONBackend):
+    """ ``orjson`` backend. """
+
+    name = 'orjson'
+
+    def __init__(self):
+        super().__init__()
+        import orjson
+        self._orjson = orjson
+        # dates are left to ``json_encoder`` so that ``json_serial`` of
+        # ``Date``/``DateTime`` takes precedence, as in the other backend
+        self._option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj) -> str:
+        return self.dumpb(obj).decode('utf-8')
+
+    def dumpb(self, obj) -> bytes:
+        return self._orjson.dumps(obj, default=json_encoder, option=self._option)
+
+    def loads(self, s: Union[str, bytes, bytearray]):
+        return self._orjson.loads(s)
+
+
+BACKENDS: Dict[str, type] = {
+    JSONBackend.name: JSONBackend,
+    OrjsonBackend.name: OrjsonBackend,
+}
+
+_backend: JSONBackend = None
+
+
+def set_json_backend(name: str = None) -> JSONBackend:
+    """Selects the JSON backend.
+
+    Args:
+        name: Optional. 'orjson' or 'json'. Defaults to the
+            ``DATATRANS_JSON_BACKEND`` environment variable, or the
+            fastest backend installed.
+
+    Raises:
+        ValueError: When the backend is unknown
+        ImportError: When the backend is not installed
+    """
+    global _backend
+    name = name or os.environ.get('DATATRANS_JSON_BACKEND')
+    if name is None:
+        try:
+            _backend = OrjsonBackend()
+        except ImportError:
+            _backend = JSONBackend()
+        return _backend
+    try:
+        _backend = BACKENDS[name]()
+    except KeyError as e:
+        raise ValueError('unknown JSON backend \'{}\''.format(name)) from e.__context__
+    return _backend
+
+
+def get_json_backend() -> JSONBackend:
+    """ Returns the JSON backend in use. """
+    if _backend is None:
+        set_json_backend()
+    return _backend
+
+
+def dumps(obj) -> str:
+    """Returns ``obj`` as minified JSON.
+
+    Examples:
+        >>> import datetime
+        >>> dumps({'description': 'Crème fraîche', 'publicationDate': datetime.date(2019, 4, 1)})
+        '{"description":"Crème fraîche","publicationDate":"2019-04-01"}'
+    """
+    return get_json_backend().dumps(obj)
+
+
+def dumpb(obj) -> bytes:
+    """ Returns ``obj`` as minified JSON encoded in UTF-8. """
+    return get_json_backend().dumpb(obj)
+
+
+def loads(s: Union[str, bytes, bytearray]):
+    """ Returns the object represented by the JSON document ``s``. """
+    return get_json_backend().loads(s)
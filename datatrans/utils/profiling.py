@@ -0,0 +1,263 @@
+"""Timing of the stages of a pipeline
+
+A ``StageProfiler`` is given to a pipeline, e.g. ``to_jsonld.convert``,
+which then times the functions and iterators of each of its stages
+(decoding, mapping, construction, validation, encoding, writing...) with
+``wrap`` and ``iterate``. Pipelines given no profiler run their stages
+unwrapped, so profiling costs nothing when it is not asked for.
+
+The time of a stage excludes the time of the stages it calls, including
+the iterators it pulls from, so the stages of a lazy pipeline of
+generators add up to the duration of the run.
+
+With ``memory=True``, ``tracemalloc`` traces the allocations of the run:
+the net change of the traced memory during each stage is recorded
+(negative for a stage freeing what earlier stages allocated), and every
+``snapshot_every`` calls, and at the end of the run, a snapshot is
+compared with the one taken at the start to find the lines of code
+where memory grew the most.
+
+Examples:
+    >>> profiler = StageProfiler()
+    >>> decode = profiler.wrap('decode', int)
+    >>> [decode(line) for line in profiler.iterate('read', ['1', '2', '3'])]
+    [1, 2, 3]
+    >>> stats = profiler.report()['stages']
+    >>> stats['read']['records'], stats['decode']['records']
+    (3, 3)
+"""
+import functools
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+__all__ = ['StageProfiler']
+
+T = TypeVar('T')
+
+
+def _tracemalloc():
+    # only imported to trace the allocations, as it imports pickle
+    import tracemalloc
+    return tracemalloc
+
+
+class _Stage:
+    __slots__ = ('calls', 'records', 'time', 'memory_delta')
+
+    def __init__(self):
+        self.calls = 0
+        self.records = 0
+        self.time = 0.0
+        self.memory_delta = 0
+
+
+class StageProfiler:
+    """Times and counts the records of the stages of a pipeline.
+
+    Not thread-safe: profile one pipeline per profiler.
+
+    Args:
+        memory: Whether to trace the allocations with ``tracemalloc``
+        snapshot_every: Number of calls between ``tracemalloc``
+            snapshots, when tracing the allocations
+        top: Number of lines of the allocation snapshots to report
+    """
+
+    __slots__ = ('memory', 'snapshot_every', 'top', '_stages', '_stack', '_start', '_end', '_calls',
+                 '_snapshot', '_growth', '_peak', '_tracing')
+
+    def __init__(self, *, memory: bool = False, snapshot_every: int = 10000, top: int = 10):
+        self.memory = memory
+        self.snapshot_every = snapshot_every
+        self.top = top
+        self._stages: Dict[str, _Stage] = {}
+        # [time, memory] taken by the nested stages of each running stage
+        self._stack: List[List[float]] = []
+        self._start: Optional[float] = None
+        self._end: Optional[float] = None
+        self._calls = 0
+        self._snapshot: Optional['tracemalloc.Snapshot'] = None
+        self._growth: List['tracemalloc.StatisticDiff'] = []
+        self._peak: Optional[int] = None
+        self._tracing = False
+
+    def __enter__(self) -> 'StageProfiler':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """ Starts the run, and the tracing of the allocations if ``memory``. Called by the first stage if need be. """
+        self._start = time.perf_counter()
+        self._end = None
+        if self.memory:
+            tracemalloc = _tracemalloc()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing = True
+            self._snapshot = tracemalloc.take_snapshot()
+
+    def stop(self) -> None:
+        """ Ends the run, and the tracing of the allocations if started by ``start``. """
+        if self._start is None:
+            return
+        self._end = time.perf_counter()
+        if self._tracing:
+            self._take_snapshot()
+            _tracemalloc().stop()
+            self._tracing = False
+
+    def _take_snapshot(self) -> None:
+        tracemalloc = _tracemalloc()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        self._peak = tracemalloc.get_traced_memory()[1]
+        growth = sorted(snapshot.compare_to(self._snapshot, 'lineno'), key=lambda diff: diff.size_diff, reverse=True)
+        self._growth = [diff for diff in growth[:self.top] if diff.size_diff > 0]
+
+    def _enter(self) -> None:
+        if self._start is None:
+            self.start()
+        self._stack.append([0.0, 0])
+
+    def _exit(self, name: str, elapsed: float, allocated: int, records: int) -> None:
+        nested_time, nested_allocated = self._stack.pop()
+        if self._stack:
+            self._stack[-1][0] += elapsed
+            self._stack[-1][1] += allocated
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = self._stages[name] = _Stage()
+        stage.calls += 1
+        stage.records += records
+        stage.time += elapsed - nested_time
+        stage.memory_delta += allocated - nested_allocated
+        if self.memory:
+            self._calls += 1
+            if self._calls % self.snapshot_every == 0 and _tracemalloc().is_tracing():
+                start = time.perf_counter()
+                self._take_snapshot()
+                # not charged to the running stages
+                if self._stack:
+                    self._stack[-1][0] += time.perf_counter() - start
+
+    def add(self, name: str, elapsed: float, records: int = 1) -> None:
+        """ Records ``records`` processed by the stage ``name`` in ``elapsed`` seconds, timed by the caller. """
+        self._enter()
+        self._exit(name, elapsed, 0, records)
+
+    def time(self, name: str, function: Callable[..., T], *args, records: Optional[int] = 1, **kwargs) -> T:
+        """Returns ``function(*args, **kwargs)``, timed as a call of the stage ``name``.
+
+        The call counts as ``records`` records or, if None, as the
+        number returned by ``function``, e.g. of records written. A call
+        that raises counts as no record.
+        """
+        if self.memory:
+            tracemalloc = _tracemalloc()
+            memory = tracemalloc.is_tracing()
+        else:
+            memory = False
+        self._enter()
+        allocated = tracemalloc.get_traced_memory()[0] if memory else 0
+        start = time.perf_counter()
+        processed = 0
+        try:
+            result = function(*args, **kwargs)
+            processed = records if records is not None else result
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            if memory:
+                allocated = tracemalloc.get_traced_memory()[0] - allocated
+            self._exit(name, elapsed, allocated, processed)
+
+    def wrap(self, name: str, function: Callable[..., T]) -> Callable[..., T]:
+        """ Returns ``function`` timed as the stage ``name``, each call counting as a record. """
+        time_ = self.time
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return time_(name, function, *args, **kwargs)
+        return wrapper
+
+    def iterate(self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        """ Yields the items of ``iterable``, the production of each timed as a record of the stage ``name``. """
+        iterator = iter(iterable)
+        time_ = self.time
+        while True:
+            try:
+                item = time_(name, next, iterator)
+            except StopIteration:
+                return
+            yield item
+
+    def reset(self) -> None:
+        """ Forgets the stages recorded so far. """
+        self._stages.clear()
+        self._start = self._end = None
+        self._calls = 0
+        self._growth = []
+        self._peak = None
+
+    def report(self) -> dict:
+        """Returns the statistics of the run.
+
+        Returns:
+            The ``elapsed`` seconds of the run, and for each stage in
+            order of first use the number of ``calls`` and of
+            ``records``, the ``time`` in seconds, its ``share`` of the
+            run, the ``throughput`` in records per second and, when
+            tracing the allocations, the net change of the traced memory
+            in bytes as ``memoryDelta``. When tracing the allocations,
+            also the ``peakMemory`` and the lines of code where memory
+            grew the most since the start, as of the last snapshot, as
+            ``topAllocations``.
+        """
+        end = self._end if self._end is not None else time.perf_counter()
+        elapsed = end - self._start if self._start is not None else 0.0
+        report = {'elapsed': elapsed, 'stages': {}}
+        for name, stage in self._stages.items():
+            report['stages'][name] = {
+                'calls': stage.calls,
+                'records': stage.records,
+                'time': stage.time,
+                'share': stage.time / elapsed if elapsed else None,
+                'throughput': stage.records / stage.time if stage.time else None,
+            }
+            if self.memory:
+                report['stages'][name]['memoryDelta'] = stage.memory_delta
+        if self.memory:
+            tracemalloc = _tracemalloc()
+            report['peakMemory'] = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else self._peak
+            report['topAllocations'] = [{
+                'file': statistic.traceback[0].filename,
+                'line': statistic.traceback[0].lineno,
+                'sizeDiff': statistic.size_diff,
+                'countDiff': statistic.count_diff,
+            } for statistic in self._growth]
+        return report
+
+    def summary(self) -> str:
+        """ Returns the ``report`` as a table, for the end of a run. """
+        report = self.report()
+        lines = ['{:<14}{:>10}{:>10}{:>8}{:>14}'.format('stage', 'records', 'time (s)', 'share', 'records/s')]
+        for name, stage in report['stages'].items():
+            line = '{:<14}{:>10}{:>10.3f}{:>8.1%}{:>14,.0f}'.format(
+                name, stage['records'], stage['time'], stage['share'] or 0, stage['throughput'] or 0)
+            if 'memoryDelta' in stage:
+                line += '{:>+12.1f} MB'.format(stage['memoryDelta'] / 1e6)
+            lines.append(line)
+        lines.append('{:<14}{:>10}{:>10.3f}'.format('total', '', report['elapsed']))
+        if report.get('peakMemory') is not None:
+            lines.append('peak memory {:.1f} MB'.format(report['peakMemory'] / 1e6))
+        if report.get('topAllocations'):
+            lines.append('')
+            lines.append('memory growth since the start:')
+            lines.extend('{:>+12,} B  {}:{}'.format(allocation['sizeDiff'], allocation['file'], allocation['line'])
+                         for allocation in report['topAllocations'])
+        return '\n'.join(lines)
@@ -0,0 +1,306 @@
+"""Reading and writing JSON-lines record files
+
+``open_file`` opens plain, gzip or zstd compressed files alike, and
+``RecordWriter`` writes records one per line with buffering, optional
+streaming compression and optional sharding into several files listed
+in an index file.
+
+zstd support requires the optional ``zstandard`` package.
+"""
+import gzip
+import io
+import os
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Optional, Union
+
+from datatrans.utils.jsonbackend import dumpb
+
+__all__ = ['COMPRESSIONS', 'detect_compression', 'find_file', 'open_file', 'shard_path', 'RecordWriter']
+
+# suffix of the files of each compression
+COMPRESSIONS: Dict[str, str] = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+_MAGIC_NUMBERS = {
+    b'\x1f\x8b': 'gzip',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+}
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError('zstd compression requires the \'zstandard\' package') from e
+    return zstandard
+
+
+def _check_compression(compression: Optional[str]) -> None:
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError('unknown compression \'{}\''.format(compression))
+
+
+def detect_compression(path: Union[str, Path]) -> Optional[str]:
+    """Returns the compression of the file at ``path`` from its first bytes.
+
+    Returns:
+        'gzip', 'zstd', or None if the file is not compressed
+    """
+    with open(path, 'rb') as file:
+        head = file.read(4)
+    for magic, compression in _MAGIC_NUMBERS.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def shard_path(path: Union[str, Path], index: int) -> Path:
+    """Returns the location of the shard number ``index`` of the file at ``path``.
+
+    The shard number is appended to the name before its first dot, so
+    that the shards keep every suffix of ``path``, e.g. the compression.
+
+    Examples:
+        >>> shard_path('assets/recipes.json-ld.gz', 3).as_posix()
+        'assets/recipes-00003.json-ld.gz'
+    """
+    path = Path(path)
+    stem, dot, suffixes = path.name.partition('.')
+    return path.with_name('{}-{:05d}{}{}'.format(stem, index, dot, suffixes))
+
+
+def find_file(path: Union[str, Path]) -> Path:
+    """Returns ``path``, or the compressed file next to it if only that exists.
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as tmpdir:
+        ...     with RecordWriter(Path(tmpdir) / 'recipes.json.gz') as writer:
+        ...         writer.write('{}')
+        ...     find_file(Path(tmpdir) / 'recipes.json').name
+        'recipes.json.gz'
+    """
+    path = Path(path)
+    if not path.exists():
+        for suffix in COMPRESSIONS.values():
+            compressed = path.with_name(path.name + suffix)
+            if compressed.exists():
+                return compressed
+    return path
+
+
+def _open_binary(path: Path, mode: str, compression: Optional[str], compresslevel: int = None) -> BinaryIO:
+    if compression is None:
+        return open(path, mode + 'b')
+    if compression == 'gzip':
+        return gzip.open(path, mode + 'b', compresslevel=6 if compresslevel is None else compresslevel)
+    zstandard = _zstandard()
+    if mode == 'r':
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(
+            open(path, 'rb'), read_across_frames=True, closefd=True))
+    return zstandard.ZstdCompressor(level=3 if compresslevel is None else compresslevel).stream_writer(
+        open(path, mode + 'b'), closefd=True)
+
+
+def open_file(path: Union[str, Path], mode: str = 'r', *, compression: str = None, compresslevel: int = None,
+              encoding: str = 'utf-8') -> Union[BinaryIO, io.TextIOWrapper]:
+    """Opens a plain or compressed file.
+
+    Args:
+        path: Location of the file. When reading, a compressed file next
+            to it is used if ``path`` does not exist, see ``find_file``.
+        mode: 'r', 'w' or 'a', followed by 'b' for binary mode
+        compression: Optional. 'gzip' or 'zstd'. When reading, detected
+            from the content of the file; when writing, defaults to the
+            compression matching the suffix of ``path``
+        compresslevel: Optional. Level of compression
+        encoding: Encoding of text mode
+
+    Raises:
+        ValueError: When ``mode`` or ``compression`` is unknown
+        ImportError: When zstd is used and ``zstandard`` is not installed
+    """
+    binary = mode.endswith('b')
+    mode = mode[:-1] if binary else mode
+    if mode not in ('r', 'w', 'a'):
+        raise ValueError('invalid mode \'{}\''.format(mode))
+    _check_compression(compression)
+    path = Path(path)
+    if mode == 'r':
+        path = find_file(path)
+        compression = compression or detect_compression(path)
+    elif compression is None:
+        compression = next((name for name, suffix in COMPRESSIONS.items() if path.name.endswith(suffix)), None)
+    file = _open_binary(path, mode, compression, compresslevel)
+    return file if binary else io.TextIOWrapper(file, encoding=encoding)
+
+
+class RecordWriter:
+    """Writes records to a file, one per line.
+
+    Records are buffered and written ``buffer_size`` bytes at a time,
+    compressed as they are written if ``compression`` is given.
+
+    If ``max_records`` or ``max_bytes`` is given, the records are split
+    into numbered shards, named after ``path`` with the shard number
+    appended to the name before its suffixes (``recipes.json-ld.gz``
+    becomes ``recipes-00000.json-ld.gz``, ...), and an index listing
+    the shards is written to ``index_path`` on ``close``.
+
+    Args:
+        path: Location of the output
+        mode: 'w' to overwrite, or 'a' to append to an unsharded file
+        compression: Optional. 'gzip' or 'zstd', defaults to the
+            compression matching the suffix of ``path``
+        compresslevel: Optional. Level of compression
+        buffer_size: Number of bytes buffered before writing
+        max_records: Optional. Maximum number of records per shard
+        max_bytes: Optional. Maximum number of bytes per shard, before
+            compression. A record larger than that gets its own shard.
+        index_path: Optional. Location of the index of the shards,
+            defaults to ``path`` with its suffixes replaced by
+            ``.index.json``
+
+    Attributes:
+        closed (bool): Whether the writer is closed
+        records (int): Number of records written so far
+        shards (List[dict]): ``path``, ``firstRecord``, ``records`` and
+            ``bytes`` (before compression) of each shard, as in the index
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as tmpdir:
+        ...     with RecordWriter(Path(tmpdir) / 'recipes.json-ld.gz', max_records=2) as writer:
+        ...         writer.write_all(['{"name": "Coffee Cake"}', '{"name": "Apple Pie"}', '{"name": "Scone"}'])
+        ...     sorted(path.name for path in Path(tmpdir).iterdir())
+        ...     with open_file(Path(tmpdir) / 'recipes-00001.json-ld.gz') as file:
+        ...         file.read()
+        3
+        ['recipes-00000.json-ld.gz', 'recipes-00001.json-ld.gz', 'recipes.index.json']
+        '{"name": "Scone"}\\n'
+    """
+
+    def __init__(self, path: Union[str, Path], *, mode: str = 'w', compression: str = None,
+                 compresslevel: int = None, buffer_size: int = 1 << 20, max_records: int = None,
+                 max_bytes: int = None, index_path: Union[str, Path] = None):
+        if mode not in ('w', 'a'):
+            raise ValueError('invalid mode \'{}\''.format(mode))
+        _check_compression(compression)
+        self.path = Path(path)
+        self.sharded = max_records is not None or max_bytes is not None
+        if self.sharded and mode == 'a':
+            raise ValueError('cannot append to sharded output')
+        if compression is None:
+            compression = next((name for name, suffix in COMPRESSIONS.items()
+                                if self.path.name.endswith(suffix)), None)
+        self.mode = mode
+        self.compression = compression
+        self.compresslevel = compresslevel
+        self.buffer_size = buffer_size
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        stem = self.path.name.partition('.')[0]
+        self.index_path = Path(index_path) if index_path is not None else self.path.with_name(stem + '.index.json')
+        self.records = 0
+        self.shards: List[dict] = []
+        self.closed = False
+        self._file: Optional[BinaryIO] = None
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._shard_records = 0
+        self._shard_bytes = 0
+
+    def __enter__(self) -> 'RecordWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def shard_path(self, index: int) -> Path:
+        """ Returns the location of the shard number ``index``, see ``shard_path``. """
+        return shard_path(self.path, index)
+
+    def _open(self) -> None:
+        if self.sharded:
+            path = self.shard_path(len(self.shards))
+            self.shards.append({'path': path.name, 'firstRecord': self.records, 'records': 0, 'bytes': 0})
+        else:
+            path = self.path
+        self._file = _open_binary(path, self.mode, self.compression, self.compresslevel)
+        self._shard_records = self._shard_bytes = 0
+
+    def _close_shard(self) -> None:
+        self.flush()
+        self._file.close()
+        self._file = None
+        if self.sharded:
+            self.shards[-1].update(records=self._shard_records, bytes=self._shard_bytes)
+
+    def write(self, record: Union[str, bytes]) -> None:
+        """ Writes ``record``, JSON text without a newline, as a line. """
+        if self.closed:
+            raise ValueError('write to closed RecordWriter')
+        if isinstance(record, str):
+            record = record.encode('utf-8')
+        size = len(record) + 1
+        if self._file is None:
+            self._open()
+        elif self._shard_records and ((self.max_records is not None and self._shard_records >= self.max_records)
+                                      or (self.max_bytes is not None and self._shard_bytes + size > self.max_bytes)):
+            self._close_shard()
+            self._open()
+        self._buffer.append(record)
+        self._buffer.append(b'\n')
+        self._buffered += size
+        self._shard_records += 1
+        self._shard_bytes += size
+        self.records += 1
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def write_json(self, obj) -> None:
+        """ Writes ``obj`` as a line of minified JSON. """
+        self.write(dumpb(obj))
+
+    def write_all(self, records: Iterable[Union[str, bytes]]) -> int:
+        """Writes each of ``records``.
+
+        Returns:
+            The number of records written
+        """
+        start = self.records
+        write = self.write
+        for record in records:
+            write(record)
+        return self.records - start
+
+    def flush(self) -> None:
+        """Writes the buffered records to the file.
+
+        Compressed output may still be held by the compressor until the
+        file is closed.
+        """
+        if self._buffer:
+            self._file.write(b''.join(self._buffer))
+            self._buffer.clear()
+            self._buffered = 0
+        if self.compression is None and self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        """ Writes what is left and, if sharded, the index. """
+        if self.closed:
+            return
+        self.closed = True
+        if self._file is None and not self.sharded:
+            # nothing written: still create the (empty) file
+            self._open()
+        if self._file is not None:
+            self._close_shard()
+        if self.sharded:
+            index = {'compression': self.compression, 'records': self.records, 'shards': self.shards}
+            partial_path = self.index_path.with_name(self.index_path.name + '.partial')
+            partial_path.write_bytes(dumpb(index))
+            os.replace(partial_path, self.index_path)
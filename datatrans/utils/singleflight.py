@@ -0,0 +1,108 @@
+"""Coalescing of concurrent duplicate calls
+
+When several threads call ``SingleFlight.do`` with the same key at
+once, e.g. to fetch the same food, only the first one calls the
+function; the others wait for it and get its result, or its exception,
+instead of calling the function again. Calls made after it returned
+call the function again: results are not cached.
+
+Examples:
+    >>> import threading
+    >>> started, release = threading.Event(), threading.Event()
+    >>> def fetch(fdc_id):
+    ...     started.set()
+    ...     release.wait()
+    ...     return {'fdcId': fdc_id}
+    >>> # the first call returns once the second one waits for it
+    >>> flights = SingleFlight(on_shared=lambda key: release.set())
+    >>> first = threading.Thread(target=flights.do, args=(173410, fetch, 173410))
+    >>> first.start()
+    >>> started.wait()
+    True
+    >>> flights.do(173410, fetch, 173410)
+    ({'fdcId': 173410}, True)
+    >>> first.join()
+    >>> flights.calls, flights.shared
+    (2, 1)
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+__all__ = ['SingleFlight']
+
+T = TypeVar('T')
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Calls in flight, by key, shared by the threads making the same call at once.
+
+    Args:
+        on_shared: Optional. Called with the key of each call given the
+            result, or the exception, of a call in flight, before it
+            waits for it
+
+    Attributes:
+        calls (int): Number of calls of ``do``
+        shared (int): Number of them given the result of a call already
+            in flight, i.e. of duplicate calls saved
+    """
+
+    __slots__ = ('on_shared', 'calls', 'shared', '_flights', '_lock')
+
+    def __init__(self, on_shared: Callable[[Hashable], None] = None):
+        self.on_shared = on_shared
+        self.calls = 0
+        self.shared = 0
+        self._flights: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, function: Callable[..., T], *args, **kwargs) -> Tuple[T, bool]:
+        """Returns ``function(*args, **kwargs)``, or the result of the call in flight for ``key``.
+
+        Returns:
+            The result, and whether it is that of a call in flight
+
+        Raises:
+            Exception: Whatever the call raised, in every thread
+                waiting for it
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._flights.get(key)
+            leader = call is None
+            if leader:
+                call = self._flights[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            if self.on_shared is not None:
+                self.on_shared(key)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """ Returns the number of calls in flight. """
+        with self._lock:
+            return len(self._flights)
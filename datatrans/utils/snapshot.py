@@ -0,0 +1,484 @@
+"""Binary snapshots of collections of ``DataClass`` objects
+
+Parsing a catalog of foods from JSON builds every object again at every
+start. ``write_snapshot`` saves the objects once in a compact binary
+file, and ``Snapshot`` maps it in memory and builds each object only
+when it is accessed, so opening a snapshot takes the same time whatever
+its size, and processes opening the same snapshot share its pages.
+
+The layout of the objects of each class follows its ``__attr__``: each
+object is a fixed-size row of its class's table, with one column per
+field:
+
+- ints, floats and bools, as such
+- strings, as the index of the string in a table of the strings of the
+  snapshot, so that each is stored (and decoded) once
+- enums, as the index of their member
+- dates, as their ordinal
+- ``DataClass`` objects, as the table and row of the object; with
+  ``dedupe``, identical rows of objects without lists are stored once,
+  and loaded as one object shared by the objects referring to it
+- lists, as runs of items that are objects, strings or other values
+- other values, as JSON
+
+The classes of the objects must be importable, as they are imported by
+name when loading. A snapshot can only be loaded with classes having
+the fields it was written with (and possibly others, set to None).
+
+Examples:
+    >>> import tempfile
+    >>> from datatrans.benchmarks.suite import load_fixture
+    >>> from datatrans.fooddata.detail import SrLegacyFood
+    >>> food = SrLegacyFood(_dict_=loads(load_fixture('sr_legacy_food.json')))
+    >>> with tempfile.TemporaryDirectory() as tmpdir:
+    ...     write_snapshot([food], Path(tmpdir) / 'foods.snapshot')
+    ...     with Snapshot(Path(tmpdir) / 'foods.snapshot') as snapshot:
+    ...         loaded = snapshot[0]
+    ...         loaded.description, loaded.publication_date, loaded.food_nutrients[0].nutrient.name
+    ...         repr(loaded) == repr(food)
+    ...     # identical nutrients are stored once, and shared, with dedupe
+    ...     write_snapshot([food, food], Path(tmpdir) / 'foods.snapshot', dedupe=True)
+    ...     with Snapshot(Path(tmpdir) / 'foods.snapshot') as snapshot:
+    ...         snapshot[0].food_nutrients[0].nutrient is snapshot[1].food_nutrients[0].nutrient
+    1
+    ('Butter, salted', datetime.date(2019, 4, 1), 'Water')
+    True
+    2
+    True
+"""
+import datetime
+import enum
+import importlib
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from datatrans.utils.classes.dataclass import DataClass
+from datatrans.utils.jsonbackend import dumpb, dumps, loads
+
+__all__ = ['SNAPSHOT_VERSION', 'write_snapshot', 'Snapshot']
+
+SNAPSHOT_VERSION = 1
+
+_MAGIC = b'DTSNAP\x00\x00'
+_PREFIX = struct.Struct('<8sIQ')  # magic, version, length of the header
+_OFFSET = struct.Struct('<Q')
+_RUN = struct.Struct('<II')  # first item and length of a list
+_ITEM = struct.Struct('<HI')  # table (or tag) and row (or string) of an item of a list
+_ROOT = _ITEM
+
+# tags of the items of lists that are not objects
+_STR_TAG = 0xFFFF
+_JSON_TAG = 0xFFFE
+
+# kinds of the fields
+_INT, _FLOAT, _STR, _OBJECT, _LIST, _ENUM, _DATE, _BOOL, _JSON = range(9)
+_KIND_NAMES = ('int', 'float', 'str', 'object', 'list', 'enum', 'date', 'bool', 'json')
+# struct codes of the columns of each kind, and their values for None
+_CODES = ('q', 'd', 'I', 'HI', 'I', 'H', 'i', '?', 'I')
+_NULLS = ((0,), (0.0,), (0,), (0, 0), (0,), (0,), (0,), (False,), (0,))
+
+
+def _kind(type_: type) -> int:
+    """ Returns the kind of the fields of type ``type_``, as in the ``__attr__`` of a ``DataClass``. """
+    if type_ is bool:
+        return _BOOL
+    if type_ is int:
+        return _INT
+    if type_ is float:
+        return _FLOAT
+    if type_ is str:
+        return _STR
+    if type_ is datetime.date:
+        return _DATE
+    if isinstance(type_, type):
+        if issubclass(type_, enum.Enum):
+            return _ENUM
+        if issubclass(type_, DataClass):
+            return _OBJECT
+        if issubclass(type_, list):
+            return _LIST
+    return _JSON
+
+
+def _class_name(cls: type) -> str:
+    return '{}:{}'.format(cls.__module__, cls.__qualname__)
+
+
+def _import_class(name: str) -> type:
+    module, _, qualname = name.partition(':')
+    obj = importlib.import_module(module)
+    for attr in qualname.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _row_struct(kinds: Iterable[int], fields: int) -> struct.Struct:
+    # a bitmap of the fields that are None, then the columns
+    return struct.Struct('<{}s'.format((fields + 7) // 8) + ''.join(_CODES[kind] for kind in kinds))
+
+
+class _TableWriter:
+    __slots__ = ('id', 'cls', 'fields', 'kinds', 'enums', 'columns', 'struct', 'rows', 'index', 'dedupe')
+
+    def __init__(self, id_: int, cls: type, dedupe: bool):
+        self.id = id_
+        self.cls = cls
+        self.fields = tuple(cls.__slots__)
+        self.kinds = tuple(_kind(type_) for type_ in cls.__types__)
+        # codes of the members of the enum of each enum field
+        self.enums = {field: {member: code for code, member in enumerate(type_)}
+                      for field, type_, kind in zip(self.fields, cls.__types__, self.kinds) if kind == _ENUM}
+        self.columns = tuple((1 << i, field, kind, self.enums.get(field))
+                             for i, (field, kind) in enumerate(zip(self.fields, self.kinds)))
+        self.struct = _row_struct(self.kinds, len(self.fields))
+        self.rows: List[bytes] = []
+        self.index: Dict[bytes, int] = {}
+        # each list is written once, so rows with lists are never identical
+        self.dedupe = dedupe and _LIST not in self.kinds
+
+    def header(self, offset: int) -> dict:
+        fields = []
+        for field, type_, kind in zip(self.fields, self.cls.__types__, self.kinds):
+            spec = {'name': field, 'kind': _KIND_NAMES[kind]}
+            if kind == _ENUM:
+                spec['enum'] = _class_name(type_)
+                spec['members'] = [member.name for member in type_]
+            fields.append(spec)
+        return {'class': _class_name(self.cls), 'fields': fields, 'rows': len(self.rows), 'offset': offset,
+                'dedupe': self.dedupe}
+
+
+class _Writer:
+    __slots__ = ('dedupe', 'strings', 'tables', 'runs', 'items', 'roots')
+
+    def __init__(self, dedupe: bool):
+        self.dedupe = dedupe
+        self.strings: Dict[str, int] = {}
+        self.tables: Dict[type, _TableWriter] = {}
+        self.runs: List[bytes] = []
+        self.items: List[bytes] = []
+        self.roots: List[bytes] = []
+
+    def string(self, s: str) -> int:
+        index = self.strings.get(s)
+        if index is None:
+            index = self.strings[s] = len(self.strings)
+        return index
+
+    def object(self, obj: DataClass) -> Tuple[int, int]:
+        """ Writes the row of ``obj``, and of the objects it refers to, and returns its table and row. """
+        cls = type(obj)
+        table = self.tables.get(cls)
+        if table is None:
+            if len(self.tables) >= _JSON_TAG:
+                raise ValueError('too many classes in the snapshot')
+            table = self.tables[cls] = _TableWriter(len(self.tables), cls, self.dedupe)
+        nulls = 0
+        values = []
+        for bit, field, kind, codes in table.columns:
+            value = getattr(obj, field, None)
+            if value is None:
+                nulls |= bit
+                values.extend(_NULLS[kind])
+                continue
+            # the type of the value is checked once its kind is found
+            if kind == _STR:
+                valid = type(value) is str
+                if valid:
+                    value = self.string(value)
+            elif kind == _INT:
+                valid = type(value) is int
+            elif kind == _FLOAT:
+                valid = type(value) in (float, int)
+            elif kind == _OBJECT:
+                valid = isinstance(value, DataClass)
+                if valid:
+                    values.extend(self.object(value))
+                    continue
+            elif kind == _LIST:
+                valid = isinstance(value, list)
+                if valid:
+                    value = self.list(value)
+            elif kind == _ENUM:
+                value = codes.get(value)
+                valid = value is not None
+            elif kind == _DATE:
+                valid = type(value) is datetime.date
+                if valid:
+                    value = value.toordinal()
+            elif kind == _BOOL:
+                valid = type(value) is bool
+            else:
+                valid = True
+                value = self.string(dumps(value))
+            if not valid:
+                raise ValueError('invalid value for \'{}\': \'{}\' \'{}\''.format(
+                    cls.__name__, field, getattr(obj, field)))
+            values.append(value)
+        row = table.struct.pack(nulls.to_bytes((len(table.fields) + 7) // 8, 'little'), *values)
+        if table.dedupe:
+            index = table.index.get(row)
+            if index is None:
+                index = table.index[row] = len(table.rows)
+                table.rows.append(row)
+        else:
+            index = len(table.rows)
+            table.rows.append(row)
+        return table.id, index
+
+    def list(self, values: list) -> int:
+        """ Writes the items of ``values`` and returns the index of their run. """
+        # the objects of the items are written first, as they may have lists too
+        items = []
+        for value in values:
+            if isinstance(value, DataClass):
+                items.append(_ITEM.pack(*self.object(value)))
+            elif isinstance(value, str):
+                items.append(_ITEM.pack(_STR_TAG, self.string(value)))
+            else:
+                items.append(_ITEM.pack(_JSON_TAG, self.string(dumps(value))))
+        self.runs.append(_RUN.pack(len(self.items), len(items)))
+        self.items.extend(items)
+        return len(self.runs) - 1
+
+    def write(self, file) -> None:
+        sections = []
+        offset = 0
+
+        def section(data: bytes) -> int:
+            nonlocal offset
+            start = offset
+            sections.append(data)
+            offset += len(data)
+            return start
+
+        strings = [s.encode('utf-8') for s in self.strings]
+        string_offsets = [0]
+        for s in strings:
+            string_offsets.append(string_offsets[-1] + len(s))
+        header = {
+            'strings': {'count': len(strings),
+                        'offsets': section(struct.pack('<{}Q'.format(len(string_offsets)), *string_offsets)),
+                        'data': section(b''.join(strings))},
+            'tables': [table.header(section(b''.join(table.rows))) for table in self.tables.values()],
+            'runs': {'count': len(self.runs), 'offset': section(b''.join(self.runs))},
+            'items': {'count': len(self.items), 'offset': section(b''.join(self.items))},
+            'roots': {'count': len(self.roots), 'offset': section(b''.join(self.roots))},
+        }
+        header = dumpb(header)
+        file.write(_PREFIX.pack(_MAGIC, SNAPSHOT_VERSION, len(header)))
+        file.write(header)
+        for data in sections:
+            file.write(data)
+
+
+def write_snapshot(objects: Iterable[DataClass], path: Union[str, Path], *, dedupe: bool = False) -> int:
+    """Writes a snapshot of ``objects`` to ``path``.
+
+    The snapshot is written next to ``path`` then moved to it, so that
+    the processes that have the previous snapshot open keep reading it.
+
+    Args:
+        objects: Objects to write
+        path: Location of the snapshot
+        dedupe: Whether to store identical objects without lists once,
+            e.g. the nutrients of the foods. The snapshot is smaller and
+            faster to load, but its objects share these, so changing
+            one of them changes it for every object referring to it.
+
+    Returns:
+        The number of objects written
+
+    Raises:
+        ValueError: When the value of a field is not of the type of the
+            field in its ``__attr__``
+    """
+    writer = _Writer(dedupe)
+    for obj in objects:
+        writer.roots.append(_ROOT.pack(*writer.object(obj)))
+    path = Path(path)
+    partial_path = path.with_name(path.name + '.partial')
+    with open(partial_path, 'wb') as file:
+        writer.write(file)
+    os.replace(partial_path, path)
+    return len(writer.roots)
+
+
+class _TableReader:
+    __slots__ = ('cls', 'struct', 'offset', 'rows', 'dedupe', 'source', 'namespace', 'load')
+
+    def __init__(self, header: dict, data_offset: int):
+        self.cls = _import_class(header['class'])
+        self.rows = header['rows']
+        self.offset = data_offset + header['offset']
+        # shared rows are loaded once
+        self.dedupe = header.get('dedupe', True)
+        slots = set(self.cls.__slots__)
+        kinds = [_KIND_NAMES.index(field['kind']) for field in header['fields']]
+        self.struct = _row_struct(kinds, len(kinds))
+
+        # the rows are loaded by a function made for the table, setting
+        # each field from its column, as a loop over the fields is much
+        # slower for the millions of objects of a catalog
+        self.namespace = {'cls': self.cls, 'fromordinal': datetime.date.fromordinal, 'loads': loads}
+        lines = ['def load(values):', '    nulls = int.from_bytes(values[0], "little")', '    obj = cls.__new__(cls)']
+        position = 1
+        for bit, (field, kind) in enumerate(zip(header['fields'], kinds)):
+            if field['name'] not in slots:
+                raise ValueError('\'{}\' has no field \'{}\', the snapshot is of another version of it'
+                                 .format(header['class'], field['name']))
+            value = 'values[{}]'.format(position)
+            if kind == _STR:
+                # without calling string() once decoded
+                value = '(strings[{0}] or string({0}))'.format(value)
+            elif kind == _OBJECT:
+                value = 'object_({}, values[{}])'.format(value, position + 1)
+            elif kind == _LIST:
+                value = 'list_({})'.format(value)
+            elif kind == _ENUM:
+                enum_class = _import_class(field['enum'])
+                self.namespace['members_{}'.format(bit)] = [enum_class[name] for name in field['members']]
+                value = 'members_{}[{}]'.format(bit, value)
+            elif kind == _DATE:
+                value = 'fromordinal({})'.format(value)
+            elif kind == _JSON:
+                value = 'loads(string({}))'.format(value)
+            lines.append('    obj.{} = None if nulls & {} else {}'.format(field['name'], 1 << bit, value))
+            position += len(_CODES[kind])
+        for slot in sorted(slots - {field['name'] for field in header['fields']}):
+            lines.append('    obj.{} = None'.format(slot))
+        lines.append('    return obj')
+        self.source = '\n'.join(lines)
+        self.load = None
+
+    def bind(self, strings: List[Optional[str]], string: Callable[[int], str],
+             object_: Callable[[int, int], DataClass], list_: Callable[[int], list]) -> None:
+        """ Makes the ``load`` function of the rows, given the functions loading the values they refer to. """
+        namespace = dict(self.namespace, strings=strings, string=string, object_=object_, list_=list_)
+        exec(self.source, namespace)
+        self.load = namespace['load']
+
+
+class Snapshot:
+    """The objects written to ``path`` by ``write_snapshot``, loaded when accessed.
+
+    Objects are built, along with the objects they refer to, the first
+    time they are accessed, and the same objects are returned afterwards.
+    Opening a snapshot takes the same time whatever its size, whereas
+    loading each of its objects takes about a third of the time parsing
+    them from JSON does. A snapshot is a read-only sequence.
+
+    Args:
+        path: Location of the snapshot
+        use_mmap: Whether to map the file in memory, else to read it
+            whole
+
+    Raises:
+        ValueError: When ``path`` is not a snapshot, or is of a newer
+            version, or when its classes have changed
+    """
+
+    __slots__ = ('path', '_file', '_buffer', '_tables', '_loaded', '_cache', '_strings', '_string_offsets',
+                 '_string_data', '_runs', '_items', '_roots', '_length')
+
+    def __init__(self, path: Union[str, Path], *, use_mmap: bool = True):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            if use_mmap:
+                self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._buffer = self._file.read()
+            magic, version, header_length = _PREFIX.unpack_from(self._buffer, 0)
+            if magic != _MAGIC:
+                raise ValueError('\'{}\' is not a snapshot'.format(self.path))
+            if version > SNAPSHOT_VERSION:
+                raise ValueError('\'{}\' is of version {}, newer than this library\'s'.format(self.path, version))
+            data_offset = _PREFIX.size + header_length
+            header = loads(self._buffer[_PREFIX.size:data_offset])
+            self._tables = [_TableReader(table, data_offset) for table in header['tables']]
+        except BaseException:
+            self.close()
+            raise
+        self._strings: List[Optional[str]] = [None] * header['strings']['count']
+        for table in self._tables:
+            table.bind(self._strings, self._string, self._object, self._list)
+        # objects loaded, of the roots and of the shared rows, the others
+        # being referred to by one object only
+        self._loaded: List[Optional[DataClass]] = [None] * header['roots']['count']
+        self._cache: List[Optional[list]] = [[None] * table.rows if table.dedupe else None for table in self._tables]
+        self._string_offsets = data_offset + header['strings']['offsets']
+        self._string_data = data_offset + header['strings']['data']
+        self._runs = data_offset + header['runs']['offset']
+        self._items = data_offset + header['items']['offset']
+        self._roots = data_offset + header['roots']['offset']
+        self._length = header['roots']['count']
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """ Closes the file. The objects already loaded remain usable. """
+        if isinstance(getattr(self, '_buffer', None), mmap.mmap):
+            self._buffer.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[DataClass, List[DataClass]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('snapshot index out of range')
+        return self._root(index)
+
+    def __iter__(self) -> Iterator[DataClass]:
+        for index in range(self._length):
+            yield self._root(index)
+
+    def _root(self, index: int) -> DataClass:
+        obj = self._loaded[index]
+        if obj is None:
+            obj = self._loaded[index] = self._object(*_ROOT.unpack_from(self._buffer, self._roots + index * _ROOT.size))
+        return obj
+
+    def _string(self, index: int) -> str:
+        s = self._strings[index]
+        if s is None:
+            start, end = struct.unpack_from('<QQ', self._buffer, self._string_offsets + index * _OFFSET.size)
+            s = self._strings[index] = str(self._buffer[self._string_data + start:self._string_data + end], 'utf-8')
+        return s
+
+    def _list(self, index: int) -> list:
+        start, length = _RUN.unpack_from(self._buffer, self._runs + index * _RUN.size)
+        start = self._items + start * _ITEM.size
+        items = []
+        for tag, row in _ITEM.iter_unpack(self._buffer[start:start + length * _ITEM.size]):
+            if tag == _STR_TAG:
+                items.append(self._string(row))
+            elif tag == _JSON_TAG:
+                items.append(loads(self._string(row)))
+            else:
+                items.append(self._object(tag, row))
+        return items
+
+    def _object(self, table_id: int, row: int) -> DataClass:
+        cache = self._cache[table_id]
+        if cache is not None:
+            obj = cache[row]
+            if obj is not None:
+                return obj
+        table = self._tables[table_id]
+        obj = table.load(table.struct.unpack_from(self._buffer, table.offset + row * table.struct.size))
+        if cache is not None:
+            cache[row] = obj
+        return obj
@@ -0,0 +1,209 @@
+"""Queue of tasks shared by processes on one or several machines
+
+A ``LeaseQueue`` is a SQLite database holding tasks, JSON payloads such
+as a range of pages to crawl. Workers ``claim`` a task, which leases it
+to them for ``lease_seconds``; they ``renew`` the lease while working on
+it and ``complete`` it when done. A task whose lease expired, because
+its worker died or got stuck, can be claimed again by another worker, so
+tasks must be idempotent.
+
+Every change is a SQLite transaction, so the processes only share the
+database file. On several machines, it must be on a filesystem whose
+file locks work across them (many network filesystems' do not).
+
+Examples:
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as tmpdir:
+    ...     with LeaseQueue(Path(tmpdir) / 'queue.sqlite') as queue:
+    ...         queue.put([{'pages': [1, 10]}, {'pages': [11, 20]}])
+    ...         lease = queue.claim('worker-1')
+    ...         lease.payload
+    ...         queue.complete(lease, {'records': 42})
+    ...         queue.counts()
+    [1, 2]
+    {'pages': [1, 10]}
+    {'pending': 1, 'leased': 0, 'done': 1}
+"""
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from datatrans.utils.jsonbackend import dumps, loads
+
+__all__ = ['Lease', 'LeaseLost', 'LeaseQueue', 'default_owner']
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, expires);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+
+class Lease(NamedTuple):
+    """ A task leased to ``owner`` until ``expires`` (``time.time()``). """
+    id: int
+    payload: Any
+    owner: str
+    expires: float
+    attempts: int
+
+
+class LeaseLost(Exception):
+    """ Raised when the lease of a task expired and the task was claimed by another worker. """
+
+
+def default_owner() -> str:
+    """ Returns a name for the worker of this process, unique across machines. """
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+
+class LeaseQueue:
+    """Tasks leased to workers, in a SQLite database at ``path``.
+
+    Args:
+        path: Location of the database, created if need be
+        lease_seconds: Duration of the leases
+        timeout: Seconds to wait for the lock of the database
+    """
+
+    __slots__ = ('path', 'lease_seconds', '_connection')
+
+    def __init__(self, path: Union[str, Path], *, lease_seconds: float = 300.0, timeout: float = 60.0):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        # autocommit: transactions are begun explicitly
+        self._connection = sqlite3.connect(str(self.path), timeout=timeout, isolation_level=None)
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self) -> 'LeaseQueue':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _transaction(self) -> sqlite3.Connection:
+        # takes the write lock at once, so that no two workers claim the same task
+        self._connection.execute('BEGIN IMMEDIATE')
+        return self._connection
+
+    def _run(self, sql: str, parameters: tuple = ()) -> sqlite3.Cursor:
+        connection = self._transaction()
+        try:
+            cursor = connection.execute(sql, parameters)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return cursor
+
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        """ Returns the value stored under ``key`` with ``set_meta``, or ``default``. """
+        row = self._connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return loads(row[0]) if row is not None else default
+
+    def set_meta(self, key: str, value: Any) -> None:
+        """ Stores ``value``, e.g. the parameters of the job, as JSON under ``key``. """
+        self._run('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, dumps(value)))
+
+    def put(self, payloads: Iterable[Any]) -> List[int]:
+        """Adds a task of each of ``payloads``, in one transaction.
+
+        Returns:
+            The ids of the tasks, in the order of ``payloads``
+        """
+        connection = self._transaction()
+        try:
+            ids = [connection.execute('INSERT INTO tasks (payload) VALUES (?)', (dumps(payload),)).lastrowid
+                   for payload in payloads]
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return ids
+
+    def claim(self, owner: str) -> Optional[Lease]:
+        """Leases the first pending or expired task to ``owner``.
+
+        Returns:
+            The lease, or None if every task is done or leased
+        """
+        connection = self._transaction()
+        try:
+            now = time.time()
+            row = connection.execute(
+                "SELECT id, payload, attempts FROM tasks WHERE state = 'pending' "
+                "OR (state = 'leased' AND expires < ?) ORDER BY id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                connection.execute('ROLLBACK')
+                return None
+            task_id, payload, attempts = row
+            expires = now + self.lease_seconds
+            connection.execute("UPDATE tasks SET state = 'leased', owner = ?, expires = ?, attempts = ? WHERE id = ?",
+                               (owner, expires, attempts + 1, task_id))
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return Lease(task_id, loads(payload), owner, expires, attempts + 1)
+
+    def _update_leased(self, lease: Lease, sql: str, parameters: tuple) -> None:
+        cursor = self._run(sql + " WHERE id = ? AND owner = ? AND state = 'leased'",
+                           parameters + (lease.id, lease.owner))
+        if cursor.rowcount != 1:
+            raise LeaseLost('task {} is no longer leased to \'{}\''.format(lease.id, lease.owner))
+
+    def renew(self, lease: Lease) -> Lease:
+        """Extends ``lease`` by ``lease_seconds`` from now.
+
+        Raises:
+            LeaseLost: When the task was claimed by another worker
+        """
+        expires = time.time() + self.lease_seconds
+        self._update_leased(lease, 'UPDATE tasks SET expires = ?', (expires,))
+        return lease._replace(expires=expires)
+
+    def complete(self, lease: Lease, result: Any = None) -> None:
+        """Marks the task of ``lease`` done, with its ``result``.
+
+        Raises:
+            LeaseLost: When the task was claimed by another worker, who
+                is to complete it instead
+        """
+        self._update_leased(lease, "UPDATE tasks SET state = 'done', expires = NULL, result = ?", (dumps(result),))
+
+    def release(self, lease: Lease) -> None:
+        """ Gives the task of ``lease`` back, e.g. after a failure, so that any worker can claim it at once. """
+        self._update_leased(lease, "UPDATE tasks SET state = 'pending', owner = NULL, expires = NULL", ())
+
+    def counts(self) -> dict:
+        """ Returns the number of tasks pending, leased (expired or not) and done. """
+        counts = dict.fromkeys(('pending', 'leased', 'done'), 0)
+        counts.update(self._connection.execute('SELECT state, COUNT(*) FROM tasks GROUP BY state'))
+        return counts
+
+    def done(self) -> bool:
+        """ Returns whether every task is done. """
+        return not self._connection.execute("SELECT 1 FROM tasks WHERE state != 'done' LIMIT 1").fetchone()
+
+    def results(self) -> Iterator[Tuple[int, Any, Any]]:
+        """ Yields the id, payload and result of each task done, in the order the tasks were put. """
+        for task_id, payload, result in self._connection.execute(
+                "SELECT id, payload, result FROM tasks WHERE state = 'done' ORDER BY id"):
+            yield task_id, loads(payload), loads(result)